@@ -0,0 +1,63 @@
+"""
+Table capacity snapshot ingestion: one awaited INSERT per table (the old
+pg_capacity_growth_trend_table_capacity_insert loop) versus
+TrendManager.add_table_capacities (one Arrow batch, one transaction).
+
+    PYTHONPATH=src/dbmcp python benchmarks/bench_capacity_ingest.py [--sizes 10000 100000] [--per-row-sample 2000]
+
+The per-row path is timed on the first --per-row-sample rows and extrapolated;
+running it on 100k rows takes many minutes.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+PER_ROW_SQL = """
+    INSERT INTO trends.pg_capacity_snapshots (connection_id, scope, dbname, schemaname, relname, size_bytes)
+    VALUES ($1, 'table', $2, $3, $4, $5)
+"""
+
+
+def _snapshot(n: int):
+    return [
+        {"dbname": "warehouse", "schemaname": f"s{i % 50}", "relname": f"t{i}", "size_bytes": 8192 * (i + 1)}
+        for i in range(n)
+    ]
+
+
+async def main(sizes, per_row_sample: int):
+    os.environ["METADATA_DUCKDB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="dbmcp-bench-"), "metadata.duckdb")
+
+    from db.metadata.metadata_connection import metadata_connection
+    from db.metadata.metadata_trend_manager import trend_manager
+
+    await metadata_connection.initialize()
+    print(f"{'rows':>8} {'per-row INSERT (before)':>26} {'Arrow batch':>14} {'speedup':>9}")
+    for connection_id, n in enumerate(sizes, start=1):
+        rows = _snapshot(n)
+
+        sample = rows[:min(n, per_row_sample)]
+        started = time.perf_counter()
+        for r in sample:
+            await metadata_connection.execute_write(
+                PER_ROW_SQL, 1000 + connection_id, r["dbname"], r["schemaname"], r["relname"], r["size_bytes"]
+            )
+        per_row = (time.perf_counter() - started) / len(sample) * n
+
+        started = time.perf_counter()
+        await trend_manager.add_table_capacities(connection_id, rows)
+        bulk = time.perf_counter() - started
+
+        estimated = "~" if len(sample) < n else ""
+        print(f"{n:>8} {estimated + f'{per_row:.2f}s':>26} {f'{bulk:.3f}s':>14} {per_row / bulk:>8.0f}x")
+    await metadata_connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--per-row-sample", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.per_row_sample))
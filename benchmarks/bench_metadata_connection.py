@@ -0,0 +1,73 @@
+"""
+Per-query latency of the DuckDB metadata store: one connection per query (the old
+MetadataConnection behaviour) versus the long-lived connection with per-thread cursors.
+
+    PYTHONPATH=src/dbmcp python benchmarks/bench_metadata_connection.py [--queries 2000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import duckdb
+
+LOOKUP_SQL = "SELECT * FROM repository.database_connections WHERE id = $1"
+
+
+def _report(label: str, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} p50 {statistics.median(samples) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms")
+
+
+def _connect_per_query(path: str, connection_id: int):
+    # Baseline: reopen the file (catalog load + WAL replay) for every query
+    conn = duckdb.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(LOOKUP_SQL, (connection_id,))
+        columns = [d[0] for d in cursor.description]
+        row = cursor.fetchone()
+        return dict(zip(columns, row)) if row else None
+    finally:
+        conn.close()
+
+
+async def main(queries: int):
+    path = os.path.join(tempfile.mkdtemp(prefix="dbmcp-bench-"), "metadata.duckdb")
+    os.environ["METADATA_DUCKDB_PATH"] = path
+
+    from db.metadata.metadata_connection import metadata_connection
+
+    await metadata_connection.initialize()
+    await metadata_connection.execute_write("""
+        INSERT INTO repository.database_connections (id, host, port, database_name, username, encrypted_password)
+        SELECT i, 'bench-' || i, 5432, 'postgres', 'postgres', 'x' FROM range(1, 201) t(i)
+    """)
+    await metadata_connection.close()
+
+    before = []
+    for i in range(queries):
+        started = time.perf_counter()
+        await asyncio.to_thread(_connect_per_query, path, i % 200 + 1)
+        before.append(time.perf_counter() - started)
+
+    await metadata_connection.initialize()
+    after = []
+    for i in range(queries):
+        started = time.perf_counter()
+        await metadata_connection.execute_query(LOOKUP_SQL, i % 200 + 1, fetch_one=True)
+        after.append(time.perf_counter() - started)
+    await metadata_connection.close()
+
+    print(f"{queries} primary-key lookups, DuckDB {duckdb.__version__}")
+    _report("connect per query (before)", before)
+    _report("persistent connection", after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000)
+    asyncio.run(main(parser.parse_args().queries))
@@ -0,0 +1,123 @@
+"""
+Job-execution overhead of scheduled tool calls: a fastmcp Client session over
+HTTP loopback per run (scheduler_dispatch=http, the old path) versus
+SchedulerManager.call_tool_in_process (one long-lived in-memory client session),
+at fixed job rates.
+
+    PYTHONPATH=src/dbmcp python benchmarks/bench_scheduler_dispatch.py [--rates 1 100] [--seconds 10]
+
+Both paths run through the same Eunomia policy middleware and call a no-op
+tool, so the numbers are the dispatch overhead alone. Client and server share
+one process, so CPU per job covers both sides of the HTTP path (idle CPU of
+the running server is measured first and subtracted).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import time
+
+import uvicorn
+from eunomia_mcp import create_eunomia_middleware
+from fastmcp import Client, FastMCP
+from fastmcp.client import StreamableHttpTransport
+
+POLICY_FILE = os.path.join(os.path.dirname(__file__), "..", "src", "dbmcp", "mcp_policies.json")
+HEADERS = {"Authorization": "Bearer serdar", "X-Request-Priority": "background", "user-agent": "dbmcp-scheduler"}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _idle_cpu_per_second(seconds: float = 3.0) -> float:
+    # The running server burns some CPU while idle; at 1/s it would dominate CPU per job
+    cpu_started, began = time.process_time(), time.perf_counter()
+    await asyncio.sleep(seconds)
+    return (time.process_time() - cpu_started) / (time.perf_counter() - began)
+
+
+async def _run_at_rate(call, rate: float, seconds: float, idle_cpu: float):
+    # Jobs start on a fixed schedule whether or not earlier ones finished, like APScheduler
+    latencies = []
+
+    async def job():
+        started = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - started)
+
+    jobs = int(rate * seconds)
+    tasks = []
+    cpu_started, began = time.process_time(), time.perf_counter()
+    for i in range(jobs):
+        delay = began + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(job()))
+    await asyncio.gather(*tasks)
+    cpu = time.process_time() - cpu_started - idle_cpu * (time.perf_counter() - began)
+    return latencies, max(cpu, 0.0) / jobs
+
+
+def _report(label: str, rate: float, latencies, cpu_per_job: float):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{label:<22} {rate:>6g}/s {statistics.median(latencies) * 1000:9.2f} ms {p95 * 1000:9.2f} ms "
+          f"{cpu_per_job * 1000:9.2f} ms")
+
+
+async def main(rates, seconds: float):
+    from db.metadata.metadata_scheduler_manager import SchedulerManager
+
+    mcp = FastMCP("dispatch-bench")
+
+    @mcp.tool
+    def bench_noop(value: int) -> dict:
+        return {"value": value}
+
+    mcp.add_middleware(create_eunomia_middleware(policy_file=POLICY_FILE))
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        mcp.http_app(path="/mcp", transport="streamable-http"), host="127.0.0.1", port=port, log_level="warning"
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    client = Client(transport=StreamableHttpTransport(url=f"http://127.0.0.1:{port}/mcp", headers=HEADERS))
+    scheduler = SchedulerManager()
+    await scheduler.initialize(mcp, client, HEADERS)
+
+    async def over_http():
+        # What execute_job did per run: a whole MCP session (initialize handshake) around one call
+        async with client:
+            await client.call_tool(name="bench_noop", arguments={"value": 1})
+
+    async def in_process():
+        await scheduler.call_tool_in_process("bench_noop", {"value": 1})
+
+    await over_http()
+    await in_process()
+    idle_cpu = await _idle_cpu_per_second()
+    print(f"{'dispatch':<22} {'rate':>8} {'p50':>12} {'p95':>12} {'CPU/job':>12}")
+    for rate in rates:
+        for label, call in (("HTTP loopback (before)", over_http), ("in-process", in_process)):
+            latencies, cpu_per_job = await _run_at_rate(call, rate, seconds, idle_cpu)
+            _report(label, rate, latencies, cpu_per_job)
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 100])
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.rates, args.seconds))
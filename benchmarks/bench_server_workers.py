@@ -0,0 +1,118 @@
+"""
+HTTP load test of a running server: throughput and latency of MCP tools/call
+requests at a fixed client concurrency. Run it once per SERVER_WORKERS value
+to compare worker counts.
+
+    SERVER_WORKERS=4 python src/dbmcp/main.py &
+    python benchmarks/bench_server_workers.py --connection-id 1 [--concurrency 32] [--seconds 20]
+
+The default request runs the query tool on a 500-row generate_series, so the
+server's per-call work (policy, JSON encoding) dominates over the database.
+With --stream, each call opens a query stream and fetches the rest of it
+through its continuation token. Consecutive requests may land on different
+workers, so this also exercises continuation forwarding between workers.
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+import httpx
+
+DEFAULT_SQL = "SELECT g AS id, md5(g::text) AS token, now() AS at FROM generate_series(1, 500) g"
+HEADERS = {
+    "Authorization": "Bearer serdar",
+    "Accept": "application/json, text/event-stream",
+    "Content-Type": "application/json",
+}
+
+
+class _Load:
+    def __init__(self, client: httpx.AsyncClient, url: str):
+        self.client = client
+        self.url = url
+        self.ids = itertools.count(1)
+        self.headers = dict(HEADERS)
+
+    async def start(self):
+        # With SERVER_WORKERS=1 the server keeps MCP sessions; stateless workers simply answer without one
+        response = await self.client.post(self.url, headers=self.headers, json={
+            "jsonrpc": "2.0", "id": next(self.ids), "method": "initialize",
+            "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+                       "clientInfo": {"name": "bench_server_workers", "version": "1"}},
+        })
+        response.raise_for_status()
+        session_id = response.headers.get("mcp-session-id")
+        if session_id:
+            self.headers["mcp-session-id"] = session_id
+            await self.client.post(self.url, headers=self.headers,
+                                   json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        response = await self.client.post(self.url, headers=self.headers, json={
+            "jsonrpc": "2.0", "id": next(self.ids), "method": "tools/call",
+            "params": {"name": name, "arguments": arguments},
+        })
+        response.raise_for_status()
+        message = response.json()
+        if "error" in message or message["result"].get("isError"):
+            raise RuntimeError(str(message.get("error") or message["result"]["content"])[:200])
+        return message["result"]
+
+
+async def _one_query(load: _Load, connection_id: int, sql: str):
+    await load.call_tool("query", {"connection_id": connection_id, "query": sql})
+
+
+async def _one_stream(load: _Load, connection_id: int, sql: str):
+    result = await load.call_tool("query", {"connection_id": connection_id, "query": sql, "stream": True, "max_rows": 100})
+    token = result["structuredContent"]["continuation_token"]
+    while token:
+        result = await load.call_tool("query", {"connection_id": connection_id, "continuation_token": token, "max_rows": 100})
+        token = result["structuredContent"]["continuation_token"]
+
+
+async def main(url: str, connection_id: int, sql: str, concurrency: int, seconds: float, stream: bool):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        load = _Load(client, url)
+        await load.start()
+        one = _one_stream if stream else _one_query
+        await one(load, connection_id, sql)
+
+        latencies, errors = [], []
+        deadline = time.perf_counter() + seconds
+
+        async def user():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    await one(load, connection_id, sql)
+                    latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors.append(str(e))
+
+        began = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else float("nan")
+    print(f"{'calls':>7} {'errors':>7} {'calls/s':>9} {'p50':>10} {'p95':>10}")
+    print(f"{len(latencies):>7} {len(errors):>7} {len(latencies) / elapsed:>9.1f} "
+          f"{statistics.median(latencies) * 1000 if latencies else float('nan'):>7.1f} ms {p95 * 1000:>7.1f} ms")
+    if errors:
+        print("first error:", errors[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000/mcp")
+    parser.add_argument("--connection-id", type=int, required=True)
+    parser.add_argument("--sql", default=DEFAULT_SQL)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.connection_id, args.sql, args.concurrency, args.seconds, args.stream))
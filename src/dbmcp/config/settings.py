@@ -35,6 +35,32 @@ class Settings(BaseSettings):
     metadata_db_password: str = Field(default="serdar")
     metadata_db_url: Optional[str] = None
     metadata_duckdb_path: str = Field(default="metadata.duckdb")
+    metadata_write_batch_size: int = Field(default=256)
+    metadata_write_batch_delay_ms: int = Field(default=5)
+
+    # Multi-worker mode: server_workers uvicorn processes share the HTTP socket; the
+    # supervisor process owns the DuckDB file and serves metadata calls on metadata_ipc_path
+    # (default: a socket in a private 0700 temp directory). Per-target pool sizes, admission
+    # concurrency and query_stream_max_open are divided among the workers and must each be
+    # at least server_workers (checked at startup).
+    server_workers: int = Field(default=1)
+    server_worker_shutdown_seconds: float = Field(default=10.0)
+    metadata_ipc_path: Optional[str] = Field(default=None)
+
+    # Fleet collectors
+    collector_max_concurrency: int = Field(default=16)
+    collector_target_timeout_seconds: float = Field(default=30.0)
+
+    # Fan-out query tool (same SQL on many targets)
+    fanout_max_concurrency: int = Field(default=8)
+    fanout_target_timeout_seconds: float = Field(default=30.0)
+    fanout_max_rows_per_target: int = Field(default=1000)
+
+    # Trend retention
+    trend_retention_days: int = Field(default=90)
+    trend_archive_dir: str = Field(default="trend_archive")
+    metrics_retention_days: int = Field(default=14)
+    job_runs_retention_days: int = Field(default=30)
 
     # Encryption
     encryption_key: Optional[str] = None
@@ -49,6 +75,65 @@ class Settings(BaseSettings):
     # DB Pool
     db_pool_min_size: int = Field(default=1)
     db_pool_max_size: int = Field(default=5)
+    db_connect_timeout_seconds: float = Field(default=10.0)
+    # Pools are opened on first use, shrink to min size after max_inactive, and are
+    # closed (LRU first) after idle_ttl or when more than max_open_pools are open
+    db_lazy_connect: bool = Field(default=True)
+    db_pool_max_inactive_seconds: float = Field(default=300.0)
+    db_pool_idle_ttl_seconds: float = Field(default=900.0)
+    db_max_open_pools: int = Field(default=64)
+
+    # Per-target admission control: at most max_concurrency calls run against one
+    # target (None -> the target's pool max size); the rest wait in a priority queue
+    # of max_queue entries for up to queue_timeout before being rejected
+    db_admission_max_concurrency: Optional[int] = Field(default=None)
+    db_admission_max_queue: int = Field(default=100)
+    db_admission_queue_timeout_seconds: float = Field(default=30.0)
+
+    # Catalog (tables/columns/indexes) is cached per target. On access, at most once per
+    # check interval, a cheap fingerprint (pg_stat tuple counters of the catalogs) is read;
+    # only relations whose version changed are reloaded. Per-relation versions are
+    # re-checked at least once per max age regardless of the fingerprint.
+    catalog_cache_enabled: bool = Field(default=True)
+    catalog_cache_check_interval_seconds: float = Field(default=5.0)
+    catalog_cache_max_age_seconds: float = Field(default=300.0)
+
+    # Every tool call gets this deadline (clients may shorten it with X-Request-Timeout);
+    # the remaining time bounds every query (asyncpg timeout, cancelled on the server when it passes)
+    tool_call_timeout_seconds: float = Field(default=300.0)
+
+    # DB Pool health monitor / circuit breaker
+    db_health_check_interval_seconds: float = Field(default=15.0)
+    db_health_probe_timeout_seconds: float = Field(default=5.0)
+    db_breaker_failure_threshold: int = Field(default=3)
+    db_reconnect_backoff_base_seconds: float = Field(default=1.0)
+    db_reconnect_backoff_max_seconds: float = Field(default=60.0)
+
+    # Streaming query (server-side cursor) limits
+    query_stream_max_rows: int = Field(default=1000)
+    query_stream_max_bytes: int = Field(default=1_048_576)
+    query_stream_fetch_size: int = Field(default=200)
+    query_stream_ttl_seconds: float = Field(default=120.0)
+    query_stream_max_open: int = Field(default=16)
+
+    # Scheduled jobs call tools in-process through the server's middleware chain
+    # ("in_process") or through the MCP HTTP endpoint ("http")
+    scheduler_dispatch: str = Field(default="in_process")
+    # Job route'ları değişikliği anında uygular; bu aralıkta tablo ile tam karşılaştırma yapılır
+    scheduler_reconcile_interval_seconds: int = Field(default=60)
+    # Birden fazla süreçte scheduler yalnızca kilidi tutan süreçte çalışır (varsayılan: <duckdb path>.scheduler.lock)
+    scheduler_leader_election: bool = Field(default=True)
+    scheduler_lock_path: Optional[str] = Field(default=None)
+    scheduler_leader_poll_seconds: float = Field(default=5.0)
+    # Takipçide yapılan job değişiklikleri <lock path>.changes dosyasıyla bildirilir; lider bu aralıkla kontrol eder
+    scheduler_change_poll_seconds: float = Field(default=1.0)
+
+    # Tool result serialization: compact drops indentation, structured returns plain JSON
+    # plus structured_content instead of a markdown block; payloads with at least
+    # offload_rows rows are encoded in a worker thread
+    tool_result_compact: bool = Field(default=False)
+    tool_result_structured: bool = Field(default=False)
+    tool_result_offload_rows: int = Field(default=2000)
 
     eunomia_policy_file: Optional[str] = None
 
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from config.settings import get_settings
+from db.postgresql.postgresql_manager import postgresql_manager
+from db.metadata.metadata_trend_manager import trend_manager
+
+logger = logging.getLogger(__name__)
+
+DB_SIZE_SQL = """
+    SELECT
+        current_database() AS dbname,
+        pg_database_size(current_database()) AS size_bytes;
+"""
+
+TABLE_SIZE_SQL = """
+    SELECT current_database()                                           AS dbname,
+           schemaname,
+           relname,
+           pg_total_relation_size(format('%I.%I', schemaname, relname)) AS size_bytes
+    FROM pg_stat_user_tables;
+"""
+
+
+class CapacityCollector:
+    """Takes capacity snapshots of every active pool concurrently and bulk-writes them."""
+
+    async def collect_connection(self, connection_id: int, include_tables: bool = True) -> List[Dict[str, Any]]:
+        """Reads db (and optionally table) sizes of one target as snapshot rows."""
+        rows = []
+        for r in await postgresql_manager.execute_query(connection_id, DB_SIZE_SQL):
+            rows.append({
+                "connection_id": connection_id,
+                "scope": "db",
+                "dbname": r["dbname"],
+                "schemaname": None,
+                "relname": None,
+                "size_bytes": r["size_bytes"],
+            })
+        if include_tables:
+            for r in await postgresql_manager.execute_query(connection_id, TABLE_SIZE_SQL):
+                rows.append({
+                    "connection_id": connection_id,
+                    "scope": "table",
+                    "dbname": r["dbname"],
+                    "schemaname": r["schemaname"],
+                    "relname": r["relname"],
+                    "size_bytes": r["size_bytes"],
+                })
+        return rows
+
+    async def collect_all(
+            self,
+            max_concurrency: Optional[int] = None,
+            timeout_seconds: Optional[float] = None,
+            include_tables: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Snapshots every connected pool in postgresql_manager.connections, at most
+        max_concurrency targets at a time and each bounded by timeout_seconds, then
+        writes all rows in one transaction. Failed targets are reported, not raised.
+        """
+        settings = get_settings()
+        max_concurrency = max(1, max_concurrency or settings.collector_max_concurrency)
+        timeout_seconds = timeout_seconds or settings.collector_target_timeout_seconds
+
+        targets = [cid for cid, dbc in list(postgresql_manager.connections.items()) if dbc.connected]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        started = time.monotonic()
+
+        async def collect_one(connection_id: int):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self.collect_connection(connection_id, include_tables),
+                    timeout=timeout_seconds,
+                )
+
+        results = await asyncio.gather(*(collect_one(cid) for cid in targets), return_exceptions=True)
+
+        rows: List[Dict[str, Any]] = []
+        failed = []
+        for connection_id, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                error = "timeout" if isinstance(result, asyncio.TimeoutError) else str(result)
+                logger.warning("Capacity snapshot failed for id=%s: %s", connection_id, error)
+                failed.append({"connection_id": connection_id, "error": error})
+            else:
+                rows.extend(result)
+
+        written = await trend_manager.add_capacity_snapshots(rows)
+
+        return {
+            "targets": len(targets),
+            "succeeded": len(targets) - len(failed),
+            "failed": failed,
+            "rows_written": written,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+        }
+
+
+capacity_collector = CapacityCollector()  # Singleton
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from config.settings import get_settings
+from db.postgresql.postgresql_manager import postgresql_manager
+from db.metadata.metadata_metrics_manager import metrics_manager
+
+logger = logging.getLogger(__name__)
+
+# clock_timestamp() stamps each sample with the target's own clock, so intervals stay
+# exact no matter how long the round takes to be written
+DATABASE_SQL = """
+    SELECT clock_timestamp() AS sample_ts,
+           datname,
+           numbackends,
+           xact_commit,
+           xact_rollback,
+           blks_read,
+           blks_hit,
+           tup_returned,
+           tup_fetched,
+           tup_inserted,
+           tup_updated,
+           tup_deleted,
+           deadlocks,
+           temp_files,
+           temp_bytes,
+           stats_reset
+    FROM pg_stat_database
+    WHERE datname IS NOT NULL;
+"""
+
+# PostgreSQL 17 moved the checkpoint counters from pg_stat_bgwriter to pg_stat_checkpointer
+CHECKPOINTER_SQL = """
+    SELECT clock_timestamp()  AS sample_ts,
+           c.num_timed        AS checkpoints_timed,
+           c.num_requested    AS checkpoints_req,
+           c.buffers_written  AS buffers_checkpoint,
+           b.buffers_clean,
+           b.maxwritten_clean,
+           c.write_time       AS checkpoint_write_time,
+           c.sync_time        AS checkpoint_sync_time,
+           c.stats_reset
+    FROM pg_stat_checkpointer c
+    CROSS JOIN pg_stat_bgwriter b;
+"""
+
+BGWRITER_SQL = """
+    SELECT clock_timestamp() AS sample_ts,
+           checkpoints_timed,
+           checkpoints_req,
+           buffers_checkpoint,
+           buffers_clean,
+           maxwritten_clean,
+           checkpoint_write_time,
+           checkpoint_sync_time,
+           stats_reset
+    FROM pg_stat_bgwriter;
+"""
+
+TABLE_SQL = """
+    SELECT clock_timestamp() AS sample_ts,
+           schemaname,
+           relname,
+           seq_scan,
+           seq_tup_read,
+           idx_scan,
+           idx_tup_fetch,
+           n_tup_ins,
+           n_tup_upd,
+           n_tup_del,
+           n_live_tup,
+           n_dead_tup
+    FROM pg_stat_user_tables;
+"""
+
+
+# Counters only (showtext := false); texts are fetched once per new queryid. Entries of all
+# users/toplevel flags are folded into one row per (database, queryid).
+STATEMENT_SQL = """
+    SELECT clock_timestamp()          AS sample_ts,
+           d.datname,
+           s.queryid,
+           sum(s.calls)               AS calls,
+           sum(s.{total_time})        AS total_exec_time,
+           sum(s.rows)                AS rows,
+           sum(s.shared_blks_hit)     AS shared_blks_hit,
+           sum(s.shared_blks_read)    AS shared_blks_read,
+           sum(s.temp_blks_written)   AS temp_blks_written,
+           {wal_bytes}                AS wal_bytes,
+           {stats_reset}              AS stats_reset
+    FROM {schema}.pg_stat_statements(false) s
+    JOIN pg_database d ON d.oid = s.dbid
+    WHERE s.queryid IS NOT NULL
+    GROUP BY d.datname, s.queryid;
+"""
+
+STATEMENT_TEXT_SQL = """
+    SELECT DISTINCT ON (d.datname, s.queryid)
+           d.datname,
+           s.queryid,
+           s.query
+    FROM {schema}.pg_stat_statements s
+    JOIN pg_database d ON d.oid = s.dbid
+    WHERE s.queryid = ANY($1::bigint[])
+      AND d.datname = ANY($2::text[]);
+"""
+
+SERVER_INFO_SQL = """
+    SELECT current_setting('server_version_num')::int AS version_num,
+           (SELECT quote_ident(n.nspname)
+            FROM pg_extension e
+            JOIN pg_namespace n ON n.oid = e.extnamespace
+            WHERE e.extname = 'pg_stat_statements') AS pgss_schema;
+"""
+
+
+def statement_sql(version_num: int, schema: str) -> str:
+    """pg_stat_statements columns per server version (total_exec_time and wal_bytes from 13, info view from 14)."""
+    return STATEMENT_SQL.format(
+        schema=schema,
+        total_time="total_exec_time" if version_num >= 130000 else "total_time",
+        wal_bytes="sum(s.wal_bytes)::bigint" if version_num >= 130000 else "NULL::bigint",
+        stats_reset=f"(SELECT stats_reset FROM {schema}.pg_stat_statements_info)"
+        if version_num >= 140000 else "NULL::timestamptz",
+    )
+
+
+class MetricsCollector:
+    """Samples cumulative pg_stat_* counters of active pools concurrently and bulk-writes them."""
+
+    async def collect_connection(
+            self,
+            connection_id: int,
+            include_tables: bool = True,
+            include_statements: bool = True,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Reads one sample of database, checkpointer and optionally table and
+        pg_stat_statements counters of one target (statements are skipped when
+        the extension is not installed).
+        """
+        info = (await postgresql_manager.execute_query(connection_id, SERVER_INFO_SQL))[0]
+        version_num = info["version_num"]
+        checkpointer_sql = CHECKPOINTER_SQL if version_num >= 170000 else BGWRITER_SQL
+
+        def tag(rows):
+            return [{"connection_id": connection_id, **dict(r)} for r in rows]
+
+        sample = {
+            "database": tag(await postgresql_manager.execute_query(connection_id, DATABASE_SQL)),
+            "checkpointer": tag(await postgresql_manager.execute_query(connection_id, checkpointer_sql)),
+            "table": [],
+            "statement": [],
+            "statement_text": [],
+        }
+        if include_tables:
+            sample["table"] = tag(await postgresql_manager.execute_query(connection_id, TABLE_SQL))
+
+        schema = info["pgss_schema"]
+        if include_statements and schema:
+            sample["statement"] = tag(await postgresql_manager.execute_query(
+                connection_id, statement_sql(version_num, schema)
+            ))
+            unknown = await metrics_manager.get_unknown_queryids(connection_id, sample["statement"])
+            if unknown:
+                sample["statement_text"] = tag(await postgresql_manager.execute_query(
+                    connection_id,
+                    STATEMENT_TEXT_SQL.format(schema=schema),
+                    [k["queryid"] for k in unknown],
+                    list({k["datname"] for k in unknown}),
+                ))
+        return sample
+
+    async def collect(
+            self,
+            connection_id: Optional[int] = None,
+            max_concurrency: Optional[int] = None,
+            timeout_seconds: Optional[float] = None,
+            include_tables: bool = True,
+            include_statements: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Samples one connection, or every connected pool when connection_id is None,
+        at most max_concurrency targets at a time and each bounded by timeout_seconds,
+        then writes the round in one transaction. Failed targets are reported, not raised.
+        """
+        settings = get_settings()
+        max_concurrency = max(1, max_concurrency or settings.collector_max_concurrency)
+        timeout_seconds = timeout_seconds or settings.collector_target_timeout_seconds
+
+        if connection_id is not None:
+            targets = [connection_id]
+        else:
+            targets = [cid for cid, dbc in list(postgresql_manager.connections.items()) if dbc.connected]
+        semaphore = asyncio.Semaphore(max_concurrency)
+        started = time.monotonic()
+
+        async def collect_one(cid: int):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self.collect_connection(cid, include_tables, include_statements),
+                    timeout=timeout_seconds,
+                )
+
+        results = await asyncio.gather(*(collect_one(cid) for cid in targets), return_exceptions=True)
+
+        database_rows, checkpointer_rows, table_rows, statement_rows, statement_texts = [], [], [], [], []
+        failed = []
+        for cid, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                error = "timeout" if isinstance(result, asyncio.TimeoutError) else str(result)
+                logger.warning("Metrics sample failed for id=%s: %s", cid, error)
+                failed.append({"connection_id": cid, "error": error})
+            else:
+                database_rows.extend(result["database"])
+                checkpointer_rows.extend(result["checkpointer"])
+                table_rows.extend(result["table"])
+                statement_rows.extend(result["statement"])
+                statement_texts.extend(result["statement_text"])
+
+        written = await metrics_manager.add_samples(
+            database_rows, checkpointer_rows, table_rows, statement_rows, statement_texts
+        )
+
+        return {
+            "targets": len(targets),
+            "succeeded": len(targets) - len(failed),
+            "failed": failed,
+            "rows_written": written,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+        }
+
+
+metrics_collector = MetricsCollector()  # Singleton
@@ -0,0 +1,71 @@
+# leader_election.py
+import logging
+import os
+import socket
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: tek süreçli çalışma varsayılır
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """
+    Aynı makinedeki sunucu süreçleri arasında dış servise ihtiyaç duymayan lider
+    seçimi. Lider, kilit dosyası üzerinde exclusive flock tutan süreçtir; süreç
+    çöktüğünde veya kapandığında işletim sistemi kilidi hemen bırakır, bu yüzden
+    bekleyen süreçlerden biri bir sonraki denemesinde liderliği alır.
+    Not: flock ağ dosya sistemlerinde (NFS) güvenilir değildir; kilit dosyası yerel diskte olmalıdır.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            logger.warning("fcntl is not available; assuming a single process and taking scheduler leadership")
+            self._fd = -1
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+
+        # Teşhis için: kilidi hangi sürecin tuttuğu
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def holder(self) -> Optional[str]:
+        try:
+            with open(self.path) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def release(self):
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+        self._fd = None
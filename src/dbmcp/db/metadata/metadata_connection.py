@@ -1,33 +1,97 @@
 import logging
 import duckdb
 import asyncio
-import re
+import threading
 from config.settings import get_settings
+from .metadata_ipc import MetadataClient
 from typing import Optional, Any, Tuple, List, Dict
 
 logger = logging.getLogger(__name__)
 
+# Shared with the compaction in archive_snapshots, which rebuilds the table with the same definition
+CAPACITY_SNAPSHOT_COLUMNS = """
+    snapshot_ts     TIMESTAMPTZ NOT NULL DEFAULT now(),
+    scope           VARCHAR        NOT NULL,
+    dbname          VARCHAR        NOT NULL,
+    schemaname      VARCHAR,
+    relname         VARCHAR,
+    size_bytes      BIGINT      NOT NULL,
+    connection_id   INTEGER
+"""
+
+
+class _WriteRequest:
+    """A unit of work for the writer task: statements applied atomically."""
+
+    def __init__(self, statements: List[Tuple[str, Tuple]], fetch_one: bool, future: Optional[asyncio.Future],
+                 relations: Optional[Dict[str, Any]] = None, isolated: bool = False):
+        self.statements = statements
+        self.fetch_one = fetch_one
+        self.future = future
+        # Arrow tables registered as views on the writer cursor while the statements run
+        self.relations = relations or {}
+        # Committed in a transaction of its own: never grouped with other requests, never retried
+        self.isolated = isolated
+
+
 class MetadataConnection:
 
     def __init__(self):
         self._db_path: Optional[str] = None
-        
+        # Long-lived connection opened once in initialize(). Worker threads of
+        # asyncio.to_thread get their own cursor (a duplicate of this connection
+        # that shares the same database instance, catalog and WAL).
+        self._conn: Optional[duckdb.DuckDBPyConnection] = None
+        self._local = threading.local()
+        self._cursors: List[duckdb.DuckDBPyConnection] = []
+        self._cursors_lock = threading.Lock()
+        # Single-writer queue: every write goes through one task that commits
+        # queued statements in batches (group commit) instead of racing for
+        # DuckDB's writer lock from many threads.
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # Multi-worker mode: DuckDB allows one read-write process, so worker processes
+        # forward every call to the owner (supervisor) process over a Unix socket.
+        self._owner_path: Optional[str] = None
+        self._owner: Optional[MetadataClient] = None
+
+    def use_owner(self, path: str):
+        """Makes this process a client of the metadata owner listening on path (call before initialize)."""
+        self._owner_path = path
+
+    @property
+    def is_owner_client(self) -> bool:
+        return self._owner_path is not None
+
+    @property
+    def owner_path(self) -> Optional[str]:
+        return self._owner_path
+
     async def initialize(self):
         """
         Initializes the DuckDB database. 
-        Ensures the database file exists and schemas are created.
+        Opens the long-lived connection and ensures schemas are created.
         """
+        if self._owner_path is not None:
+            self._owner = MetadataClient(self._owner_path)
+            await self._owner.connect()
+            logger.info(f"Using metadata owner process at {self._owner_path}")
+            return
+
         settings = get_settings()
         self._db_path = settings.metadata_duckdb_path
         
-        # Connect to ensure file exists and create tables if needed
+        # Connect once; the file is opened and the WAL replayed only here.
         try:
-             with duckdb.connect(self._db_path) as conn:
-                self._create_schema(conn)
+            self._conn = duckdb.connect(self._db_path)
+            self._create_schema(self._conn)
         except Exception as e:
             logger.error(f"Failed to initialize DuckDB metadata: {e}")
             raise
 
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer_loop(), name="duckdb-metadata-writer")
+
     def _create_schema(self, conn: duckdb.DuckDBPyConnection):
         """Creates the necessary tables if they don't exist."""
         
@@ -60,6 +124,20 @@ class MetadataConnection:
             );
         """)
 
+        # Per-target pool limits; NULL falls back to db_pool_min_size / db_pool_max_size
+        conn.execute("ALTER TABLE repository.database_connections ADD COLUMN IF NOT EXISTS pool_min_size INTEGER;")
+        conn.execute("ALTER TABLE repository.database_connections ADD COLUMN IF NOT EXISTS pool_max_size INTEGER;")
+        # Free-form labels (e.g. 'prod', 'eu-west') used to address a group of targets at once.
+        # Kept in a side table: DuckDB rewrites LIST column updates as delete+insert, which
+        # conflicts with the primary key on database_connections.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS repository.connection_tags (
+                connection_id INTEGER NOT NULL,
+                tag VARCHAR NOT NULL,
+                PRIMARY KEY (connection_id, tag)
+            );
+        """)
+
         # --- LLM Providers Settings ---
         conn.execute("""
             CREATE TABLE IF NOT EXISTS repository.llm_providers (
@@ -99,68 +177,377 @@ class MetadataConnection:
             );
         """)
 
+        # Per-job run control (passed to APScheduler): overlapping instances, coalescing
+        # of missed runs, misfire grace and random start jitter
+        conn.execute("ALTER TABLE scheduler.scheduled_jobs ADD COLUMN IF NOT EXISTS max_instances INTEGER DEFAULT 1;")
+        conn.execute("ALTER TABLE scheduler.scheduled_jobs ADD COLUMN IF NOT EXISTS coalesce_runs BOOLEAN DEFAULT TRUE;")
+        conn.execute("ALTER TABLE scheduler.scheduled_jobs ADD COLUMN IF NOT EXISTS misfire_grace_seconds INTEGER;")
+        conn.execute("ALTER TABLE scheduler.scheduled_jobs ADD COLUMN IF NOT EXISTS jitter_seconds INTEGER;")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduler.job_runs (
+                job_id          INTEGER NOT NULL,
+                job_name        VARCHAR NOT NULL,
+                tool_name       VARCHAR,
+                scheduled_at    TIMESTAMPTZ,
+                started_at      TIMESTAMPTZ NOT NULL,
+                finished_at     TIMESTAMPTZ,
+                duration_ms     DOUBLE,
+                status          VARCHAR NOT NULL CHECK (status IN ('success','error','skipped','missed')),
+                error           VARCHAR,
+                result_bytes    BIGINT
+            );
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON scheduler.job_runs (job_id, started_at);")
+
         # --- Trends Schema ---
         conn.execute("CREATE SCHEMA IF NOT EXISTS trends;")
         
+        conn.execute(f"CREATE TABLE IF NOT EXISTS trends.pg_capacity_snapshots ({CAPACITY_SNAPSHOT_COLUMNS});")
+        # Snapshots taken before connection_id existed keep NULL and are not returned by trend queries.
+        # No ART index: DuckDB uses those for point lookups only. collect_all appends every connection
+        # in one batch, so archival (archive_snapshots) rewrites the live rows ordered by
+        # (connection_id, scope, snapshot_ts); min/max zonemaps then prune row groups by connection.
+        conn.execute("ALTER TABLE trends.pg_capacity_snapshots ADD COLUMN IF NOT EXISTS connection_id INTEGER;")
+
+        # Daily rollup maintained incrementally on ingest; trend tools read this instead of raw rows.
+        # schemaname/relname are '' for database scope so every key column is non-NULL.
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS trends.pg_capacity_daily (
+                connection_id   INTEGER     NOT NULL,
+                scope           VARCHAR     NOT NULL,
+                dbname          VARCHAR     NOT NULL,
+                schemaname      VARCHAR     NOT NULL,
+                relname         VARCHAR     NOT NULL,
+                day             DATE        NOT NULL,
+                min_size        BIGINT      NOT NULL,
+                max_size        BIGINT      NOT NULL,
+                last_size       BIGINT      NOT NULL,
+                last_ts         TIMESTAMPTZ NOT NULL,
+                samples         INTEGER     NOT NULL
+            );
+        """)
+
+        # One-time backfill for metadata files that already hold raw snapshots
+        rollup_rows = conn.execute("SELECT count(*) FROM trends.pg_capacity_daily").fetchone()[0]
+        if rollup_rows == 0:
+            conn.execute("""
+                INSERT INTO trends.pg_capacity_daily
+                SELECT connection_id, scope, dbname, coalesce(schemaname, ''), coalesce(relname, ''),
+                       snapshot_ts::date, min(size_bytes), max(size_bytes),
+                       arg_max(size_bytes, snapshot_ts), max(snapshot_ts), count(*)
+                FROM trends.pg_capacity_snapshots
+                WHERE connection_id IS NOT NULL
+                GROUP BY ALL;
+            """)
+
+        # --- Metrics Schema ---
+        # Raw cumulative counters sampled from pg_stat_* views; rates are derived at query time.
+        conn.execute("CREATE SCHEMA IF NOT EXISTS metrics;")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics.pg_database_samples (
+                connection_id   INTEGER     NOT NULL,
+                sample_ts       TIMESTAMPTZ NOT NULL,
+                datname         VARCHAR     NOT NULL,
+                numbackends     INTEGER,
+                xact_commit     BIGINT,
+                xact_rollback   BIGINT,
+                blks_read       BIGINT,
+                blks_hit        BIGINT,
+                tup_returned    BIGINT,
+                tup_fetched     BIGINT,
+                tup_inserted    BIGINT,
+                tup_updated     BIGINT,
+                tup_deleted     BIGINT,
+                deadlocks       BIGINT,
+                temp_files      BIGINT,
+                temp_bytes      BIGINT,
+                stats_reset     TIMESTAMPTZ
+            );
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics.pg_checkpointer_samples (
+                connection_id         INTEGER     NOT NULL,
+                sample_ts             TIMESTAMPTZ NOT NULL,
+                checkpoints_timed     BIGINT,
+                checkpoints_req       BIGINT,
+                buffers_checkpoint    BIGINT,
+                buffers_clean         BIGINT,
+                maxwritten_clean      BIGINT,
+                checkpoint_write_time DOUBLE,
+                checkpoint_sync_time  DOUBLE,
+                stats_reset           TIMESTAMPTZ
+            );
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics.pg_table_samples (
+                connection_id   INTEGER     NOT NULL,
+                sample_ts       TIMESTAMPTZ NOT NULL,
+                schemaname      VARCHAR     NOT NULL,
+                relname         VARCHAR     NOT NULL,
+                seq_scan        BIGINT,
+                seq_tup_read    BIGINT,
+                idx_scan        BIGINT,
+                idx_tup_fetch   BIGINT,
+                n_tup_ins       BIGINT,
+                n_tup_upd       BIGINT,
+                n_tup_del       BIGINT,
+                n_live_tup      BIGINT,
+                n_dead_tup      BIGINT
+            );
+        """)
+
+        # pg_stat_statements counters aggregated per (datname, queryid); texts are stored once
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics.pg_statement_samples (
+                connection_id       INTEGER     NOT NULL,
+                sample_ts           TIMESTAMPTZ NOT NULL,
+                datname             VARCHAR     NOT NULL,
+                queryid             BIGINT      NOT NULL,
+                calls               BIGINT,
+                total_exec_time     DOUBLE,
+                rows                BIGINT,
+                shared_blks_hit     BIGINT,
+                shared_blks_read    BIGINT,
+                temp_blks_written   BIGINT,
+                wal_bytes           BIGINT,
+                stats_reset         TIMESTAMPTZ
+            );
+        """)
+
         conn.execute("""
-            CREATE TABLE IF NOT EXISTS trends.pg_capacity_snapshots (
-                snapshot_ts     TIMESTAMPTZ NOT NULL DEFAULT now(),
-                scope           VARCHAR        NOT NULL, 
-                dbname          VARCHAR        NOT NULL,
-                schemaname      VARCHAR,
-                relname         VARCHAR,
-                size_bytes      BIGINT      NOT NULL
+            CREATE TABLE IF NOT EXISTS metrics.pg_statement_texts (
+                connection_id   INTEGER     NOT NULL,
+                datname         VARCHAR     NOT NULL,
+                queryid         BIGINT      NOT NULL,
+                query           VARCHAR,
+                first_seen      TIMESTAMPTZ DEFAULT now()
             );
         """)
         
         logger.info("DuckDB schema initialized.")
 
     async def close(self):
-        pass
+        """Flushes pending writes, closes every handed-out cursor and then the shared connection."""
+        if self._owner is not None:
+            await self._owner.close()
+            self._owner = None
+            return
+
+        if self._writer_task is not None:
+            await self._write_queue.put(None)  # sentinel: drain and stop
+            await self._writer_task
+            self._writer_task = None
+            self._write_queue = None
+
+        with self._cursors_lock:
+            cursors, self._cursors = self._cursors, []
+        for cursor in cursors:
+            try:
+                cursor.close()
+            except Exception as e:
+                logger.warning(f"Failed to close DuckDB cursor: {e}")
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        # Forget thread-local cursors so a later initialize() hands out fresh ones.
+        self._local = threading.local()
+        logger.info("DuckDB metadata connection closed.")
 
     def get_connection(self) -> duckdb.DuckDBPyConnection:
-        """Returns a new synchronous connection to the DuckDB database."""
-        if not self._db_path:
+        """Returns the calling thread's cursor on the shared DuckDB connection."""
+        if self._owner_path is not None:
+            raise RuntimeError("Direct DuckDB access is only available in the metadata owner process.")
+        if self._conn is None:
              raise RuntimeError("MetadataConnection not initialized. Call initialize() first.")
-        return duckdb.connect(self._db_path)
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._conn.cursor()
+            self._local.cursor = cursor
+            with self._cursors_lock:
+                self._cursors.append(cursor)
+        return cursor
+
+    def _run_statement(self, cursor: duckdb.DuckDBPyConnection, query: str, params: Tuple = (),
+                       fetch_one: bool = False, fetch_all: bool = False) -> Any:
+        # DuckDB binds Postgres-style $n placeholders natively, so a parameter may be referenced more than once
+        cursor.execute(query, params)
+
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+        if fetch_one:
+            row = cursor.fetchone()
+            if row:
+                return dict(zip(columns, row))
+            return None
+
+        if fetch_all:
+            rows = cursor.fetchall()
+            results = []
+            for row in rows:
+                results.append(dict(zip(columns, row)))
+            return results
+
+        return None
 
     def _execute_duckdb_sync(self, query: str, params: Tuple = (), fetch_one: bool = False, fetch_all: bool = False) -> Any:
-        conn = self.get_connection()
+        cursor = self.get_connection()
         try:
-            # Replace $n with ?
-            duck_query = re.sub(r'\$\d+', '?', query)
-            
-            cursor = conn.cursor()
-            cursor.execute(duck_query, params)
-            
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
-            
-            if fetch_one:
-                row = cursor.fetchone()
-                if row:
-                    return dict(zip(columns, row))
-                return None
-            
-            if fetch_all:
-                rows = cursor.fetchall()
-                results = []
-                for row in rows:
-                    results.append(dict(zip(columns, row)))
-                return results
-                
-            return None
-            
+            return self._run_statement(cursor, query, params, fetch_one, fetch_all)
         except Exception as e:
             logger.error(f"DuckDB Execution Error: {e}\nQuery: {query}\nParams: {params}")
             raise
-        finally:
-            conn.close()
 
     async def execute_query(self, query: str, *params, fetch_one: bool = False, fetch_all: bool = False):
         """
         Executes a query against DuckDB asynchronously (in a thread).
-        Supports Postgres-style $n placeholders by converting them to ?.
+        Supports Postgres-style $n placeholders.
         """
+        if self._owner is not None:
+            return await self._owner.call("execute_query", query, *params, fetch_one=fetch_one, fetch_all=fetch_all)
         return await asyncio.to_thread(self._execute_duckdb_sync, query, params, fetch_one, fetch_all)
 
+    def _fetch_numpy_sync(self, query: str, params: Tuple = ()) -> Dict[str, Any]:
+        cursor = self.get_connection()
+        try:
+            return cursor.execute(query, params).fetchnumpy()
+        except Exception as e:
+            logger.error(f"DuckDB Execution Error: {e}\nQuery: {query}\nParams: {params}")
+            raise
+
+    async def fetch_numpy(self, query: str, *params) -> Dict[str, Any]:
+        """Executes a query and returns its columns as NumPy arrays (no per-row dicts)."""
+        if self._owner is not None:
+            return await self._owner.call("fetch_numpy", query, *params)
+        return await asyncio.to_thread(self._fetch_numpy_sync, query, params)
+
+    # ------------------------------------------------------------------ #
+    # Single-writer queue
+    # ------------------------------------------------------------------ #
+    async def execute_write(self, query: str, *params, fetch_one: bool = False, wait: bool = True):
+        """
+        Queues a write statement for the writer task.
+        With wait=True the call returns once the batch containing it is committed
+        (and the RETURNING row if fetch_one=True); with wait=False it returns immediately.
+        """
+        return await self.execute_write_many([(query, params)], fetch_one=fetch_one, wait=wait)
+
+    async def execute_write_many(self, statements: List[Tuple[str, Tuple]], fetch_one: bool = False, wait: bool = True,
+                                 relations: Optional[Dict[str, Any]] = None, isolated: bool = False):
+        """
+        Queues several write statements that are applied atomically, in order.
+        If fetch_one=True, the first row returned by the last statement is returned.
+        relations maps view names to Arrow tables the statements can select from (bulk ingestion).
+        isolated=True commits them alone, outside group commit and without the per-request retry;
+        needed when a statement has effects outside the database (COPY ... TO writes files).
+        """
+        if self._owner is not None:
+            # wait=False stays fire-and-forget: the owner queues it without replying
+            return await self._owner.call("execute_write_many", list(statements), reply=wait,
+                                          fetch_one=fetch_one, wait=wait, relations=relations, isolated=isolated)
+        if self._write_queue is None:
+            raise RuntimeError("MetadataConnection not initialized. Call initialize() first.")
+
+        future = asyncio.get_running_loop().create_future() if wait else None
+        await self._write_queue.put(_WriteRequest(list(statements), fetch_one, future, relations, isolated))
+        if future is None:
+            return None
+        return await future
+
+    async def _writer_loop(self):
+        settings = get_settings()
+        batch_size = max(1, settings.metadata_write_batch_size)
+        batch_delay = max(0, settings.metadata_write_batch_delay_ms) / 1000.0
+        stopping = False
+        held: Optional[_WriteRequest] = None
+
+        while not stopping:
+            if held is not None:
+                request, held = held, None
+            else:
+                request = await self._write_queue.get()
+            if request is None:
+                break
+            batch = [request]
+
+            if not request.isolated:
+                # Short linger so writes finishing in the same instant share a commit
+                if batch_delay:
+                    await asyncio.sleep(batch_delay)
+                while len(batch) < batch_size:
+                    try:
+                        request = self._write_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    if request.isolated:
+                        # Commits on its own right after this batch
+                        held = request
+                        break
+                    batch.append(request)
+
+            try:
+                outcomes = await asyncio.to_thread(self._commit_batch_sync, batch)
+            except Exception as e:
+                outcomes = [(None, e)] * len(batch)
+
+            for request, (result, error) in zip(batch, outcomes):
+                if request.future is None:
+                    if error is not None:
+                        logger.error(f"DuckDB background write failed: {error}")
+                    continue
+                if request.future.done():
+                    continue
+                if error is not None:
+                    request.future.set_exception(error)
+                else:
+                    request.future.set_result(result)
+
+        logger.info("DuckDB metadata writer stopped.")
+
+    def _apply_request(self, cursor: duckdb.DuckDBPyConnection, request: _WriteRequest) -> Any:
+        for name, relation in request.relations.items():
+            cursor.register(name, relation)
+        try:
+            result = None
+            for query, params in request.statements:
+                result = self._run_statement(cursor, query, params, fetch_one=request.fetch_one)
+            return result
+        finally:
+            for name in request.relations:
+                cursor.unregister(name)
+
+    def _commit_batch_sync(self, batch: List[_WriteRequest]) -> List[Tuple[Any, Optional[Exception]]]:
+        """Applies a batch in one transaction; on failure, retries each request on its own."""
+        cursor = self.get_connection()
+        try:
+            cursor.execute("BEGIN TRANSACTION")
+            results = [self._apply_request(cursor, request) for request in batch]
+            cursor.execute("COMMIT")
+            return [(result, None) for result in results]
+        except Exception as e:
+            cursor.execute("ROLLBACK")
+            if len(batch) == 1:
+                logger.error(f"DuckDB Write Error: {e}\nStatements: {batch[0].statements}")
+                return [(None, e)]
+
+        # Isolate the failing request(s) so the rest of the batch still commits
+        outcomes = []
+        for request in batch:
+            try:
+                cursor.execute("BEGIN TRANSACTION")
+                result = self._apply_request(cursor, request)
+                cursor.execute("COMMIT")
+                outcomes.append((result, None))
+            except Exception as e:
+                cursor.execute("ROLLBACK")
+                logger.error(f"DuckDB Write Error: {e}\nStatements: {request.statements}")
+                outcomes.append((None, e))
+        return outcomes
+
 metadata_connection = MetadataConnection() #Singleton
\ No newline at end of file
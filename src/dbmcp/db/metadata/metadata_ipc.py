@@ -0,0 +1,365 @@
+# metadata_ipc.py
+import asyncio
+import builtins
+import datetime as dt
+import itertools
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Çerçeve: JSON uzunluğu ve ek sayısı, JSON gövdesi, ardından her ek için uzunluk + baytlar
+_HEADER = struct.Struct("!II")
+_ATTACHMENT = struct.Struct("!Q")
+_TAG = "__ipc__"
+
+# Owner sürecinin worker'lara açtığı MetadataConnection metodları
+OWNER_METHODS = {"execute_query", "fetch_numpy", "execute_write_many"}
+
+
+# ---------------------------------------------------------------------- #
+# Kodlama: yalnızca veri taşınır (pickle yok). JSON'un bilmediği tipler etiketli
+# nesnelere, büyük ikili veriler (bytes, NumPy dizileri, Arrow tabloları) eklere çevrilir.
+# Çözümleme hiçbir zaman keyfi sınıf oluşturmaz.
+# ---------------------------------------------------------------------- #
+def _encode(message: Any, fallback: Optional[Callable[[Any], Any]] = None) -> List[bytes]:
+    attachments: List[bytes] = []
+
+    def attach(data) -> int:
+        attachments.append(bytes(data))
+        return len(attachments) - 1
+
+    def default(value):
+        if isinstance(value, dt.datetime):
+            return {_TAG: "datetime", "v": value.isoformat()}
+        if isinstance(value, dt.date):
+            return {_TAG: "date", "v": value.isoformat()}
+        if isinstance(value, dt.time):
+            return {_TAG: "time", "v": value.isoformat()}
+        if isinstance(value, dt.timedelta):
+            return {_TAG: "timedelta", "v": [value.days, value.seconds, value.microseconds]}
+        if isinstance(value, Decimal):
+            return {_TAG: "decimal", "v": str(value)}
+        if isinstance(value, uuid.UUID):
+            return {_TAG: "uuid", "v": str(value)}
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return {_TAG: "bytes", "i": attach(value)}
+        if isinstance(value, np.ma.MaskedArray):
+            return {_TAG: "masked", "data": value.filled() if value.dtype != object else value.data,
+                    "mask": np.ma.getmaskarray(value)}
+        if isinstance(value, np.ndarray):
+            if value.dtype == object:
+                return {_TAG: "objects", "v": value.tolist()}
+            return {_TAG: "ndarray", "dtype": value.dtype.str, "shape": list(value.shape),
+                    "i": attach(np.ascontiguousarray(value).tobytes())}
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, (pa.Table, pa.RecordBatch)):
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, value.schema) as stream:
+                stream.write(value)
+            return {_TAG: "arrow", "i": attach(sink.getvalue())}
+        if fallback is not None:
+            return fallback(value)
+        raise TypeError(f"Type {type(value).__name__} cannot be sent over IPC")
+
+    body = json.dumps(message, default=default, separators=(",", ":")).encode()
+    frame = [_HEADER.pack(len(body), len(attachments)), body]
+    for data in attachments:
+        frame += [_ATTACHMENT.pack(len(data)), data]
+    return frame
+
+
+def _decoder(attachments: List[bytes]):
+    def decode(obj: dict):
+        tag = obj.get(_TAG)
+        if tag is None:
+            return obj
+        if tag == "datetime":
+            return dt.datetime.fromisoformat(obj["v"])
+        if tag == "date":
+            return dt.date.fromisoformat(obj["v"])
+        if tag == "time":
+            return dt.time.fromisoformat(obj["v"])
+        if tag == "timedelta":
+            return dt.timedelta(*obj["v"])
+        if tag == "decimal":
+            return Decimal(obj["v"])
+        if tag == "uuid":
+            return uuid.UUID(obj["v"])
+        if tag == "bytes":
+            return attachments[obj["i"]]
+        if tag == "ndarray":
+            return np.frombuffer(attachments[obj["i"]], dtype=np.dtype(obj["dtype"])).reshape(obj["shape"])
+        if tag == "objects":
+            array = np.empty(len(obj["v"]), dtype=object)
+            array[:] = obj["v"]
+            return array
+        if tag == "masked":
+            return np.ma.MaskedArray(obj["data"], mask=obj["mask"])
+        if tag == "arrow":
+            return pa.ipc.open_stream(attachments[obj["i"]]).read_all()
+        raise ValueError(f"Unknown metadata IPC value tag {tag!r}")
+    return decode
+
+
+async def _send(writer: asyncio.StreamWriter, message: Any, fallback: Optional[Callable[[Any], Any]] = None):
+    writer.writelines(_encode(message, fallback))
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Any:
+    length, count = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    body = await reader.readexactly(length)
+    attachments = []
+    for _ in range(count):
+        (size,) = _ATTACHMENT.unpack(await reader.readexactly(_ATTACHMENT.size))
+        attachments.append(await reader.readexactly(size))
+    return json.loads(body, object_hook=_decoder(attachments))
+
+
+def _error_payload(error: BaseException) -> Dict[str, str]:
+    return {"type": type(error).__name__, "message": str(error)}
+
+
+def _error_from_payload(payload: Dict[str, str]) -> BaseException:
+    """Hatalar tip adı ve mesajla taşınır; yalnızca duckdb'nin ve yerleşik istisna sınıfları yeniden kurulur."""
+    name, message = payload.get("type", ""), payload.get("message", "")
+    for module in (duckdb, builtins):
+        cls = getattr(module, name, None)
+        if isinstance(cls, type) and issubclass(cls, Exception):
+            try:
+                return cls(message)
+            except Exception:
+                break
+    return RuntimeError(f"{name}: {message}")
+
+
+class IpcServer:
+    """
+    Aynı makinedeki süreçlere bir nesnenin izin verilen async metodlarını Unix domain
+    socket üzerinden açar. Socket yalnızca sahibinin erişebildiği (0700) bir dizinde,
+    umask 077 altında oluşturulur; mesajlar veri olarak kodlanır, karşı taraftan gelen
+    bayt dizisi kod çalıştıramaz. fallback, kodlanamayan sonuç değerlerini çevirir
+    (verilmezse çağrı hata alır).
+    """
+
+    def __init__(self, target, methods: Set[str], fallback: Optional[Callable[[Any], Any]] = None):
+        self._target = target
+        self._methods = methods
+        self._fallback = fallback
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self.path: Optional[str] = None
+        self._private_dir: Optional[str] = None
+
+    async def start(self, path: Optional[str] = None) -> str:
+        """Dinlemeye başlar ve socket yolunu döndürür; yol verilmezse özel bir geçici dizinde açılır."""
+        if path is None:
+            self._private_dir = tempfile.mkdtemp(prefix="dbmcp-")  # 0700
+            path = os.path.join(self._private_dir, "metadata.sock")
+        elif os.path.exists(path):
+            os.unlink(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        if os.stat(directory).st_mode & 0o022:
+            logger.warning("IPC socket directory %s is writable by other users", directory)
+        self.path = path
+        # Socket baştan 0600 oluşturulur: sonradan chmod edilene kadar açık kalan bir pencere olmaz
+        previous = os.umask(0o077)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        finally:
+            os.umask(previous)
+        logger.info("%s listening on %s", type(self).__name__, path)
+        return path
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in list(self._tasks):
+            task.cancel()
+        # Bağlı worker'lar bağlantının koptuğunu görsün (bekleyen çağrıları hata alır)
+        for writer in list(self._writers):
+            writer.close()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        if self._private_dir is not None:
+            shutil.rmtree(self._private_dir, ignore_errors=True)
+            self._private_dir = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    message = await _receive(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except ValueError as e:
+                    logger.error("Dropping IPC connection after a malformed message: %s", e)
+                    break
+                # Aynı worker'dan gelen çağrılar paralel işlenir; cevaplar istek id'siyle eşleşir
+                task = asyncio.create_task(self._dispatch(message, writer, lock))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, message, writer: asyncio.StreamWriter, lock: asyncio.Lock):
+        request_id, method = message.get("id"), message.get("method")
+        try:
+            if method not in self._methods:
+                raise RuntimeError(f"Method '{method}' is not available over IPC")
+            args, kwargs = message.get("args") or [], message.get("kwargs") or {}
+            result, error = await getattr(self._target, method)(*args, **kwargs), None
+        except Exception as e:
+            result, error = None, _error_payload(e)
+
+        if request_id is None:
+            # Cevap beklenmeyen (ör. wait=False metadata yazması) çağrı
+            if error is not None:
+                logger.error("IPC call %s failed: %s", method, error["message"])
+            return
+        try:
+            async with lock:
+                try:
+                    await _send(writer, {"id": request_id, "result": result, "error": error}, self._fallback)
+                except TypeError as e:
+                    await _send(writer, {"id": request_id, "result": None, "error": _error_payload(e)})
+        except (ConnectionError, RuntimeError) as e:
+            logger.warning("Could not reply to IPC client: %s", e)
+
+
+class MetadataOwner(IpcServer):
+    """
+    Çok worker'lı modda DuckDB dosyasını açan tek süreç (supervisor) tarafında çalışır.
+    Worker'ların metadata çağrılarını alır ve kendi MetadataConnection'ına uygular;
+    böylece tüm yazmalar tek yazıcı kuyruğundan geçer.
+    """
+
+    def __init__(self, connection):
+        super().__init__(connection, OWNER_METHODS)
+
+
+class IpcClient:
+    """
+    IpcServer'a çağrı iletir. Bağlantı koparsa bekleyen çağrılar hata alır; sonraki
+    çağrı yeniden bağlanmayı dener.
+    """
+
+    def __init__(self, path: str, reconnect_timeout: float = 5.0):
+        self.path = path
+        self.reconnect_timeout = reconnect_timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._connect_lock = asyncio.Lock()
+        self._closed = False
+
+    async def connect(self, timeout: float = 30.0):
+        # İstemci, sunucu socket'i dinlemeye başlamadan önce açılmış olabilir
+        self._closed = False
+        async with asyncio.timeout(timeout):
+            while True:
+                try:
+                    self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    await asyncio.sleep(0.1)
+        self._reader_task = asyncio.create_task(self._read_loop(self._reader), name="metadata-ipc-reader")
+
+    async def close(self):
+        self._closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._disconnect()
+        self._fail_pending(ConnectionError(f"IPC connection to {self.path} closed"))
+
+    async def call(self, method: str, *args, reply: bool = True, **kwargs) -> Any:
+        writer = await self._connected()
+        request_id = next(self._ids) if reply else None
+        future = None
+        if reply:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+        try:
+            async with self._lock:
+                await _send(writer, {"id": request_id, "method": method, "args": args, "kwargs": kwargs})
+        except BaseException:
+            self._pending.pop(request_id, None)
+            raise
+        if future is None:
+            return None
+        try:
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _connected(self) -> asyncio.StreamWriter:
+        if self._closed:
+            raise RuntimeError(f"IPC client for {self.path} is closed")
+        if self._writer is not None:
+            return self._writer
+        async with self._connect_lock:
+            if self._writer is None:
+                try:
+                    await self.connect(self.reconnect_timeout)
+                except (TimeoutError, OSError) as e:
+                    raise ConnectionError(f"IPC server at {self.path} is not reachable") from e
+                logger.info("Reconnected to IPC server at %s", self.path)
+        return self._writer
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                message = await _receive(reader)
+                future = self._pending.get(message.get("id"))
+                if future is None or future.done():
+                    continue
+                if message.get("error") is not None:
+                    future.set_exception(_error_from_payload(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.error("Lost connection to IPC server %s: %s", self.path, e)
+            if self._reader is not reader:
+                return
+            # Bir sonraki çağrı yeniden bağlansın; yarım kalan çağrıların cevabı artık gelmeyecek
+            self._disconnect()
+            self._reader_task = None
+            self._fail_pending(ConnectionError(f"Lost connection to IPC server {self.path}"))
+
+    def _disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader, self._writer = None, None
+
+    def _fail_pending(self, error: BaseException):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+
+class MetadataClient(IpcClient):
+    """Worker süreçlerinde MetadataConnection çağrılarını owner sürecine iletir."""
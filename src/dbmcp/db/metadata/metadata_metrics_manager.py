@@ -0,0 +1,485 @@
+import logging
+import pyarrow as pa
+from typing import Optional, Any, List, Dict
+from config.settings import get_settings
+from .metadata_connection import metadata_connection
+
+logger = logging.getLogger(__name__)
+
+UTC_TS = pa.timestamp("us", tz="UTC")
+
+DATABASE_COUNTERS = [
+    "xact_commit", "xact_rollback", "blks_read", "blks_hit", "tup_returned", "tup_fetched",
+    "tup_inserted", "tup_updated", "tup_deleted", "deadlocks", "temp_files", "temp_bytes",
+]
+CHECKPOINTER_COUNTERS = [
+    "checkpoints_timed", "checkpoints_req", "buffers_checkpoint", "buffers_clean", "maxwritten_clean",
+]
+CHECKPOINTER_TIMERS = ["checkpoint_write_time", "checkpoint_sync_time"]
+TABLE_COUNTERS = [
+    "seq_scan", "seq_tup_read", "idx_scan", "idx_tup_fetch", "n_tup_ins", "n_tup_upd", "n_tup_del",
+]
+STATEMENT_COUNTERS = [
+    "calls", "total_exec_time", "rows", "shared_blks_hit", "shared_blks_read", "temp_blks_written", "wal_bytes",
+]
+
+# Orderings accepted by get_top_statements, as expressions over the summed deltas
+STATEMENT_ORDER_BY = {
+    "total_time": "total_exec_time_ms",
+    "calls": "calls",
+    "mean_time": "mean_exec_time_ms",
+    "rows": "rows",
+    "shared_blks_read": "shared_blks_read",
+    "temp_blks_written": "temp_blks_written",
+    "wal_bytes": "wal_bytes",
+}
+
+
+def _delta_sql(column: str, partition: str, reset: str) -> str:
+    """
+    Interval delta of a cumulative counter. A counter that went backwards, or a changed
+    stats_reset, means the stats were reset in between: the current value is then the
+    delta since the reset. The first sample of a series has no delta.
+    """
+    prev = f"lag({column}) OVER (PARTITION BY {partition} ORDER BY sample_ts)"
+    return f"""CASE
+                   WHEN {prev} IS NULL THEN NULL
+                   WHEN {column} < {prev} OR {reset} THEN {column}
+                   ELSE {column} - {prev}
+               END AS d_{column}"""
+
+
+def _stats_reset_changed(partition: str) -> str:
+    return f"stats_reset IS DISTINCT FROM lag(stats_reset) OVER (PARTITION BY {partition} ORDER BY sample_ts)"
+
+
+class MetricsManager:
+    """
+    Stores raw cumulative pg_stat_* counters per sample and derives per-second rates
+    over arbitrary windows at query time.
+    """
+
+    def __init__(self):
+        pass
+
+    async def initialize(self):
+        # Metadata connection is managed globally
+        pass
+
+    async def close(self):
+        pass
+
+    # ✅ SAMPLE INGESTION
+    async def add_samples(
+            self,
+            database_rows: List[Dict[str, Any]],
+            checkpointer_rows: List[Dict[str, Any]],
+            table_rows: List[Dict[str, Any]],
+            statement_rows: Optional[List[Dict[str, Any]]] = None,
+            statement_texts: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, int]:
+        """
+        Appends one collection round (possibly many connections) in a single transaction.
+        Every row carries connection_id and sample_ts (the target's clock at sampling time).
+        statement_texts (connection_id, datname, queryid, query) are only stored the first time.
+        """
+        statement_rows = statement_rows or []
+        statement_texts = statement_texts or []
+        statements = []
+        relations = {}
+
+        if database_rows:
+            relations["database_batch"] = self._to_arrow(
+                database_rows,
+                {"connection_id": pa.int32(), "sample_ts": UTC_TS, "datname": pa.string(),
+                 "numbackends": pa.int32(), **{c: pa.int64() for c in DATABASE_COUNTERS},
+                 "stats_reset": UTC_TS},
+            )
+            statements.append(("INSERT INTO metrics.pg_database_samples BY NAME SELECT * FROM database_batch;", ()))
+
+        if checkpointer_rows:
+            relations["checkpointer_batch"] = self._to_arrow(
+                checkpointer_rows,
+                {"connection_id": pa.int32(), "sample_ts": UTC_TS, **{c: pa.int64() for c in CHECKPOINTER_COUNTERS},
+                 **{c: pa.float64() for c in CHECKPOINTER_TIMERS}, "stats_reset": UTC_TS},
+            )
+            statements.append(("INSERT INTO metrics.pg_checkpointer_samples BY NAME SELECT * FROM checkpointer_batch;", ()))
+
+        if table_rows:
+            relations["table_batch"] = self._to_arrow(
+                table_rows,
+                {"connection_id": pa.int32(), "sample_ts": UTC_TS, "schemaname": pa.string(), "relname": pa.string(),
+                 **{c: pa.int64() for c in TABLE_COUNTERS}, "n_live_tup": pa.int64(), "n_dead_tup": pa.int64()},
+            )
+            statements.append(("INSERT INTO metrics.pg_table_samples BY NAME SELECT * FROM table_batch;", ()))
+
+        if statement_rows:
+            relations["statement_batch"] = self._to_arrow(
+                statement_rows,
+                {"connection_id": pa.int32(), "sample_ts": UTC_TS, "datname": pa.string(), "queryid": pa.int64(),
+                 **{c: pa.float64() if c == "total_exec_time" else pa.int64() for c in STATEMENT_COUNTERS},
+                 "stats_reset": UTC_TS},
+            )
+            statements.append(("INSERT INTO metrics.pg_statement_samples BY NAME SELECT * FROM statement_batch;", ()))
+
+        if statement_texts:
+            relations["statement_text_batch"] = self._to_arrow(
+                statement_texts,
+                {"connection_id": pa.int32(), "datname": pa.string(), "queryid": pa.int64(), "query": pa.string()},
+            )
+            statements.append(("""
+                INSERT INTO metrics.pg_statement_texts (connection_id, datname, queryid, query)
+                SELECT b.connection_id, b.datname, b.queryid, b.query
+                FROM statement_text_batch AS b
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM metrics.pg_statement_texts AS t
+                    WHERE t.connection_id = b.connection_id
+                      AND t.datname = b.datname
+                      AND t.queryid = b.queryid
+                );
+            """, ()))
+
+        if statements:
+            await metadata_connection.execute_write_many(statements, relations=relations)
+
+        return {
+            "database": len(database_rows),
+            "checkpointer": len(checkpointer_rows),
+            "table": len(table_rows),
+            "statement": len(statement_rows),
+        }
+
+    @staticmethod
+    def _to_arrow(rows: List[Dict[str, Any]], schema: Dict[str, pa.DataType]) -> pa.Table:
+        # Keep each connection's rows together so row-group zonemaps on connection_id stay tight
+        rows = sorted(rows, key=lambda r: r["connection_id"])
+        return pa.table({name: pa.array([r.get(name) for r in rows], dtype) for name, dtype in schema.items()})
+
+    async def prune_samples(self, retention_days: Optional[int] = None) -> None:
+        """Drops samples older than retention_days (default: settings.metrics_retention_days)."""
+        retention_days = retention_days or get_settings().metrics_retention_days
+        cutoff = "now() - to_days(CAST($1 AS INTEGER))"
+        await metadata_connection.execute_write_many([
+            (f"DELETE FROM metrics.pg_database_samples WHERE sample_ts < {cutoff};", (retention_days,)),
+            (f"DELETE FROM metrics.pg_checkpointer_samples WHERE sample_ts < {cutoff};", (retention_days,)),
+            (f"DELETE FROM metrics.pg_table_samples WHERE sample_ts < {cutoff};", (retention_days,)),
+            (f"DELETE FROM metrics.pg_statement_samples WHERE sample_ts < {cutoff};", (retention_days,)),
+            ("""
+                DELETE FROM metrics.pg_statement_texts AS t
+                WHERE NOT EXISTS (
+                    SELECT 1
+                    FROM metrics.pg_statement_samples AS s
+                    WHERE s.connection_id = t.connection_id
+                      AND s.datname = t.datname
+                      AND s.queryid = t.queryid
+                );
+            """, ()),
+        ])
+
+    async def get_unknown_queryids(self, connection_id: int, keys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the (datname, queryid) pairs among keys whose text is not stored yet."""
+        if not keys:
+            return []
+        sql = """
+            SELECT k.datname, k.queryid
+            FROM (SELECT unnest($2::VARCHAR[]) AS datname, unnest($3::BIGINT[]) AS queryid) AS k
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM metrics.pg_statement_texts AS t
+                WHERE t.connection_id = $1
+                  AND t.datname = k.datname
+                  AND t.queryid = k.queryid
+            )
+        """
+        return await self.execute_query(
+            sql, connection_id, [k["datname"] for k in keys], [k["queryid"] for k in keys]
+        )
+
+    @staticmethod
+    def _window_sql(table: str) -> str:
+        # The last sample before the window is the baseline of the first interval inside it
+        return f"""
+            SELECT *
+            FROM {table}
+            WHERE connection_id = $1
+              AND sample_ts >= coalesce(
+                  (SELECT max(sample_ts) FROM {table}
+                   WHERE connection_id = $1 AND sample_ts < now() - to_minutes(CAST($2 AS INTEGER))),
+                  now() - to_minutes(CAST($2 AS INTEGER)))
+        """
+
+    @staticmethod
+    def _bucket_sql(bucket_minutes: Optional[int]) -> str:
+        if bucket_minutes:
+            return f"time_bucket(to_minutes({int(bucket_minutes)}), sample_ts)"
+        return "NULL::TIMESTAMPTZ"
+
+    # ✅ DATABASE RATES
+    async def get_database_rates(
+            self,
+            connection_id: int,
+            minutes: int = 60,
+            bucket_minutes: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Per-database rates over the last `minutes`: TPS, rollbacks/s, blks_read/s,
+        tuples/s and the cache-hit ratio of the interval (not since stats reset).
+        With bucket_minutes, one row per database and bucket.
+        """
+        partition = "datname"
+        deltas = ",\n".join(_delta_sql(c, partition, "reset_changed") for c in DATABASE_COUNTERS)
+        sql = f"""
+            WITH samples AS ({self._window_sql("metrics.pg_database_samples")}),
+            flagged AS (
+                SELECT *, {_stats_reset_changed(partition)} AS reset_changed
+                FROM samples
+            ),
+            deltas AS (
+                SELECT datname,
+                       sample_ts,
+                       numbackends,
+                       epoch(sample_ts - lag(sample_ts) OVER (PARTITION BY {partition} ORDER BY sample_ts)) AS d_seconds,
+                       {deltas}
+                FROM flagged
+            )
+            SELECT datname,
+                   {self._bucket_sql(bucket_minutes)} AS bucket,
+                   count(d_seconds) AS intervals,
+                   round(sum(d_seconds), 1) AS seconds,
+                   round(sum(d_xact_commit + d_xact_rollback) / nullif(sum(d_seconds), 0), 2) AS tps,
+                   round(sum(d_xact_commit) / nullif(sum(d_seconds), 0), 2) AS commits_per_sec,
+                   round(sum(d_xact_rollback) / nullif(sum(d_seconds), 0), 2) AS rollbacks_per_sec,
+                   round(sum(d_blks_read) / nullif(sum(d_seconds), 0), 2) AS blks_read_per_sec,
+                   round(sum(d_blks_hit) / nullif(sum(d_seconds), 0), 2) AS blks_hit_per_sec,
+                   round(100.0 * sum(d_blks_hit) / nullif(sum(d_blks_hit + d_blks_read), 0), 2) AS cache_hit_pct,
+                   round(sum(d_tup_returned + d_tup_fetched) / nullif(sum(d_seconds), 0), 2) AS tup_read_per_sec,
+                   round(sum(d_tup_inserted + d_tup_updated + d_tup_deleted) / nullif(sum(d_seconds), 0), 2) AS tup_written_per_sec,
+                   sum(d_deadlocks) AS deadlocks,
+                   sum(d_temp_files) AS temp_files,
+                   sum(d_temp_bytes) AS temp_bytes,
+                   round(avg(numbackends), 1) AS avg_backends
+            FROM deltas
+            WHERE d_seconds > 0
+            GROUP BY ALL
+            ORDER BY bucket NULLS FIRST, tps DESC NULLS LAST
+        """
+        return await self.execute_query(sql, connection_id, minutes)
+
+    # ✅ CHECKPOINT RATES
+    async def get_checkpoint_rates(
+            self,
+            connection_id: int,
+            minutes: int = 60,
+            bucket_minutes: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Checkpoints, buffers written per second and checkpoint write/sync time over the window."""
+        partition = "connection_id"
+        deltas = ",\n".join(
+            _delta_sql(c, partition, "reset_changed") for c in CHECKPOINTER_COUNTERS + CHECKPOINTER_TIMERS
+        )
+        sql = f"""
+            WITH samples AS ({self._window_sql("metrics.pg_checkpointer_samples")}),
+            flagged AS (
+                SELECT *, {_stats_reset_changed(partition)} AS reset_changed
+                FROM samples
+            ),
+            deltas AS (
+                SELECT sample_ts,
+                       epoch(sample_ts - lag(sample_ts) OVER (PARTITION BY {partition} ORDER BY sample_ts)) AS d_seconds,
+                       {deltas}
+                FROM flagged
+            )
+            SELECT {self._bucket_sql(bucket_minutes)} AS bucket,
+                   count(d_seconds) AS intervals,
+                   round(sum(d_seconds), 1) AS seconds,
+                   sum(d_checkpoints_timed) AS checkpoints_timed,
+                   sum(d_checkpoints_req) AS checkpoints_req,
+                   round(100.0 * sum(d_checkpoints_req) / nullif(sum(d_checkpoints_timed + d_checkpoints_req), 0), 2) AS requested_pct,
+                   round(sum(d_buffers_checkpoint) / nullif(sum(d_seconds), 0), 2) AS buffers_checkpoint_per_sec,
+                   round(sum(d_buffers_clean) / nullif(sum(d_seconds), 0), 2) AS buffers_clean_per_sec,
+                   sum(d_maxwritten_clean) AS maxwritten_clean,
+                   round(sum(d_checkpoint_write_time), 1) AS checkpoint_write_ms,
+                   round(sum(d_checkpoint_sync_time), 1) AS checkpoint_sync_ms
+            FROM deltas
+            WHERE d_seconds > 0
+            GROUP BY ALL
+            ORDER BY bucket NULLS FIRST
+        """
+        return await self.execute_query(sql, connection_id, minutes)
+
+    # ✅ TABLE ACTIVITY RATES
+    async def get_table_activity_rates(
+            self,
+            connection_id: int,
+            minutes: int = 60,
+            limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Busiest tables over the window by scans and tuple writes per second, with the latest dead tuple ratio."""
+        partition = "schemaname, relname"
+        # pg_stat_user_tables has no stats_reset; a backwards counter is the only reset signal
+        deltas = ",\n".join(_delta_sql(c, partition, "false") for c in TABLE_COUNTERS)
+        sql = f"""
+            WITH samples AS ({self._window_sql("metrics.pg_table_samples")}),
+            deltas AS (
+                SELECT schemaname,
+                       relname,
+                       sample_ts,
+                       n_live_tup,
+                       n_dead_tup,
+                       epoch(sample_ts - lag(sample_ts) OVER (PARTITION BY {partition} ORDER BY sample_ts)) AS d_seconds,
+                       {deltas}
+                FROM samples
+            )
+            SELECT schemaname,
+                   relname,
+                   count(d_seconds) AS intervals,
+                   round(sum(d_seconds), 1) AS seconds,
+                   round(sum(d_seq_scan) / nullif(sum(d_seconds), 0), 3) AS seq_scan_per_sec,
+                   round(sum(d_seq_tup_read) / nullif(sum(d_seconds), 0), 2) AS seq_tup_read_per_sec,
+                   round(sum(d_idx_scan) / nullif(sum(d_seconds), 0), 3) AS idx_scan_per_sec,
+                   round(sum(d_idx_tup_fetch) / nullif(sum(d_seconds), 0), 2) AS idx_tup_fetch_per_sec,
+                   round(sum(d_n_tup_ins) / nullif(sum(d_seconds), 0), 2) AS ins_per_sec,
+                   round(sum(d_n_tup_upd) / nullif(sum(d_seconds), 0), 2) AS upd_per_sec,
+                   round(sum(d_n_tup_del) / nullif(sum(d_seconds), 0), 2) AS del_per_sec,
+                   arg_max(n_live_tup, sample_ts) AS n_live_tup,
+                   arg_max(n_dead_tup, sample_ts) AS n_dead_tup,
+                   round(100.0 * arg_max(n_dead_tup, sample_ts)
+                         / nullif(arg_max(n_live_tup + n_dead_tup, sample_ts), 0), 2) AS dead_pct
+            FROM deltas
+            WHERE d_seconds > 0
+            GROUP BY ALL
+            ORDER BY coalesce(seq_tup_read_per_sec, 0) + coalesce(idx_tup_fetch_per_sec, 0)
+                     + coalesce(ins_per_sec, 0) + coalesce(upd_per_sec, 0) + coalesce(del_per_sec, 0) DESC
+            LIMIT $3
+        """
+        return await self.execute_query(sql, connection_id, minutes, limit)
+
+    def _statement_deltas_sql(self) -> str:
+        partition = "datname, queryid"
+        deltas = ",\n".join(_delta_sql(c, partition, "reset_changed") for c in STATEMENT_COUNTERS)
+        # An entry evicted and re-added by pg_stat_statements restarts from zero like a reset
+        return f"""
+            samples AS ({self._window_sql("metrics.pg_statement_samples")}),
+            flagged AS (
+                SELECT *, {_stats_reset_changed(partition)} AS reset_changed
+                FROM samples
+            ),
+            deltas AS (
+                SELECT datname,
+                       queryid,
+                       sample_ts,
+                       {deltas}
+                FROM flagged
+            )
+        """
+
+    # ✅ TOP STATEMENTS BY DELTA
+    async def get_top_statements(
+            self,
+            connection_id: int,
+            minutes: int = 60,
+            order_by: str = "total_time",
+            limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top queryids by what they cost inside the last `minutes` (not since stats reset),
+        ordered by one of STATEMENT_ORDER_BY.
+        """
+        if order_by not in STATEMENT_ORDER_BY:
+            raise ValueError(f"order_by must be one of {', '.join(STATEMENT_ORDER_BY)}")
+
+        sql = f"""
+            WITH {self._statement_deltas_sql()},
+            agg AS (
+                SELECT datname,
+                       queryid,
+                       sum(d_calls) AS calls,
+                       round(sum(d_total_exec_time), 2) AS total_exec_time_ms,
+                       round(sum(d_total_exec_time) / nullif(sum(d_calls), 0), 3) AS mean_exec_time_ms,
+                       sum(d_rows) AS rows,
+                       sum(d_shared_blks_hit) AS shared_blks_hit,
+                       sum(d_shared_blks_read) AS shared_blks_read,
+                       round(100.0 * sum(d_shared_blks_hit)
+                             / nullif(sum(d_shared_blks_hit + d_shared_blks_read), 0), 2) AS cache_hit_ratio,
+                       sum(d_temp_blks_written) AS temp_blks_written,
+                       sum(d_wal_bytes) AS wal_bytes
+                FROM deltas
+                GROUP BY ALL
+                HAVING sum(d_calls) > 0
+            )
+            SELECT a.*,
+                   round(100.0 * a.total_exec_time_ms / nullif(sum(a.total_exec_time_ms) OVER (), 0), 2) AS pct_of_total_time,
+                   substring(t.query, 1, 500) AS query_sample
+            FROM agg AS a
+            LEFT JOIN metrics.pg_statement_texts AS t
+                   ON t.connection_id = $1 AND t.datname = a.datname AND t.queryid = a.queryid
+            ORDER BY {STATEMENT_ORDER_BY[order_by]} DESC NULLS LAST
+            LIMIT $3
+        """
+        return await self.execute_query(sql, connection_id, minutes, limit)
+
+    # ✅ STATEMENT REGRESSIONS
+    async def get_statement_regressions(
+            self,
+            connection_id: int,
+            minutes: int = 60,
+            baseline_minutes: int = 1440,
+            threshold_pct: float = 50.0,
+            min_calls: int = 10,
+            limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        Flags queryids whose mean_exec_time over the last `minutes` exceeds their mean over
+        the preceding `baseline_minutes` by more than threshold_pct. Both windows need at
+        least min_calls calls. Ordered by the extra time the regression cost in the window.
+        """
+        # Intervals are attributed to the window that contains their closing sample
+        sql = f"""
+            WITH {self._statement_deltas_sql()},
+            agg AS (
+                SELECT datname,
+                       queryid,
+                       sum(d_calls)           FILTER (WHERE sample_ts < now() - to_minutes(CAST($3 AS INTEGER))) AS baseline_calls,
+                       sum(d_total_exec_time) FILTER (WHERE sample_ts < now() - to_minutes(CAST($3 AS INTEGER))) AS baseline_exec_time,
+                       sum(d_calls)           FILTER (WHERE sample_ts >= now() - to_minutes(CAST($3 AS INTEGER))) AS current_calls,
+                       sum(d_total_exec_time) FILTER (WHERE sample_ts >= now() - to_minutes(CAST($3 AS INTEGER))) AS current_exec_time
+                FROM deltas
+                GROUP BY ALL
+            ),
+            means AS (
+                SELECT datname,
+                       queryid,
+                       baseline_calls,
+                       current_calls,
+                       baseline_exec_time / baseline_calls AS baseline_mean,
+                       current_exec_time / current_calls AS current_mean
+                FROM agg
+                WHERE baseline_calls >= $4
+                  AND current_calls >= $4
+            )
+            SELECT m.datname,
+                   m.queryid,
+                   m.baseline_calls,
+                   m.current_calls,
+                   round(m.baseline_mean, 3) AS baseline_mean_ms,
+                   round(m.current_mean, 3) AS current_mean_ms,
+                   round(100.0 * (m.current_mean - m.baseline_mean) / nullif(m.baseline_mean, 0), 1) AS change_pct,
+                   round((m.current_mean - m.baseline_mean) * m.current_calls, 2) AS extra_time_ms,
+                   substring(t.query, 1, 500) AS query_sample
+            FROM means AS m
+            LEFT JOIN metrics.pg_statement_texts AS t
+                   ON t.connection_id = $1 AND t.datname = m.datname AND t.queryid = m.queryid
+            WHERE m.current_mean > m.baseline_mean * (1 + $5 / 100.0)
+            ORDER BY extra_time_ms DESC
+            LIMIT $6
+        """
+        return await self.execute_query(
+            sql, connection_id, minutes + baseline_minutes, minutes, min_calls, threshold_pct, limit
+        )
+
+    async def execute_query(self, sql: str, *params) -> List[Dict[str, Any]]:
+        return await metadata_connection.execute_query(sql, *params, fetch_all=True) or []
+
+
+metrics_manager = MetricsManager()  # Singleton
@@ -24,12 +24,12 @@ class RepositoryManager:
         return await metadata_connection.execute_query("SELECT * FROM repository.database_types WHERE id=$1", id, fetch_one=True)
 
     async def add_type(self, name: str):
-        return await metadata_connection.execute_query(
+        return await metadata_connection.execute_write(
             "INSERT INTO repository.database_types (name) VALUES ($1) RETURNING *", name, fetch_one=True
         )
 
     async def update_type(self, id: int, data: dict):
-        return await metadata_connection.execute_query("""
+        return await metadata_connection.execute_write("""
             UPDATE repository.database_types
             SET name=$1
             WHERE id=$2
@@ -37,13 +37,15 @@ class RepositoryManager:
         """, data["name"], id, fetch_one=True)
 
     async def delete_type(self, id: int):
-        await metadata_connection.execute_query("DELETE FROM repository.database_types WHERE id = $1", id)
+        await metadata_connection.execute_write("DELETE FROM repository.database_types WHERE id = $1", id)
 
     # --- database_connections ---
     async def get_all_connections(self, connect_at_startup: bool = None):
         query = """
             SELECT c.id, c.database_type_id, t.name AS database_type_name, c.host, c.port, c.database_name,
-                c.username, c.is_active, c.description, c.connect_at_startup
+                c.username, c.is_active, c.description, c.connect_at_startup,
+                c.pool_min_size, c.pool_max_size,
+                (SELECT list(g.tag ORDER BY g.tag) FROM repository.connection_tags g WHERE g.connection_id = c.id) AS tags
             FROM repository.database_connections c
             LEFT JOIN repository.database_types t ON c.database_type_id = t.id
         """
@@ -57,7 +59,9 @@ class RepositoryManager:
     async def get_connection(self, connection_id: int):
         return await metadata_connection.execute_query("""
             SELECT  c.id, c.database_type_id, t.name AS database_type_name, c.host, c.port, c.database_name,
-                c.username, c.is_active, c.description, c.connect_at_startup
+                c.username, c.is_active, c.description, c.connect_at_startup,
+                c.pool_min_size, c.pool_max_size,
+                (SELECT list(g.tag ORDER BY g.tag) FROM repository.connection_tags g WHERE g.connection_id = c.id) AS tags
             FROM repository.database_connections c
             LEFT JOIN repository.database_types t ON c.database_type_id = t.id
             WHERE c.id = $1
@@ -67,7 +71,9 @@ class RepositoryManager:
     async def get_connection_with_password(self, connection_id: int):
         return await metadata_connection.execute_query("""
             SELECT  c.id, c.database_type_id, t.name AS database_type_name, c.host, c.port, c.database_name,
-                c.username, c.encrypted_password, c.is_active, c.description, c.connect_at_startup
+                c.username, c.encrypted_password, c.is_active, c.description, c.connect_at_startup,
+                c.pool_min_size, c.pool_max_size,
+                (SELECT list(g.tag ORDER BY g.tag) FROM repository.connection_tags g WHERE g.connection_id = c.id) AS tags
             FROM repository.database_connections c
             LEFT JOIN repository.database_types t ON c.database_type_id = t.id
             WHERE c.id = $1
@@ -75,21 +81,26 @@ class RepositoryManager:
         """, connection_id, fetch_one=True)
 
     async def add_connection(self, data: dict):
-        return await metadata_connection.execute_query("""
+        row = await metadata_connection.execute_write("""
             INSERT INTO repository.database_connections
             (database_type_id, host, port, database_name, username,
-             encrypted_password, is_active, description, connect_at_startup)
-            VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)
+             encrypted_password, is_active, description, connect_at_startup,
+             pool_min_size, pool_max_size)
+            VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11)
             RETURNING *
         """,
         data["database_type_id"], data["host"], data["port"],
         data["database_name"], data["username"], data["encrypted_password"],
         data.get("is_active", True), data.get("description"),
         data.get("connect_at_startup", True),
+        data.get("pool_min_size"), data.get("pool_max_size"),
         fetch_one=True)
+        if row and data.get("tags"):
+            await self.update_connection_tags(row["id"], data["tags"])
+        return row
 
     async def update_connection(self, connection_id: int, data: dict):
-        return await metadata_connection.execute_query("""
+        return await metadata_connection.execute_write("""
             UPDATE repository.database_connections
             SET database_type_id=$1, host=$2, port=$3, database_name=$4,
                 username=$5, encrypted_password=$6, is_active=$7,
@@ -104,7 +115,7 @@ class RepositoryManager:
         fetch_one=True)
 
     async def update_connection_no_password(self, connection_id: int, data: dict):
-        return await metadata_connection.execute_query("""
+        return await metadata_connection.execute_write("""
             UPDATE repository.database_connections
             SET database_type_id=$1, host=$2, port=$3, database_name=$4,
                 username=$5, is_active=$6,
@@ -118,36 +129,89 @@ class RepositoryManager:
         data.get("connect_at_startup", False), connection_id,
         fetch_one=True)
 
+    async def update_pool_limits(self, connection_id: int, pool_min_size: Optional[int], pool_max_size: Optional[int]):
+        """Hedefe özel havuz limitlerini günceller (NULL -> global ayarlar)."""
+        await metadata_connection.execute_write("""
+            UPDATE repository.database_connections
+            SET pool_min_size = $1, pool_max_size = $2
+            WHERE id = $3
+        """, pool_min_size, pool_max_size, connection_id)
+        return await metadata_connection.execute_query("""
+            SELECT id, pool_min_size, pool_max_size
+            FROM repository.database_connections
+            WHERE id = $1
+        """, connection_id, fetch_one=True)
+
+    async def update_connection_tags(self, connection_id: int, tags: List[str]):
+        """
+        Bağlantının etiketlerini verilen listeyle değiştirir. Yalnızca kalkan etiketler
+        silinir, yeniler eklenir: DuckDB aynı transaction'da silinip yeniden eklenen
+        anahtarı primary key ihlali sayar.
+        """
+        tags = sorted(set(tags))
+        await metadata_connection.execute_write_many([
+            ("""
+                DELETE FROM repository.connection_tags
+                WHERE connection_id = $1 AND NOT list_contains($2::VARCHAR[], tag)
+            """, (connection_id, tags)),
+            ("""
+                INSERT INTO repository.connection_tags (connection_id, tag)
+                SELECT $1, t.tag
+                FROM unnest($2::VARCHAR[]) AS t(tag)
+                WHERE t.tag NOT IN (SELECT tag FROM repository.connection_tags WHERE connection_id = $1)
+            """, (connection_id, tags)),
+        ])
+        return await metadata_connection.execute_query("""
+            SELECT c.id,
+                (SELECT list(g.tag ORDER BY g.tag) FROM repository.connection_tags g WHERE g.connection_id = c.id) AS tags
+            FROM repository.database_connections c
+            WHERE c.id = $1
+        """, connection_id, fetch_one=True)
+
+    async def get_connection_ids_by_tag(self, tag: str) -> List[int]:
+        rows = await metadata_connection.execute_query("""
+            SELECT connection_id
+            FROM repository.connection_tags
+            WHERE tag = $1
+            ORDER BY connection_id
+        """, tag, fetch_all=True)
+        return [int(r["connection_id"]) for r in rows]
+
     async def delete_connection(self, connection_id: int):
-        await metadata_connection.execute_query("DELETE FROM repository.database_connections WHERE id = $1", connection_id)
+        await metadata_connection.execute_write_many([
+            ("DELETE FROM repository.connection_tags WHERE connection_id = $1", (connection_id,)),
+            ("DELETE FROM repository.database_connections WHERE id = $1", (connection_id,)),
+        ])
 
     async def deactivate_all_connections(self):
         """Tüm bağlantılarda is_active değerini False yapar."""
-        await metadata_connection.execute_query("UPDATE repository.database_connections SET is_active = FALSE")
+        await metadata_connection.execute_write("UPDATE repository.database_connections SET is_active = FALSE")
         return {"status": "ok", "message": "All connections deactivated."}
 
     async def activate_connection(self, connection_id: int):
         """Belirtilen connection_id için is_active değerini True yapar."""
-        row = await metadata_connection.execute_query("""
+        # DuckDB rejects UPDATE ... RETURNING on primary-key tables; the row is read back separately
+        await metadata_connection.execute_write("""
             UPDATE repository.database_connections
             SET is_active = TRUE
             WHERE id = $1
-            RETURNING *
-        """, connection_id, fetch_one=True)
-        
+        """, connection_id)
+        row = await self.get_connection(connection_id)
+
         if not row:
             return {"status": "error", "message": f"Connection {connection_id} not found."}
         return row
 
     async def deactivate_connection(self, connection_id: int):
         """Belirtilen connection_id için is_active değerini False yapar."""
-        row = await metadata_connection.execute_query("""
+        # DuckDB rejects UPDATE ... RETURNING on primary-key tables; the row is read back separately
+        await metadata_connection.execute_write("""
             UPDATE repository.database_connections
             SET is_active = FALSE
             WHERE id = $1
-            RETURNING *
-        """, connection_id, fetch_one=True)
-        
+        """, connection_id)
+        row = await self.get_connection(connection_id)
+
         if not row:
             return {"status": "error", "message": f"Connection {connection_id} not found."}
         return row
@@ -1,25 +1,71 @@
+import asyncio
 import logging
 import json
+import os
+import time
+from datetime import datetime, timezone
 
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from typing import Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from fastmcp import Client, FastMCP
+from fastmcp.client.client import CallToolResult
+from fastmcp.server.http import set_http_request
+from starlette.requests import Request
+from config.settings import get_settings
+from .leader_election import LeaderLock
 from .metadata_connection import metadata_connection
 
 logger = logging.getLogger(__name__)
 
+JOB_ID_PREFIX = "job_"
+# APScheduler'ın job_defaults varsayılanı; alan NULL'a çekildiğinde çalışan job'a açıkça geri verilir
+DEFAULT_MISFIRE_GRACE_SECONDS = 1
+JOB_CONTROL_FIELDS = ['max_instances', 'coalesce_runs', 'misfire_grace_seconds', 'jitter_seconds']
+# Scheduler'daki job'u etkileyen alanlar; last_run_at/updated_at gibi alanlar karşılaştırmaya girmez
+JOB_DEFINITION_FIELDS = ['job_name', 'tool_name', 'tool_params', 'trigger_type', 'interval_seconds',
+                         'cron_expression', 'is_active', *JOB_CONTROL_FIELDS]
+
+
+def _result_size(result: Any) -> Optional[int]:
+    content = getattr(result, "content", None)
+    if not content:
+        return None
+    return sum(len((getattr(c, "text", None) or "").encode()) for c in content)
+
+
 class SchedulerManager:
     def __init__(self):
         self._mcp_server: Optional[FastMCP] = None
         self._mcp_client: Optional[Client] = None
+        self._dispatch_headers: Dict[str, str] = {}
+        # scheduler_dispatch=in_process: bellek içi transport ile açık tutulan Client
+        self._in_process: Optional[Client] = None
+        self._client_lock = asyncio.Lock()
         self.scheduler = AsyncIOScheduler()
-
-    async def initialize(self, mcpserver, mcpclient):
+        # job_id -> yüklenen satır; scheduler event'lerinde job adını bulmak için
+        self._jobs: Dict[int, dict] = {}
+        # job_id -> son submit edilen planlanmış çalışma zamanı
+        self._scheduled_at: Dict[int, datetime] = {}
+        self._sync_lock = asyncio.Lock()
+        # Scheduler event'lerinden başlatılan kayıt yazmaları; referansı tutulmazsa GC tarafından toplanabilir
+        self._event_tasks: Set[asyncio.Task] = set()
+        # Çok süreçli çalışmada liderlik kilidi ve takipçi döngüsü
+        self._leader_lock: Optional[LeaderLock] = None
+        self._follower_task: Optional[asyncio.Task] = None
+        # Takipçilerin job değişikliklerini lidere bildirdiği işaret dosyası ve liderin izleme döngüsü
+        self._changes_path: Optional[str] = None
+        self._changes_seen: Optional[str] = None
+        self._changes_task: Optional[asyncio.Task] = None
+        self.scheduler.add_listener(self._on_scheduler_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+
+    async def initialize(self, mcpserver, mcpclient, dispatch_headers: Optional[Dict[str, str]] = None):
         # Pool initialization removed as it's handled in metadata_connection singleton
         self._mcp_server = mcpserver
         self._mcp_client = mcpclient
+        self._dispatch_headers = dispatch_headers or {}
 
     async def close(self):
         pass
@@ -55,12 +101,14 @@ class SchedulerManager:
         if isinstance(tool_params, dict) or isinstance(tool_params, list):
             tool_params = json.dumps(tool_params)
 
-        row = await metadata_connection.execute_query("""
+        row = await metadata_connection.execute_write("""
             INSERT INTO scheduler.scheduled_jobs (job_name, tool_name, tool_params,
                                                     trigger_type,
                                                     interval_seconds, cron_expression,
-                                                    is_active)
-            VALUES ($1, $2, $3, $4, $5, $6, $7) RETURNING *
+                                                    is_active,
+                                                    max_instances, coalesce_runs,
+                                                    misfire_grace_seconds, jitter_seconds)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11) RETURNING *
             """,
             job_data["job_name"],
             job_data["tool_name"],
@@ -69,8 +117,14 @@ class SchedulerManager:
             job_data.get("interval_seconds"),
             job_data.get("cron_expression"),
             job_data.get("is_active", True),
+            job_data.get("max_instances", 1),
+            job_data.get("coalesce_runs", True),
+            job_data.get("misfire_grace_seconds"),
+            job_data.get("jitter_seconds"),
             fetch_one=True
         )
+        if row:
+            await self.sync_job(row["job_id"])
         return row
 
     async def update_job(self, job_id: int, job_data: dict):
@@ -79,8 +133,7 @@ class SchedulerManager:
         values = []
         idx = 1
         for key, value in job_data.items():
-            if key in ['job_name', 'tool_name', 'tool_params', 'trigger_type', 'interval_seconds',
-                       'cron_expression', 'is_active']:
+            if key in JOB_DEFINITION_FIELDS:
                 
                 if key == 'tool_params' and (isinstance(value, dict) or isinstance(value, list)):
                      value = json.dumps(value)
@@ -94,95 +147,436 @@ class SchedulerManager:
 
         values.append(job_id)
         # Note: idx is now N+1, so $idx is the last param for WHERE
+        # DuckDB rejects UPDATE ... RETURNING on tables with a primary key (over-eager
+        # constraint check), so the row is read back separately
         query = f"""
             UPDATE scheduler.scheduled_jobs
             SET {', '.join(fields)}, updated_at = now()
             WHERE job_id = ${idx}
-            RETURNING *
         """
-        row = await metadata_connection.execute_query(query, *values, fetch_one=True)
-        return row
+        await metadata_connection.execute_write(query, *values)
+        await self.sync_job(job_id)
+        return await self.get_job(job_id)
 
     async def delete_job(self, job_id: int):
-        await metadata_connection.execute_query("""
+        await metadata_connection.execute_write("""
            DELETE
            FROM scheduler.scheduled_jobs
            WHERE job_id = $1
            """, job_id)
+        await self.sync_job(job_id)
 
-    async def update_job_last_run(self, job_id: int):
-        await metadata_connection.execute_query("""
-           UPDATE scheduler.scheduled_jobs
-           SET last_run_at = now()
-           WHERE job_id = $1
-           """, job_id)
+    async def call_tool_in_process(self, tool_name: str, arguments: dict) -> CallToolResult:
+        """
+        Tool'u HTTP loopback ve MCP oturum kurulumu olmadan, sunucunun middleware
+        zincirinden (Eunomia politikası, deadline/öncelik) geçirerek çalıştırır.
+        """
+        client = await self._in_process_client()
+        return await client.call_tool(name=tool_name, arguments=arguments)
+
+    async def _in_process_client(self) -> Client:
+        """
+        Sunucuya bellek içi transport ile bağlı, job'lar arasında açık tutulan Client.
+        Middleware'ler header'ları get_http_headers() ile okur; bellek içi oturumda HTTP
+        isteği yoktur. Oturum görevi, scheduler'ın header'larını taşıyan sentetik istek
+        context'teyken başlatılır; sunucu tarafındaki her çağrı bu context'i miras alır.
+        """
+        async with self._client_lock:
+            if self._in_process is None:
+                request = Request({
+                    "type": "http",
+                    "method": "POST",
+                    "path": "/mcp",
+                    "query_string": b"",
+                    "headers": [(k.lower().encode(), v.encode()) for k, v in self._dispatch_headers.items()],
+                })
+                client = Client(self._mcp_server)
+                with set_http_request(request):
+                    await client.__aenter__()
+                self._in_process = client
+            return self._in_process
 
     async def execute_job(self, job: dict):
         logger.info(f"Executing scheduled job: {job['job_name']}")
+        scheduled_at = self._scheduled_at.pop(job["job_id"], None)
+        started_at = datetime.now(timezone.utc)
+        started = time.monotonic()
+        status, error, result_bytes = "success", None, None
 
         try:
-            async with self._mcp_client:
-                params = job.get("tool_params")
-
-                if isinstance(params, str):
-                    try:
-                        params = json.loads(params)
-                    except json.JSONDecodeError as e:
-                        logger.error(
-                            "Invalid tool_params JSON for job %s: %s",
-                            job.get("id"),
-                            params
-                        )
-                        params = {}
-                elif params is None:
+            params = job.get("tool_params")
+
+            if isinstance(params, str):
+                try:
+                    params = json.loads(params)
+                except json.JSONDecodeError as e:
+                    logger.error(
+                        "Invalid tool_params JSON for job %s: %s",
+                        job.get("id"),
+                        params
+                    )
                     params = {}
-
-                result = await self._mcp_client.call_tool(
-                    name=job["tool_name"],
-                    arguments=params
-                )
-                print(result)
-
-            await self.update_job_last_run(job["job_id"])
+            elif params is None:
+                params = {}
+
+            if get_settings().scheduler_dispatch == "http":
+                async with self._mcp_client:
+                    result = await self._mcp_client.call_tool(
+                        name=job["tool_name"],
+                        arguments=params
+                    )
+            else:
+                result = await self.call_tool_in_process(job["tool_name"], params)
+            logger.debug("Job %s result: %s", job["job_name"], result)
+            result_bytes = _result_size(result)
 
         except Exception as e:
+            status, error = "error", str(e) or type(e).__name__
             logger.exception(f"Job failed: {job['job_name']} - {e}")
 
-    async def load_jobs_from_db(self):
-        jobs = await self.get_active_scheduled_jobs()
+        await self.record_run(
+            job, status,
+            scheduled_at=scheduled_at,
+            started_at=started_at,
+            duration_ms=(time.monotonic() - started) * 1000,
+            error=error,
+            result_bytes=result_bytes,
+        )
 
-        for job in jobs:
-            if job["trigger_type"] == "interval":
-                trigger = IntervalTrigger(seconds=job["interval_seconds"])
+    async def record_run(
+            self,
+            job: dict,
+            status: str,
+            scheduled_at: Optional[datetime] = None,
+            started_at: Optional[datetime] = None,
+            duration_ms: Optional[float] = None,
+            error: Optional[str] = None,
+            result_bytes: Optional[int] = None,
+    ):
+        """
+        Çalışma kaydını yazar (başarılıysa last_run_at da güncellenir). Fire-and-forget:
+        metadata writer aynı anda biten job'ların kayıtlarını tek commit'te toplar.
+        """
+        started_at = started_at or datetime.now(timezone.utc)
+        finished_at = None if duration_ms is None else datetime.now(timezone.utc)
+        statements = [("""
+            INSERT INTO scheduler.job_runs (job_id, job_name, tool_name, scheduled_at, started_at,
+                                            finished_at, duration_ms, status, error, result_bytes)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+        """, (job["job_id"], job["job_name"], job.get("tool_name"), scheduled_at, started_at,
+              finished_at, duration_ms, status, error, result_bytes))]
+        if status == "success":
+            statements.append(("""
+                UPDATE scheduler.scheduled_jobs
+                SET last_run_at = now()
+                WHERE job_id = $1
+            """, (job["job_id"],)))
+        await metadata_connection.execute_write_many(statements, wait=False)
+
+    def _on_scheduler_event(self, event):
+        if not event.job_id.startswith(JOB_ID_PREFIX):
+            return
+        job = self._jobs.get(int(event.job_id[len(JOB_ID_PREFIX):]))
+        if not job:
+            return
+        if event.code == EVENT_JOB_SUBMITTED:
+            self._scheduled_at[job["job_id"]] = event.scheduled_run_times[-1]
+            return
+        # Önceki çalışma sürerken (max_instances) veya misfire grace aşıldığı için atlanan çalışmalar
+        if event.code == EVENT_JOB_MAX_INSTANCES:
+            status, scheduled_at = "skipped", event.scheduled_run_times[-1]
+        else:
+            status, scheduled_at = "missed", event.scheduled_run_time
+        logger.warning("Job %s run %s (scheduled at %s)", job["job_name"], status, scheduled_at)
+        task = asyncio.get_running_loop().create_task(self.record_run(job, status, scheduled_at=scheduled_at))
+        self._event_tasks.add(task)
+        task.add_done_callback(self._event_tasks.discard)
+
+    async def get_job_runs(self, job_id: int, limit: int = 50) -> List[dict]:
+        return await metadata_connection.execute_query("""
+            SELECT *
+            FROM scheduler.job_runs
+            WHERE job_id = $1
+            ORDER BY started_at DESC
+            LIMIT $2
+        """, job_id, limit, fetch_all=True)
+
+    async def get_job_run_stats(self, hours: int = 24) -> List[dict]:
+        """Job başına son N saatteki çalışma sayıları ve p50/p95/max süreleri."""
+        return await metadata_connection.execute_query("""
+            SELECT job_id,
+                   arg_max(job_name, started_at) AS job_name,
+                   count(*) FILTER (WHERE status IN ('success', 'error')) AS runs,
+                   count(*) FILTER (WHERE status = 'error') AS errors,
+                   count(*) FILTER (WHERE status = 'skipped') AS skipped,
+                   count(*) FILTER (WHERE status = 'missed') AS missed,
+                   round(quantile_cont(duration_ms, 0.5), 1) AS p50_ms,
+                   round(quantile_cont(duration_ms, 0.95), 1) AS p95_ms,
+                   round(max(duration_ms), 1) AS max_ms,
+                   round(avg(result_bytes)) AS avg_result_bytes,
+                   max(started_at) AS last_started_at,
+                   arg_max(status, started_at) AS last_status
+            FROM scheduler.job_runs
+            WHERE started_at >= now() - to_hours(CAST($1 AS INTEGER))
+            GROUP BY job_id
+            ORDER BY p95_ms DESC NULLS LAST
+        """, hours, fetch_all=True)
+
+    async def prune_job_runs(self) -> None:
+        await metadata_connection.execute_write("""
+            DELETE FROM scheduler.job_runs
+            WHERE started_at < now() - to_days(CAST($1 AS INTEGER))
+        """, get_settings().job_runs_retention_days)
+
+    @staticmethod
+    def _definition(job: dict) -> tuple:
+        return tuple(job.get(f) for f in JOB_DEFINITION_FIELDS)
+
+    @staticmethod
+    def _trigger_key(job: dict) -> tuple:
+        """Değiştiğinde job'un yeniden planlanmasını gerektiren alanlar."""
+        return (job.get("trigger_type"), job.get("interval_seconds"), job.get("cron_expression"), job.get("jitter_seconds"))
+
+    @staticmethod
+    def _job_options(job: dict) -> dict:
+        # Her seçenek her zaman geçilir: modify_job yalnızca verilen alanları değiştirir, bir alan
+        # NULL'a çekildiğinde çalışan job'da eski değer kalmasın. APScheduler'da misfire_grace_time=None
+        # "sınırsız" demektir, bu yüzden NULL varsayılana çevrilir.
+        return {
+            "max_instances": max(1, job.get("max_instances") or 1),
+            "coalesce": job.get("coalesce_runs") is not False,
+            "misfire_grace_time": job.get("misfire_grace_seconds") or DEFAULT_MISFIRE_GRACE_SECONDS,
+        }
+
+    @staticmethod
+    def _build_trigger(job: dict):
+        jitter = job.get("jitter_seconds") or None
+        if job["trigger_type"] == "interval":
+            return IntervalTrigger(seconds=job["interval_seconds"], jitter=jitter)
+
+        elif job["trigger_type"] == "cron":
+            trigger = CronTrigger.from_crontab(job["cron_expression"])
+            # Aynı dakikaya düşen cron job'ları hedeflere aynı anda yüklenmesin
+            trigger.jitter = jitter
+            return trigger
+
+        return None
+
+    def _apply_job(self, job: dict) -> str:
+        """
+        Tek bir job satırını çalışan scheduler'a uygular. Zamanlama alanları değiştiyse
+        job yeniden planlanır; yalnızca parametreler/ayarlar değiştiyse bir sonraki
+        çalışma zamanı korunarak yerinde güncellenir. Yapılan işlemi döndürür.
+        """
+        job_id = job["job_id"]
+        aps_id = f"{JOB_ID_PREFIX}{job_id}"
+        current = self._jobs.get(job_id)
 
-            elif job["trigger_type"] == "cron":
-                trigger = CronTrigger.from_crontab(job["cron_expression"])
+        if not job.get("is_active"):
+            return self._remove_job(job_id)
 
-            else:
-                continue
+        if current is not None and self._definition(current) == self._definition(job) and self.scheduler.get_job(aps_id):
+            return "unchanged"
 
+        try:
+            trigger = self._build_trigger(job)
+        except Exception as e:
+            logger.error("Invalid trigger for job %s: %s", job.get("job_name"), e)
+            trigger = None
+        if trigger is None:
+            return self._remove_job(job_id)
+
+        options = self._job_options(job)
+        if current is not None and self._trigger_key(current) == self._trigger_key(job) and self.scheduler.get_job(aps_id):
+            self.scheduler.modify_job(aps_id, kwargs={"job": job}, **options)
+            action = "updated"
+        else:
             self.scheduler.add_job(
                 self.execute_job,
                 trigger=trigger,
                 kwargs={"job": job},
-                id=f"job_{job['job_id']}",
+                id=aps_id,
                 replace_existing=True,
+                **options,
             )
+            action = "scheduled" if current is None else "rescheduled"
+
+        self._jobs[job_id] = job
+        logger.info("Job %s %s", job["job_name"], action)
+        return action
+
+    def _remove_job(self, job_id: int) -> str:
+        job = self._jobs.pop(job_id, None)
+        self._scheduled_at.pop(job_id, None)
+        aps_id = f"{JOB_ID_PREFIX}{job_id}"
+        if not self.scheduler.get_job(aps_id):
+            return "unchanged"
+        self.scheduler.remove_job(aps_id)
+        logger.info("Job %s removed", job["job_name"] if job else job_id)
+        return "removed"
+
+    @property
+    def is_leader(self) -> bool:
+        return self.scheduler.running
+
+    def notify_leader(self) -> bool:
+        """
+        Takipçide yapılan job değişikliğini lidere bildirir: işaret dosyasına yeni bir değer
+        yazılır, lider scheduler_change_poll_seconds içinde görüp reconcile eder.
+        Bildirilecek bir lider yoksa (leader election kapalı) False döner.
+        """
+        if not self._changes_path:
+            return False
+        tmp_path = f"{self._changes_path}.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            f.write(f"{os.getpid()} {time.time_ns()}\n")
+        os.replace(tmp_path, self._changes_path)
+        return True
+
+    def _read_changes(self) -> Optional[str]:
+        try:
+            with open(self._changes_path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    async def _watch_changes(self):
+        interval = get_settings().scheduler_change_poll_seconds
+        while True:
+            await asyncio.sleep(interval)
+            marker = self._read_changes()
+            if marker == self._changes_seen:
+                continue
+            self._changes_seen = marker
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Scheduler reconcile after a follower change failed")
+
+    async def sync_job(self, job_id: int) -> Optional[str]:
+        """Route'lardaki ekleme/güncelleme/silme sonrası yalnızca ilgili job'u senkronlar."""
+        if not self.scheduler.running:
+            # Bu süreç takipçiyse değişikliği lider uygular; henüz başlamadıysa başlarken tablodan yükler
+            self.notify_leader()
+            return None
+        async with self._sync_lock:
+            job = await self.get_job(job_id)
+            return self._apply_job(dict(job)) if job else self._remove_job(job_id)
+
+    async def reconcile(self) -> Dict[str, int]:
+        """
+        scheduled_jobs tablosunu çalışan scheduler ile karşılaştırır: eksikleri ekler,
+        değişenleri günceller, silinen/pasifleşenleri kaldırır. Tabloya route dışından
+        yapılan değişiklikler de periyodik olarak bu yolla uygulanır.
+        """
+        async with self._sync_lock:
+            rows = {job["job_id"]: dict(job) for job in await self.get_active_scheduled_jobs()}
+            summary: Dict[str, int] = {}
+            for job_id in [j for j in self._jobs if j not in rows]:
+                action = self._remove_job(job_id)
+                summary[action] = summary.get(action, 0) + 1
+            for job in rows.values():
+                action = self._apply_job(job)
+                summary[action] = summary.get(action, 0) + 1
+
+        changes = {k: v for k, v in summary.items() if k != "unchanged"}
+        if changes:
+            logger.info("Scheduler reconciled: %s", changes)
+        return summary
 
-            logger.info(f"Loaded job: {job['job_name']}")
+    async def load_jobs_from_db(self):
+        await self.reconcile()
 
     async def start(self):
+        """
+        Birden fazla sunucu süreci çalışıyorsa scheduler yalnızca liderde çalışır; diğer
+        süreçler takipçi olarak bekler ve lider kapanırsa en geç
+        scheduler_leader_poll_seconds içinde devralır.
+        """
+        settings = get_settings()
+        if not settings.scheduler_leader_election:
+            await self._start_scheduler()
+            return
+
+        self._leader_lock = LeaderLock(settings.scheduler_lock_path or f"{settings.metadata_duckdb_path}.scheduler.lock")
+        self._changes_path = f"{self._leader_lock.path}.changes"
+        if self._leader_lock.try_acquire():
+            logger.info("Scheduler leadership acquired (%s)", self._leader_lock.path)
+            await self._start_scheduler()
+        else:
+            logger.info("Scheduler leadership held by %s; running as follower", self._leader_lock.holder())
+            self._follower_task = asyncio.create_task(self._follow())
+
+    async def _follow(self):
+        interval = get_settings().scheduler_leader_poll_seconds
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._leader_lock.try_acquire():
+                    break
+            except OSError as e:
+                logger.warning("Scheduler leadership check failed: %s", e)
+        logger.info("Scheduler leadership taken over (%s)", self._leader_lock.path)
+        try:
+            await self._start_scheduler()
+        except Exception:
+            # Başlatılamazsa liderlik bırakılır, başka bir süreç devralabilsin
+            logger.exception("Scheduler failed to start after takeover; releasing leadership")
+            self._leader_lock.release()
+            self._follower_task = asyncio.create_task(self._follow())
+
+    def role(self) -> Dict[str, Any]:
+        lock = self._leader_lock
+        return {
+            "role": "leader" if self.scheduler.running else "follower",
+            "pid": os.getpid(),
+            "leader_election": lock is not None,
+            "lock_path": lock.path if lock else None,
+            "lock_holder": lock.holder() if lock else None,
+            "scheduled_jobs": len(self._jobs),
+        }
+
+    async def _start_scheduler(self):
+        if self._changes_path:
+            # Tablo okunmadan önce alınır: yükleme sırasında gelen bir bildirim kaçmaz
+            self._changes_seen = self._read_changes()
         await self.load_jobs_from_db()
+        self.scheduler.add_job(
+            self.prune_job_runs,
+            trigger=IntervalTrigger(hours=1),
+            id="scheduler_housekeeping",
+            replace_existing=True,
+        )
+        self.scheduler.add_job(
+            self.reconcile,
+            trigger=IntervalTrigger(seconds=get_settings().scheduler_reconcile_interval_seconds),
+            id="scheduler_reconcile",
+            replace_existing=True,
+        )
         # Initializing the connection is done in main via repository/metadata_connection check,
         # but self.load_jobs_from_db calls get_active_scheduled_jobs which calls execute_query
         # which calls metadata_connection.get_connection().
         # So we depend on metadata_connection being initialized globally (which it is called in mcp_server).
         self.scheduler.start()
+        if self._changes_path:
+            self._changes_task = asyncio.create_task(self._watch_changes())
         logger.info("Scheduler started")
 
     async def shutdown(self):
-        self.scheduler.shutdown(wait=True)
-        logger.info("Scheduler stopped")
-
-
-scheduler_manager = SchedulerManager()  # Singleton
\ No newline at end of file
+        if self._follower_task:
+            self._follower_task.cancel()
+            self._follower_task = None
+        if self._changes_task:
+            self._changes_task.cancel()
+            self._changes_task = None
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+            logger.info("Scheduler stopped")
+        if self._in_process is not None:
+            await self._in_process.__aexit__(None, None, None)
+            self._in_process = None
+        if self._leader_lock:
+            self._leader_lock.release()
+
+
+scheduler_manager = SchedulerManager()  # Singleton
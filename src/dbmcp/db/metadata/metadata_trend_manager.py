@@ -1,8 +1,18 @@
+import glob
 import json
 import logging
+import os
+import shutil
+import uuid
+import numpy as np
+import pyarrow as pa
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Any, List, Dict
 from fastmcp import Client, FastMCP
-from .metadata_connection import metadata_connection
+from config.settings import get_settings
+from utils.capacity_forecast import fit_growth
+from .leader_election import LeaderLock
+from .metadata_connection import CAPACITY_SNAPSHOT_COLUMNS, metadata_connection
 
 logger = logging.getLogger(__name__)
 
@@ -21,31 +31,362 @@ class TrendManager:
     # ✅ DATABASE CAPACITY SNAPSHOT
     async def add_database_capacity(
         self,
+        connection_id: int,
         dbname: str,
         size_bytes: int,
     ):
-        sql = """
-        INSERT INTO trends.pg_capacity_snapshots (
-            scope, dbname, size_bytes
-        ) VALUES (
-            'db', $1, $2
-        );
-        """
-        await metadata_connection.execute_query(sql, dbname, size_bytes)
+        await self._ingest_snapshot(connection_id, "db", [{
+            "dbname": dbname,
+            "schemaname": None,
+            "relname": None,
+            "size_bytes": size_bytes,
+        }])
 
     # ✅ TABLE CAPACITY SNAPSHOT
     async def add_table_capacity(
             self,
+            connection_id: int,
             dbname: str,
             schemaname: str,
             relname: str,
             size_bytes: int,
     ):
-        sql = """
-              INSERT INTO trends.pg_capacity_snapshots (scope, dbname, schemaname, relname, size_bytes) \
-              VALUES ('table', $1, $2, $3, $4); \
+        await self._ingest_snapshot(connection_id, "table", [{
+            "dbname": dbname,
+            "schemaname": schemaname,
+            "relname": relname,
+            "size_bytes": size_bytes,
+        }])
+
+    # ✅ TABLE CAPACITY SNAPSHOT (BULK)
+    async def add_table_capacities(self, connection_id: int, rows: List[Dict[str, Any]]) -> int:
+        """
+        Writes a whole table snapshot (dbname, schemaname, relname, size_bytes rows)
+        of one connection in one call and one transaction. All rows share the same snapshot_ts.
+        """
+        return await self._ingest_snapshot(connection_id, "table", rows)
+
+    async def _ingest_snapshot(self, connection_id: int, scope: str, rows: List[Dict[str, Any]]) -> int:
+        return await self.add_capacity_snapshots(
+            [dict(r, connection_id=connection_id, scope=scope) for r in rows]
+        )
+
+    # ✅ MULTI-CONNECTION CAPACITY SNAPSHOT (BULK)
+    async def add_capacity_snapshots(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Appends raw snapshot rows (connection_id, scope, dbname, schemaname, relname, size_bytes),
+        possibly for many connections, and folds them into the daily rollup in the same
+        transaction. The rows are handed to DuckDB as one Arrow table.
+        """
+        if not rows:
+            return 0
+
+        # Keep each connection's rows together so row-group zonemaps on connection_id stay tight
+        rows = sorted(rows, key=lambda r: (r["connection_id"], r["scope"]))
+        batch = pa.table({
+            "connection_id": pa.array([r["connection_id"] for r in rows], pa.int32()),
+            "scope": pa.array([r["scope"] for r in rows], pa.string()),
+            "dbname": pa.array([r["dbname"] for r in rows], pa.string()),
+            "schemaname": pa.array([r["schemaname"] for r in rows], pa.string()),
+            "relname": pa.array([r["relname"] for r in rows], pa.string()),
+            "size_bytes": pa.array([r["size_bytes"] for r in rows], pa.int64()),
+        })
+
+        # now() is the transaction start time, so all statements agree on snapshot_ts
+        insert_raw = """
+              INSERT INTO trends.pg_capacity_snapshots (snapshot_ts, connection_id, scope, dbname, schemaname, relname, size_bytes)
+              SELECT now(), connection_id, scope, dbname, schemaname, relname, size_bytes
+              FROM capacity_batch;
+              """
+        update_daily = """
+              UPDATE trends.pg_capacity_daily AS d
+              SET min_size  = least(d.min_size, b.size_bytes),
+                  max_size  = greatest(d.max_size, b.size_bytes),
+                  last_size = b.size_bytes,
+                  last_ts   = now(),
+                  samples   = d.samples + 1
+              FROM capacity_batch AS b
+              WHERE d.day = now()::date
+                AND d.connection_id = b.connection_id
+                AND d.scope = b.scope
+                AND d.dbname = b.dbname
+                AND d.schemaname = coalesce(b.schemaname, '')
+                AND d.relname = coalesce(b.relname, '');
+              """
+        insert_daily = """
+              INSERT INTO trends.pg_capacity_daily
+                  (connection_id, scope, dbname, schemaname, relname, day, min_size, max_size, last_size, last_ts, samples)
+              SELECT b.connection_id, b.scope, b.dbname, coalesce(b.schemaname, ''), coalesce(b.relname, ''), now()::date,
+                     b.size_bytes, b.size_bytes, b.size_bytes, now(), 1
+              FROM capacity_batch AS b
+              WHERE NOT EXISTS (
+                  SELECT 1
+                  FROM trends.pg_capacity_daily AS d
+                  WHERE d.day = now()::date
+                    AND d.connection_id = b.connection_id
+                    AND d.scope = b.scope
+                    AND d.dbname = b.dbname
+                    AND d.schemaname = coalesce(b.schemaname, '')
+                    AND d.relname = coalesce(b.relname, '')
+              );
               """
-        await metadata_connection.execute_query(sql, dbname, schemaname, relname, size_bytes)
+        await metadata_connection.execute_write_many(
+            [(insert_raw, ()), (update_daily, ()), (insert_daily, ())],
+            relations={"capacity_batch": batch},
+        )
+        return batch.num_rows
+
+    # ✅ RETENTION / PARQUET ARCHIVE
+    async def archive_snapshots(self, retention_days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Moves raw snapshots older than retention_days into Parquet files partitioned by
+        connection_id/year/month under trend_archive_dir, and deletes them from the live table.
+        The remaining rows are then compacted in connection order. The daily rollup is kept,
+        so trend tools are unaffected.
+        """
+        settings = get_settings()
+        retention_days = int(retention_days if retention_days is not None else settings.trend_retention_days)
+        archive_dir = settings.trend_archive_dir
+        staging_root = os.path.join(archive_dir, ".staging")
+        os.makedirs(staging_root, exist_ok=True)
+
+        # Runs may start from any worker (tool call or scheduled job); recovery must never see another run's staging dir
+        lock = LeaderLock(os.path.join(archive_dir, ".archive.lock"))
+        if not lock.try_acquire():
+            raise RuntimeError("Another trend archival run is in progress")
+        try:
+            return await self._archive_locked(retention_days, archive_dir, staging_root)
+        finally:
+            lock.release()
+
+    async def _archive_locked(self, retention_days: int, archive_dir: str, staging_root: str) -> Dict[str, Any]:
+        await self._recover_staged_archives(staging_root, archive_dir)
+
+        # One fixed cutoff for the count, the COPY and the DELETE (and for recovery, via the staging dir name)
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).replace(microsecond=0)
+        row = await metadata_connection.execute_query(
+            "SELECT count(*) AS n FROM trends.pg_capacity_snapshots WHERE snapshot_ts < $1",
+            cutoff, fetch_one=True
+        )
+        pending = row["n"] if row else 0
+        if not pending:
+            await self._compact_snapshots()
+            return {"archived_rows": 0, "retention_days": retention_days, "archive_dir": archive_dir}
+
+        # COPY is not transactional: files go to a staging dir and only move into the archive once the DELETE commits
+        staging_dir = os.path.join(staging_root, f"{int(cutoff.timestamp())}-{uuid.uuid4().hex}")
+        copy_sql = f"""
+            COPY (
+                SELECT *, year(snapshot_ts) AS year, month(snapshot_ts) AS month
+                FROM trends.pg_capacity_snapshots
+                WHERE snapshot_ts < $1
+            ) TO {self._quote(staging_dir)} (
+                FORMAT PARQUET,
+                PARTITION_BY (connection_id, year, month),
+                FILENAME_PATTERN 'snapshots_{{uuid}}'
+            );
+        """
+        delete_sql = "DELETE FROM trends.pg_capacity_snapshots WHERE snapshot_ts < $1;"
+        try:
+            await metadata_connection.execute_write_many([(copy_sql, (cutoff,)), (delete_sql, (cutoff,))], isolated=True)
+        except Exception:
+            # The error may come after the commit (e.g. a lost owner connection), so check before dropping files;
+            # if even that fails, the next run settles the staging dir
+            try:
+                await self._settle_staged_archive(staging_dir, cutoff, archive_dir)
+            except Exception as e:
+                logger.warning(f"Leaving trend archive staging dir {staging_dir} for the next run: {e}")
+            raise
+        self._promote_staged_archive(staging_dir, archive_dir)
+        await self._compact_snapshots()
+
+        # Let DuckDB reuse the freed blocks instead of growing the file
+        try:
+            await metadata_connection.execute_query("CHECKPOINT")
+        except Exception as e:
+            logger.warning(f"CHECKPOINT after trend archival failed: {e}")
+
+        logger.info("Archived %s capacity snapshots older than %s days to %s", pending, retention_days, archive_dir)
+        return {"archived_rows": pending, "retention_days": retention_days, "archive_dir": archive_dir}
+
+    @staticmethod
+    async def _compact_snapshots():
+        """
+        Rebuilds the live snapshots in (connection_id, scope, snapshot_ts) order. collect_all
+        appends every connection in one batch, so without this each row group spans all
+        connections and the connection_id zonemaps cannot skip any of them.
+        """
+        # A copy swapped in place of the table: DELETE + re-INSERT of every row in one
+        # transaction commits very slowly on DuckDB 1.1 once other cursors have read the table
+        columns = "snapshot_ts, scope, dbname, schemaname, relname, size_bytes, connection_id"
+        await metadata_connection.execute_write_many([
+            (f"CREATE TABLE trends.pg_capacity_snapshots_compact ({CAPACITY_SNAPSHOT_COLUMNS})", ()),
+            (f"""
+                INSERT INTO trends.pg_capacity_snapshots_compact ({columns})
+                SELECT {columns} FROM trends.pg_capacity_snapshots
+                ORDER BY connection_id, scope, snapshot_ts
+            """, ()),
+            ("DROP TABLE trends.pg_capacity_snapshots", ()),
+            ("ALTER TABLE trends.pg_capacity_snapshots_compact RENAME TO pg_capacity_snapshots", ()),
+        ], isolated=True)
+
+    async def _recover_staged_archives(self, staging_root: str, archive_dir: str):
+        """Settles staging dirs left by an archival run that died between its COPY and the rename."""
+        for name in sorted(os.listdir(staging_root)):
+            staging_dir = os.path.join(staging_root, name)
+            try:
+                cutoff = datetime.fromtimestamp(int(name.split("-", 1)[0]), tz=timezone.utc)
+            except ValueError:
+                logger.warning("Ignoring unexpected entry in trend archive staging dir: %s", staging_dir)
+                continue
+            await self._settle_staged_archive(staging_dir, cutoff, archive_dir)
+
+    async def _settle_staged_archive(self, staging_dir: str, cutoff: datetime, archive_dir: str):
+        """
+        If rows older than the run's cutoff are still live, its DELETE never committed and the
+        staged files are dropped; otherwise they are the only copy and move into the archive.
+        """
+        row = await metadata_connection.execute_query(
+            "SELECT count(*) AS n FROM trends.pg_capacity_snapshots WHERE snapshot_ts < $1",
+            cutoff, fetch_one=True
+        )
+        if row and row["n"]:
+            logger.warning("Discarding uncommitted trend archive files in %s", staging_dir)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        else:
+            logger.warning("Completing trend archival from %s", staging_dir)
+            self._promote_staged_archive(staging_dir, archive_dir)
+
+    @staticmethod
+    def _promote_staged_archive(staging_dir: str, archive_dir: str):
+        """Moves committed Parquet files into their connection_id/year/month partitions, then drops the staging dir."""
+        for path in glob.glob(os.path.join(staging_dir, "*", "*", "*", "*.parquet")):
+            target = os.path.join(archive_dir, os.path.relpath(path, staging_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _snapshot_source_sql(self, connection_id: int, days: int) -> str:
+        """
+        Raw snapshots of one connection: the live table, plus archived Parquet files when present.
+        Archive reads are pruned by the connection_id directory and the year partition, and only
+        cover timestamps older than the oldest live row so a half-finished archival never double counts.
+        """
+        live = """
+            SELECT snapshot_ts, scope, dbname, schemaname, relname, size_bytes
+            FROM trends.pg_capacity_snapshots
+            WHERE connection_id = $1
+        """
+        partition_dir = os.path.join(get_settings().trend_archive_dir, f"connection_id={int(connection_id)}")
+        if not glob.glob(os.path.join(partition_dir, "*", "*", "*.parquet")):
+            return live
+
+        pattern = os.path.join(partition_dir, "*", "*", "*.parquet")
+        first_year = (datetime.now() - timedelta(days=days)).year
+        return live + f"""
+            UNION ALL
+            SELECT snapshot_ts, scope, dbname, schemaname, relname, size_bytes
+            FROM read_parquet({self._quote(pattern)}, hive_partitioning = true)
+            WHERE year >= {first_year}
+              AND snapshot_ts < coalesce(
+                  (SELECT min(snapshot_ts) FROM trends.pg_capacity_snapshots WHERE connection_id = $1),
+                  'infinity'::TIMESTAMPTZ)
+        """
+
+    async def get_snapshot_history(
+            self,
+            connection_id: int,
+            scope: str,
+            days: int,
+            schemaname: Optional[str] = None,
+            relname: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Raw snapshot series over the last `days`, reading through to the Parquet archive."""
+        sql = f"""
+            SELECT snapshot_ts, dbname, schemaname, relname, size_bytes
+            FROM ({self._snapshot_source_sql(connection_id, days)}) AS s
+            WHERE scope = $2
+              AND snapshot_ts >= now() - to_days(CAST($3 AS INTEGER))
+              AND ($4::VARCHAR IS NULL OR schemaname = $4)
+              AND ($5::VARCHAR IS NULL OR relname = $5)
+            ORDER BY schemaname, relname, snapshot_ts
+        """
+        return await self.execute_query(sql, connection_id, scope, days, schemaname, relname)
+
+    # ✅ CAPACITY FORECAST
+    async def forecast_capacity(
+            self,
+            connection_id: int,
+            scope: str = "table",
+            days: int = 90,
+            horizon_days: int = 30,
+            method: str = "linear",
+            limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fits a growth line to the daily series of every object of a connection in one
+        vectorized pass and returns the fastest growing ones with R² and projected size.
+        """
+        # Numeric columns only; objects are identified by a 64-bit hash of their name so that
+        # no string column is materialized for the whole series
+        sql = """
+            SELECT hash(dbname, schemaname, relname) AS object_key,
+                   day - DATE '1970-01-01' AS x,
+                   last_size AS size_bytes
+            FROM trends.pg_capacity_daily
+            WHERE connection_id = $1
+              AND scope = $2
+              AND day >= current_date - CAST($3 AS INTEGER)
+        """
+        data = await metadata_connection.fetch_numpy(sql, connection_id, scope, days)
+        if len(data["object_key"]) == 0:
+            return []
+
+        object_keys, obj = np.unique(data["object_key"], return_inverse=True)
+        x = data["x"].astype(np.float64)
+        fit = fit_growth(obj, x - x.min(), data["size_bytes"], horizon_days, method)
+
+        # Only objects with at least two days can have a trend
+        ranked = [i for i in np.argsort(-fit["slope"]) if fit["points"][i] >= 2][:limit]
+        if not ranked:
+            return []
+
+        # Resolve names for the ranked objects only
+        names_sql = """
+            SELECT DISTINCT hash(dbname, schemaname, relname) AS object_key, dbname, schemaname, relname
+            FROM trends.pg_capacity_daily
+            WHERE connection_id = $1
+              AND scope = $2
+              AND day >= current_date - CAST($3 AS INTEGER)
+              AND hash(dbname, schemaname, relname) IN (SELECT unnest($4::UBIGINT[]))
+        """
+        names = {
+            r["object_key"]: r
+            for r in await self.execute_query(
+                names_sql, connection_id, scope, days, [int(object_keys[i]) for i in ranked]
+            )
+        }
+
+        mb = 1024.0 * 1024.0
+        results = []
+        for i in ranked:
+            name = names.get(int(object_keys[i]), {})
+            results.append({
+                "dbname": name.get("dbname"),
+                "schemaname": name.get("schemaname") or None,
+                "relname": name.get("relname") or None,
+                "points": int(fit["points"][i]),
+                "current_size_bytes": int(fit["last_size"][i]),
+                "growth_mb_per_day": round(float(fit["slope"][i]) / mb, 3),
+                "r2": round(float(fit["r2"][i]), 4),
+                "horizon_days": horizon_days,
+                "projected_size_bytes": int(max(fit["projected_size"][i], 0)),
+            })
+        return results
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        return "'" + value.replace("'", "''") + "'"
 
     async def execute_query(self, sql: str, *params) -> List[Dict[str, Any]]:
         # This was a generic helper, redirect to metadata_connection's execute_query
@@ -53,7 +394,7 @@ class TrendManager:
 
     async def execute_dml(self, sql: str, *params) -> List[Dict[str, Any]]:
         # This was a generic helper, redirect to metadata_connection's execute_query
-        await metadata_connection.execute_query(sql, *params)
+        await metadata_connection.execute_write(sql, *params)
         return []
 
 trend_manager = TrendManager()  # Singleton
@@ -0,0 +1,125 @@
+# admission.py
+import asyncio
+import heapq
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from .request_context import request_priority
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejectedError(RuntimeError):
+    """Hedef aşırı yüklüyken (kuyruk dolu veya kuyrukta bekleme süresi aşıldı) çağrı reddedilir."""
+
+
+@dataclass
+class _TargetQueue:
+    limit: int = 1
+    in_flight: int = 0
+    queued: int = 0
+    admitted: int = 0
+    shed: int = 0
+    # (priority, seq, future); iptal edilen/atılan girişler heap'ten tembel silinir
+    waiters: List[Tuple[int, int, asyncio.Future]] = field(default_factory=list)
+
+
+class AdmissionController:
+    """
+    Hedef başına eşzamanlı çağrı sınırı. Sınır doluysa çağrılar öncelik sırasıyla
+    (düşük değer önce, eşitse geliş sırası) bekler; kuyruk doluysa veya bekleme
+    süresi aşılırsa AdmissionRejectedError ile hemen reddedilir. Kuyruk doluyken
+    gelen daha yüksek öncelikli çağrı, kuyruktaki en düşük öncelikli çağrının yerini alır.
+    """
+
+    def __init__(self):
+        self._targets: Dict[int, _TargetQueue] = {}
+        self._seq = itertools.count()
+
+    @asynccontextmanager
+    async def admit(self, connection_id: int, limit: int, max_queue: int, queue_timeout: float):
+        q = self._targets.setdefault(connection_id, _TargetQueue())
+        q.limit = max(1, limit)
+        priority = request_priority.get()
+
+        if q.in_flight < q.limit and q.queued == 0:
+            q.in_flight += 1
+        else:
+            await self._wait_for_slot(connection_id, q, priority, max_queue, queue_timeout)
+        q.admitted += 1
+
+        try:
+            yield
+        finally:
+            q.in_flight -= 1
+            self._wake(q)
+
+    async def _wait_for_slot(self, connection_id: int, q: _TargetQueue, priority: int, max_queue: int, queue_timeout: float):
+        if q.queued >= max_queue:
+            self._shed_for(connection_id, q, priority)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(q.waiters, (priority, next(self._seq), future))
+        q.queued += 1
+        try:
+            async with asyncio.timeout(queue_timeout):
+                await future
+        except TimeoutError:
+            if self._granted(future):
+                return
+            q.queued -= 1
+            q.shed += 1
+            raise AdmissionRejectedError(
+                f"Target id={connection_id} is overloaded: waited {queue_timeout:g}s in queue "
+                f"({q.in_flight} in flight, {q.queued} queued); retry later"
+            ) from None
+        except asyncio.CancelledError:
+            if self._granted(future):
+                # Slot verilmişti ama çağıran iptal edildi: slotu sıradakine devret
+                q.in_flight -= 1
+                self._wake(q)
+            elif not future.done() or future.cancelled():
+                q.queued -= 1
+            raise
+
+    def _shed_for(self, connection_id: int, q: _TargetQueue, priority: int):
+        """Kuyruk dolu: yeni çağrıdan daha düşük öncelikli bekleyen varsa o atılır, yoksa yeni çağrı."""
+        live = [w for w in q.waiters if not w[2].done()]
+        victim = max(live, key=lambda w: (w[0], w[1]), default=None)
+        if victim is None or victim[0] <= priority:
+            q.shed += 1
+            raise AdmissionRejectedError(
+                f"Target id={connection_id} is overloaded: {q.in_flight} in flight, "
+                f"{q.queued} queued (queue limit reached); retry later"
+            )
+        victim[2].set_exception(AdmissionRejectedError(
+            f"Target id={connection_id} is overloaded: request shed in favour of higher priority work; retry later"
+        ))
+        q.queued -= 1
+        q.shed += 1
+
+    @staticmethod
+    def _granted(future: asyncio.Future) -> bool:
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    @staticmethod
+    def _wake(q: _TargetQueue):
+        while q.in_flight < q.limit and q.waiters:
+            _, _, future = heapq.heappop(q.waiters)
+            if future.done():
+                continue
+            q.queued -= 1
+            q.in_flight += 1
+            future.set_result(None)
+
+    def stats(self, connection_id: int) -> Dict[str, Any]:
+        q = self._targets.get(connection_id)
+        if not q:
+            return {"limit": None, "in_flight": 0, "queued": 0, "admitted": 0, "shed": 0}
+        return {"limit": q.limit, "in_flight": q.in_flight, "queued": q.queued, "admitted": q.admitted, "shed": q.shed}
+
+
+admission_controller = AdmissionController()  # Singleton
@@ -0,0 +1,232 @@
+# catalog_cache.py
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+Fetch = Callable[..., Awaitable[List[Dict[str, Any]]]]
+
+# Katalog parmak izi: DDL pg_class/pg_attribute/pg_index/pg_attrdef satırlarını ekler, siler veya
+# günceller; bu katalogların kümülatif tuple sayaçları (pg_stat) artar. Sayaçlar birkaç
+# fonksiyon çağrısıyla okunur, katalog taranmaz (40k ilişkide bile milisaniyenin altında).
+# VACUUM/ANALYZE istatistikleri in-place yazar, sayaçları değiştirmez. Sayaçlar DDL'i çalıştıran
+# oturum bağlı kalırsa ~10 sn gecikmeyle yayınlanır; bu sunucudan çalışan DDL mark_stale ile hemen
+# görülür. track_counts kapalıysa catalog_cache_max_age_seconds yine de tam kontrolü garanti eder.
+FINGERPRINT_SQL = """
+    SELECT string_agg(pg_stat_get_tuples_inserted(c)::text || ':' || pg_stat_get_tuples_updated(c)::text
+                      || ':' || pg_stat_get_tuples_deleted(c)::text, '/') AS fingerprint
+    FROM unnest(ARRAY['pg_catalog.pg_class', 'pg_catalog.pg_attribute',
+                      'pg_catalog.pg_index', 'pg_catalog.pg_attrdef']::regclass[]) AS c
+"""
+
+# İlişki başına sürüm: kendi pg_class satırı, kolonları, indexleri ve default'larının xmin toplamı
+VERSIONS_SQL = """
+    SELECT c.oid::bigint AS oid,
+           c.xmin::text::bigint
+               + coalesce(a.v, 0) + coalesce(i.v, 0) + coalesce(d.v, 0) AS version
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN (SELECT attrelid, sum(xmin::text::bigint) AS v FROM pg_attribute GROUP BY attrelid) a
+           ON a.attrelid = c.oid
+    LEFT JOIN (SELECT indrelid, sum(xmin::text::bigint) AS v FROM pg_index GROUP BY indrelid) i
+           ON i.indrelid = c.oid
+    LEFT JOIN (SELECT adrelid, sum(xmin::text::bigint) AS v FROM pg_attrdef GROUP BY adrelid) d
+           ON d.adrelid = c.oid
+    WHERE c.relkind IN ('r', 'p', 'v', 'f')
+      AND n.nspname NOT LIKE 'pg\\_toast%'
+      AND n.nspname NOT LIKE 'pg\\_temp\\_%'
+"""
+
+# $1 NULL ise tüm ilişkiler, değilse yalnızca değişen oid'ler yüklenir. Satırlar tool'ların
+# önceki çıktısıyla aynı olsun diye information_schema'dan okunur: aynı kolonlar ve aynı yetki
+# filtresi (rolün erişemediği nesneler listelenmez).
+TABLES_SQL = """
+    SELECT c.oid::bigint AS oid, t.*
+    FROM information_schema.tables t
+    JOIN pg_namespace n ON n.nspname = t.table_schema
+    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = t.table_name
+    WHERE ($1::oid[] IS NULL OR c.oid = ANY($1::oid[]))
+"""
+
+# information_schema.columns toplu okunamayacak kadar yavaş (40k ilişkide onlarca saniye);
+# kolonlar ilişki ilk istendiğinde tool'un önceki sorgusuyla yüklenir ve sürümü değişene kadar tutulur
+COLUMNS_SQL = """
+    SELECT * FROM information_schema.columns
+    WHERE table_schema = $1 AND table_name = $2
+    ORDER BY ordinal_position
+"""
+
+INDEXES_SQL = """
+    SELECT i.indrelid::bigint AS oid,
+           ic.relname AS index_name,
+           i.indisprimary AS is_primary,
+           i.indisunique AS is_unique,
+           i.indisvalid AS is_valid,
+           pg_get_indexdef(i.indexrelid) AS definition
+    FROM pg_index i
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    WHERE ($1::oid[] IS NULL OR i.indrelid = ANY($1::oid[]))
+    ORDER BY i.indrelid, ic.relname
+"""
+
+
+@dataclass
+class _Relation:
+    oid: int
+    version: int
+    table: Dict[str, Any]
+    columns: Optional[List[Dict[str, Any]]] = None
+    indexes: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class _Snapshot:
+    fingerprint: Optional[str] = None
+    checked_at: float = 0.0
+    loaded_at: Optional[float] = None
+    verified_at: float = 0.0
+    # DDL bu sunucudan çalıştırıldı: parmak izine bakmadan sürümler kontrol edilir
+    # (DDL'i çalıştıran backend sayaçlarını biraz gecikmeli yayınlayabilir)
+    force_check: bool = False
+    # Katalogdaki tüm ilişkilerin sürümleri; relations yalnızca rolün görebildiklerini tutar
+    versions: Dict[int, int] = field(default_factory=dict)
+    relations: Dict[int, _Relation] = field(default_factory=dict)
+    # (schema, table) -> oid ve schema -> oid listesi
+    by_name: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    by_schema: Dict[str, List[int]] = field(default_factory=dict)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class CatalogCache:
+    """
+    Hedef başına bellek içi katalog görüntüsü (tablolar, kolonlar, indexler). Tablolar ve
+    indexler ilk kullanımda toplu sorgularla, kolonlar ilişki başına ilk istendiğinde yüklenir;
+    sonraki çağrılar bellekten cevaplanır.
+    Kontrol yalnızca erişimde yapılır: son kontrolden catalog_cache_check_interval_seconds
+    geçtiyse ucuz bir parmak izi okunur; değiştiyse (veya catalog_cache_max_age_seconds
+    dolduysa) yalnızca sürümü değişen ilişkiler yeniden yüklenir.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[int, _Snapshot] = {}
+
+    def invalidate(self, connection_id: int):
+        """Önbelleği tamamen siler (bağlantı kapandı veya bilgileri değişti)."""
+        self._snapshots.pop(connection_id, None)
+
+    def mark_stale(self, connection_id: int):
+        """DDL çalıştırılmış olabilir: bir sonraki okumada parmak izi hemen kontrol edilir."""
+        snapshot = self._snapshots.get(connection_id)
+        if snapshot:
+            snapshot.checked_at = 0.0
+            snapshot.force_check = True
+
+    async def tables(self, connection_id: int, fetch: Fetch, schema_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        snapshot = await self._fresh(connection_id, fetch)
+        if schema_name is None:
+            oids = snapshot.relations.keys()
+        else:
+            oids = snapshot.by_schema.get(schema_name, [])
+        rows = [dict(snapshot.relations[oid].table) for oid in oids]
+        return sorted(rows, key=lambda r: (r["table_schema"], r["table_name"]))
+
+    async def columns(self, connection_id: int, fetch: Fetch, schema_name: str, table_name: str) -> List[Dict[str, Any]]:
+        relation = await self._relation(connection_id, fetch, schema_name, table_name)
+        if relation is None:
+            return []
+        if relation.columns is None:
+            relation.columns = await fetch(COLUMNS_SQL, schema_name, table_name)
+        return [dict(r) for r in relation.columns]
+
+    async def indexes(self, connection_id: int, fetch: Fetch, schema_name: str, table_name: str) -> List[Dict[str, Any]]:
+        relation = await self._relation(connection_id, fetch, schema_name, table_name)
+        return [dict(r) for r in relation.indexes] if relation else []
+
+    def stats(self, connection_id: int) -> Dict[str, Any]:
+        snapshot = self._snapshots.get(connection_id)
+        if not snapshot or snapshot.loaded_at is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "relations": len(snapshot.relations),
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1),
+            "fingerprint": snapshot.fingerprint,
+        }
+
+    async def _relation(self, connection_id: int, fetch: Fetch, schema_name: str, table_name: str) -> Optional[_Relation]:
+        snapshot = await self._fresh(connection_id, fetch)
+        oid = snapshot.by_name.get((schema_name, table_name))
+        return snapshot.relations.get(oid) if oid is not None else None
+
+    async def _fresh(self, connection_id: int, fetch: Fetch) -> _Snapshot:
+        snapshot = self._snapshots.setdefault(connection_id, _Snapshot())
+        settings = get_settings()
+        interval = settings.catalog_cache_check_interval_seconds
+        if snapshot.loaded_at is not None and time.monotonic() - snapshot.checked_at < interval:
+            return snapshot
+
+        async with snapshot.lock:
+            # Lock beklenirken başka bir çağrı yenilemiş olabilir
+            if snapshot.loaded_at is not None and time.monotonic() - snapshot.checked_at < interval:
+                return snapshot
+            rows = await fetch(FINGERPRINT_SQL)
+            fingerprint = rows[0]["fingerprint"]
+            now = time.monotonic()
+            snapshot.checked_at = now
+            expired = now - snapshot.verified_at >= settings.catalog_cache_max_age_seconds
+            if fingerprint != snapshot.fingerprint or snapshot.force_check or expired:
+                snapshot.force_check = False
+                await self._refresh(connection_id, snapshot, fetch)
+                snapshot.fingerprint = fingerprint
+                snapshot.verified_at = now
+        return snapshot
+
+    async def _refresh(self, connection_id: int, snapshot: _Snapshot, fetch: Fetch):
+        started = time.monotonic()
+        versions = {int(r["oid"]): int(r["version"]) for r in await fetch(VERSIONS_SQL)}
+
+        removed = [oid for oid in snapshot.versions if oid not in versions]
+        changed = [oid for oid, version in versions.items() if snapshot.versions.get(oid) != version]
+        for oid in removed + changed:
+            # Değişen ilişki yetkisini kaybetmiş olabilir: yeniden yüklenmezse görünmez kalır
+            snapshot.relations.pop(oid, None)
+        snapshot.versions = versions
+
+        if changed:
+            # İlk yüklemede veya değişiklik büyükse oid listesi göndermek yerine hepsi okunur
+            oids = None if len(changed) * 2 > len(versions) else changed
+            tables = await fetch(TABLES_SQL, oids)
+            indexes = await fetch(INDEXES_SQL, oids)
+
+            loaded: Dict[int, _Relation] = {}
+            for row in tables:
+                oid = int(row.pop("oid"))
+                loaded[oid] = _Relation(oid=oid, version=versions.get(oid, 0), table=row)
+            for row in indexes:
+                relation = loaded.get(int(row.pop("oid")))
+                if relation:
+                    relation.indexes.append(row)
+            snapshot.relations.update(loaded)
+
+        if removed or changed:
+            by_name: Dict[Tuple[str, str], int] = {}
+            by_schema: Dict[str, List[int]] = {}
+            for oid, relation in snapshot.relations.items():
+                key = (relation.table["table_schema"], relation.table["table_name"])
+                by_name[key] = oid
+                by_schema.setdefault(key[0], []).append(oid)
+            snapshot.by_name, snapshot.by_schema = by_name, by_schema
+
+        snapshot.loaded_at = time.monotonic()
+        logger.info(
+            "📚 Catalog cache for id=%s: %s relations, %s reloaded, %s removed in %.2fs",
+            connection_id, len(snapshot.relations), len(changed), len(removed), time.monotonic() - started,
+        )
+
+
+catalog_cache = CatalogCache()  # Singleton
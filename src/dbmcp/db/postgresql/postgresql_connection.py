@@ -1,12 +1,123 @@
+import asyncio
+import random
+import time
 import asyncpg
 import logging
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from config.settings import get_settings
 from db.encryption import decrypt_password   # <- mevcut dosyandaki fonksiyon
-from typing import Any, Dict, Optional
+from .request_context import DeadlineExceededError, remaining_seconds
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+# Hedefin erişilemez olduğunu gösteren hatalar (sorgu hataları breaker'ı etkilemez)
+CONNECTION_ERRORS = (
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.AdminShutdownError,
+    asyncpg.CrashShutdownError,
+    OSError,
+    asyncio.TimeoutError,
+)
+
+# Sorgu metni -> sonuç şekli; asyncpg statement_cache_size ile aynı boyutta tutulur
+STATEMENT_CACHE_SIZE = 1024
+SHAPE_ROWS = "rows"        # satır döndürür (SELECT, WITH, SHOW, EXPLAIN, VALUES, ... RETURNING)
+SHAPE_COMMAND = "command"  # satır döndürmez (DML, DDL)
+SHAPE_SCRIPT = "script"    # birden fazla komut; yalnızca simple query protokolüyle çalışır
+
+
+# Çok worker'lı modda bu sürecin sırası (0..server_workers-1); limitlerin kalanı ilk worker'lara verilir
+_worker_index = 0
+
+
+def set_worker_index(index: int):
+    global _worker_index
+    _worker_index = index
+
+
+def worker_share(limit: Optional[int]) -> Optional[int]:
+    """
+    Çok worker'lı modda (server_workers > 1) hedef başına limitler her süreçte ayrı
+    uygulanır; limit worker'lara bölünür ve kalan ilk worker'lara birer birer verilir,
+    böylece worker'ların toplamı tam olarak yapılandırılan limittir. limit worker
+    sayısından küçükse bazı worker'lar 0 alır; check_worker_limit bunu reddeder.
+    """
+    if limit is None:
+        return None
+    workers = max(1, get_settings().server_workers)
+    return limit // workers + (1 if _worker_index < limit % workers else 0)
+
+
+def check_worker_limit(name: str, limit: Optional[int]):
+    """Her worker'a en az bir bağlantı (veya stream) düşmeyecekse ValueError verir."""
+    workers = get_settings().server_workers
+    if limit is not None and limit < workers:
+        raise ValueError(f"{name} ({limit}) must be at least SERVER_WORKERS ({workers}); "
+                         f"the limit is divided among the workers")
+
+
+class CircuitOpenError(RuntimeError):
+    """Breaker açıkken çağrılar ağa gitmeden bu hatayla hemen döner."""
+
+
+def check_deadline():
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError("Tool call deadline exceeded before the query could start")
+
+
+def query_timeout() -> Optional[float]:
+    """
+    Çağrının kalan süresi, asyncpg'nin timeout= argümanı için. Süre dolunca asyncpg
+    sunucuya cancel isteği gönderir; acquire başına ek bir SET round trip'i gerekmez.
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return None
+    check_deadline()
+    return remaining
+
+
+async def apply_statement_timeout(conn: asyncpg.Connection, local: bool = False):
+    """
+    Çağrının kalan süresini statement_timeout olarak uygular (sayfalar arasında açık kalan
+    cursor'lar için; transaction içindeyse SET LOCAL kullanılır).
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return
+    check_deadline()
+    scope = "LOCAL " if local else ""
+    await conn.execute(f"SET {scope}statement_timeout = {max(1, int(remaining * 1000))}")
+
+
+async def _cached_statement(conn: asyncpg.Connection, sql: str, timeout: Optional[float] = None):
+    """
+    Statement'ı asyncpg'nin statement cache'inden alır (yoksa prepare edip cache'e koyar).
+    Connection.prepare() cache'i atlar (use_cache=False): her çağrıda ayrı bir Parse/Describe
+    round trip'i yapar ve sunucudaki statement GC'ye kadar yaşar. fetch()/execute() bu
+    cache'li yolu kullandığı için aynı sorgunun sonraki çağrıları yeniden parse edilmez.
+    """
+    return await conn._prepare(sql, timeout=timeout, use_cache=True)
+
+
+def _columnar(stmt, records: List[asyncpg.Record]) -> Dict[str, Any]:
+    attributes = stmt.get_attributes() if stmt is not None else ()
+    return {
+        "columns": [a.name for a in attributes],
+        "types": [a.type.name for a in attributes],
+        "rows": [list(r) for r in records],
+        "row_count": len(records),
+    }
+
+
 class PostgresqlConnection:
     """Tek bir veritabanı bağlantısı için havuz sarmalayıcı."""
 
@@ -16,32 +127,78 @@ class PostgresqlConnection:
         self.pool: Optional[asyncpg.Pool] = None
         self.connected: bool = False
 
-    async def connect(self) -> bool:
-        """Havuzu kur ve test et."""
-        try:
-            password = None
-            enc = self.connection_info.get("encrypted_password")
-            if enc:
-                password = decrypt_password(enc)
-
-            # DİKKAT: asyncpg'de database parametresi 'database' adıdır.
-            self.pool = await asyncpg.create_pool(
-                host=self.connection_info["host"],
-                port=int(self.connection_info["port"]),
-                database=self.connection_info["database_name"],
-                user=self.connection_info["username"],
-                password=password,
-                min_size=get_settings().db_pool_min_size,
-                max_size=get_settings().db_pool_max_size,
-                timeout=10.0,
-                statement_cache_size=1024,
-            )
+        # Health monitor / circuit breaker durumu
+        self.breaker_state: str = BREAKER_CLOSED
+        self.consecutive_failures: int = 0
+        self.reconnect_attempts: int = 0
+        self.last_error: Optional[str] = None
+        self.last_probe_at: Optional[float] = None      # time.time()
+        self.last_success_at: float = 0.0               # time.monotonic()
+        self.retry_at: float = 0.0                      # time.monotonic()
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._shapes: "OrderedDict[str, str]" = OrderedDict()
+
+        # Havuz yaşam döngüsü: ilk kullanımda açılır, boşta kalınca kapanır
+        self.last_used_at: float = time.monotonic()
+        self.peak_in_use: int = 0
+        self._pool_lock = asyncio.Lock()
+        # Arka planda kapatılan havuzlar ve backend iptalleri; referans tutulmazsa GC toplayabilir
+        self._background_tasks: set = set()
 
-            # Basit sağlık kontrolü
-            async with self.pool.acquire() as conn:
+    # Bu sürecin payı; çok worker'lı modda hedefe toplamda yapılandırılan kadar bağlantı açılır
+    @property
+    def pool_min_size(self) -> int:
+        value = self.connection_info.get("pool_min_size")
+        return worker_share(get_settings().db_pool_min_size if value is None else int(value))
+
+    @property
+    def pool_max_size(self) -> int:
+        value = self.connection_info.get("pool_max_size")
+        # Başlangıçta ve limit değişikliklerinde doğrulanır; yine de boş havuz açılmaz
+        return max(1, worker_share(get_settings().db_pool_max_size if value is None else int(value)))
+
+    async def _create_pool(self) -> asyncpg.Pool:
+        password = None
+        enc = self.connection_info.get("encrypted_password")
+        if enc:
+            password = decrypt_password(enc)
+
+        # DİKKAT: asyncpg'de database parametresi 'database' adıdır.
+        pool = await asyncpg.create_pool(
+            host=self.connection_info["host"],
+            port=int(self.connection_info["port"]),
+            database=self.connection_info["database_name"],
+            user=self.connection_info["username"],
+            password=password,
+            # Havuz min_size'dan talebe göre max_size'a kadar büyür, boşta kalan bağlantılar kapanır
+            min_size=min(self.pool_min_size, self.pool_max_size),
+            max_size=self.pool_max_size,
+            max_inactive_connection_lifetime=get_settings().db_pool_max_inactive_seconds,
+            timeout=get_settings().db_connect_timeout_seconds,
+            statement_cache_size=STATEMENT_CACHE_SIZE,
+        )
+
+        # Basit sağlık kontrolü
+        try:
+            async with pool.acquire() as conn:
                 await conn.execute("SELECT 1;")
+        except BaseException:
+            pool.terminate()
+            raise
+        return pool
 
+    async def connect(self, lazy: bool = False) -> bool:
+        """Havuzu kur ve test et. lazy=True ise havuz ilk kullanımda açılır."""
+        if lazy:
             self.connected = True
+            self._close_breaker()
+            self._start_monitor()
+            return True
+        try:
+            self.pool = await self._create_pool()
+            self.connected = True
+            self._close_breaker()
+            self._start_monitor()
             logger.info(
                 "🔗 Connected: %s@%s:%s/%s [id=%s]",
                 self.connection_info["username"],
@@ -57,18 +214,340 @@ class PostgresqlConnection:
             return False
 
     async def disconnect(self):
+        await self._stop_monitor()
         if self.pool:
             await self.pool.close()
         self.pool = None
         self.connected = False
         logger.info("🔌 Disconnected id=%s", self.connection_info.get("id"))
 
+    async def ensure_pool(self) -> asyncpg.Pool:
+        """Havuz kapalıysa (lazy veya boşta kalıp kapatılmış) yeniden açar."""
+        self.ensure_available()
+        self.last_used_at = time.monotonic()
+        if self.pool:
+            return self.pool
+        async with self._pool_lock:
+            if not self.pool:
+                try:
+                    self.pool = await self._create_pool()
+                except CONNECTION_ERRORS as e:
+                    self.record_failure(e)
+                    raise
+                logger.info("🔗 Pool opened for id=%s (min=%s, max=%s)",
+                            self.connection_info.get("id"), self.pool_min_size, self.pool_max_size)
+        return self.pool
+
+    def is_idle(self) -> bool:
+        pool = self.pool
+        return pool is not None and pool.get_idle_size() == pool.get_size()
+
+    async def evict(self) -> bool:
+        """Boştaki havuzu kapatır; bağlantı kayıtlı kalır ve ilk kullanımda yeniden açılır."""
+        async with self._pool_lock:
+            if not self.is_idle():
+                return False
+            pool, self.pool = self.pool, None
+        await pool.close()
+        logger.info("💤 Idle pool closed for id=%s", self.connection_info.get("id"))
+        return True
+
+    async def set_pool_limits(self, pool_min_size: Optional[int], pool_max_size: Optional[int]):
+        """
+        Limitleri değiştirir. Açık havuz yeni çağrılara kapatılır ve kullanımdaki
+        bağlantılar bırakılınca arka planda kapanır; sonraki çağrı yeni limitlerle açar.
+        """
+        self.connection_info["pool_min_size"] = pool_min_size
+        self.connection_info["pool_max_size"] = pool_max_size
+        async with self._pool_lock:
+            pool, self.pool = self.pool, None
+        if pool:
+            self._run_in_background(self._close_retired_pool(pool))
+
+    async def _close_retired_pool(self, pool: asyncpg.Pool):
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.warning("⚠️ Closing retired pool failed for id=%s: %s", self.connection_info.get("id"), e)
+            pool.terminate()
+
+    def _run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     @asynccontextmanager
     async def get_connection(self):
-        if not self.pool:
-            raise RuntimeError("Pool not initialized")
-        conn = await self.pool.acquire()
+        check_deadline()
+        pool = await self.ensure_pool()
+        try:
+            conn = await pool.acquire()
+        except CONNECTION_ERRORS as e:
+            self.record_failure(e)
+            raise
+        in_use = pool.get_size() - pool.get_idle_size()
+        if in_use > self.peak_in_use:
+            self.peak_in_use = in_use
         try:
             yield conn
+        except asyncio.CancelledError:
+            # İstemci iptal etti veya tool deadline'ı doldu: sorgu hedefte çalışmaya
+            # devam etmesin, slot da iptalin bitmesini beklemeden boşalsın
+            self.abandon(conn)
+            raise
+        except CONNECTION_ERRORS as e:
+            self.record_failure(e)
+            raise
+        else:
+            self.record_success()
         finally:
-            await self.pool.release(conn)
\ No newline at end of file
+            await pool.release(conn)
+
+    def abandon(self, conn: asyncpg.Connection):
+        """Bağlantıyı hemen kapatır ve backend'deki sorguyu arka planda iptal ettirir."""
+        if conn.is_closed():
+            return
+        pid = conn.get_server_pid()
+        conn.terminate()
+        self._run_in_background(self._cancel_backend(pid))
+
+    async def _cancel_backend(self, pid: int):
+        # Kapatılan soket backend'e ancak bir sonraki yazmada fark edilir; uzun bir sorgu
+        # o ana kadar çalışır. pg_cancel_backend sorguyu hemen durdurur.
+        pool = self.pool
+        if not pool:
+            return
+        try:
+            async with asyncio.timeout(get_settings().db_health_probe_timeout_seconds):
+                await pool.execute("SELECT pg_cancel_backend($1)", pid)
+            logger.info("🛑 Cancelled backend pid=%s for id=%s", pid, self.connection_info.get("id"))
+        except Exception as e:
+            logger.warning("⚠️ Could not cancel backend pid=%s for id=%s: %s",
+                           pid, self.connection_info.get("id"), e)
+
+    async def run_statement(self, conn: asyncpg.Connection, sql: str, *params, columnar: bool = False,
+                            max_rows: Optional[int] = None):
+        """
+        Sorguyu çalıştırır; satır döndürüyorsa satırları, döndürmüyorsa [] verir.
+        Şekil ilk görüşte prepare edilen statement'ın attribute'larından belirlenip
+        önbelleğe alınır; sonraki çağrılar tek round trip'tir (asyncpg statement cache).
+        columnar=True ise {"columns", "types", "rows": [[...], ...]} döner; satır başına dict kurulmaz.
+        max_rows verilirse en fazla o kadar satır okunur; sonucun kalanı sunucudan hiç çekilmez.
+        Sorgu çağrının kalan süresiyle sınırlıdır; süre dolarsa hedefte iptal edilir.
+        """
+        timeout = query_timeout()
+        try:
+            if max_rows is not None:
+                return await self._run_limited(conn, sql, params, columnar, timeout, max_rows)
+            return await self._run(conn, sql, params, columnar, timeout)
+        except asyncio.TimeoutError:
+            # Bağlantı hatası değil: breaker'a yazılmaz, execute_query yeniden denemez
+            raise DeadlineExceededError(
+                "Query exceeded the tool call deadline and was cancelled on the server"
+            ) from None
+
+    async def _run(self, conn: asyncpg.Connection, sql: str, params: tuple, columnar: bool, timeout: Optional[float]):
+        shape = self._shapes.get(sql)
+        if shape is None:
+            return await self._run_first(conn, sql, params, columnar, timeout)
+
+        self._shapes.move_to_end(sql)
+        if shape == SHAPE_ROWS:
+            rows = await conn.fetch(sql, *params, timeout=timeout)
+            if columnar:
+                # fetch() statement'ı cache'e koydu: kolon adları/tipleri için ek round trip yapılmaz
+                return _columnar(await _cached_statement(conn, sql), rows)
+            return [dict(r) for r in rows]
+        # INSERT/UPDATE/DELETE/DDL veya çoklu komut
+        await conn.execute(sql, *params, timeout=timeout)
+        return _columnar(None, []) if columnar else []
+
+    async def _run_first(self, conn: asyncpg.Connection, sql: str, params: tuple, columnar: bool, timeout: Optional[float]):
+        try:
+            stmt = await _cached_statement(conn, sql, timeout)
+        except asyncpg.PostgresSyntaxError as e:
+            if "multiple commands" not in str(e):
+                raise
+            self._remember_shape(sql, SHAPE_SCRIPT)
+            await conn.execute(sql, *params, timeout=timeout)
+            return _columnar(None, []) if columnar else []
+
+        self._remember_shape(sql, SHAPE_ROWS if stmt.get_attributes() else SHAPE_COMMAND)
+        # Statement cache'te: fetch() yeniden parse etmez, yalnızca Bind/Execute gönderir
+        rows = await conn.fetch(sql, *params, timeout=timeout)
+        if columnar:
+            return _columnar(stmt, rows)
+        return [dict(r) for r in rows]
+
+    async def _run_limited(self, conn: asyncpg.Connection, sql: str, params: tuple, columnar: bool,
+                           timeout: Optional[float], max_rows: int):
+        stmt = None
+        if self._shapes.get(sql) != SHAPE_SCRIPT:
+            try:
+                stmt = await _cached_statement(conn, sql, timeout)
+            except asyncpg.PostgresSyntaxError as e:
+                if "multiple commands" not in str(e):
+                    raise
+        if stmt is None or not stmt.get_attributes():
+            return await self._run(conn, sql, params, columnar, timeout)
+
+        self._remember_shape(sql, SHAPE_ROWS)
+        # Portal (cursor) transaction içinde yaşar; Execute en fazla max_rows satır ister
+        async with conn.transaction():
+            cursor = await stmt.cursor(*params, timeout=timeout)
+            rows = await cursor.fetch(max_rows, timeout=timeout)
+        if columnar:
+            return _columnar(stmt, rows)
+        return [dict(r) for r in rows]
+
+    def returns_rows(self, sql: str) -> bool:
+        return self._shapes.get(sql) == SHAPE_ROWS
+
+    def _remember_shape(self, sql: str, shape: str):
+        self._shapes[sql] = shape
+        self._shapes.move_to_end(sql)
+        while len(self._shapes) > STATEMENT_CACHE_SIZE:
+            self._shapes.popitem(last=False)
+
+    # ------------------------------------------------------------------ #
+    # Circuit breaker
+    # ------------------------------------------------------------------ #
+    def ensure_available(self):
+        """Breaker açıksa (veya yeniden bağlanma denemesi sürüyorsa) hemen hata verir."""
+        if self.breaker_state != BREAKER_CLOSED:
+            retry_in = max(0.0, self.retry_at - time.monotonic())
+            raise CircuitOpenError(
+                f"Circuit open for id={self.connection_info.get('id')} "
+                f"(last error: {self.last_error}); next reconnect attempt in {retry_in:.1f}s"
+            )
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.last_success_at = time.monotonic()
+
+    def record_failure(self, error: BaseException):
+        self.consecutive_failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if (self.breaker_state == BREAKER_CLOSED
+                and self.consecutive_failures >= get_settings().db_breaker_failure_threshold):
+            self._open_breaker()
+
+    def _open_breaker(self):
+        self.breaker_state = BREAKER_OPEN
+        self.connected = False
+        self.retry_at = time.monotonic() + self._backoff_delay()
+        logger.warning(
+            "⛔ Circuit opened for id=%s after %s failures: %s",
+            self.connection_info.get("id"), self.consecutive_failures, self.last_error,
+        )
+
+    def _close_breaker(self):
+        self.breaker_state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.reconnect_attempts = 0
+        self.last_success_at = time.monotonic()
+
+    def _backoff_delay(self) -> float:
+        settings = get_settings()
+        delay = min(
+            settings.db_reconnect_backoff_max_seconds,
+            settings.db_reconnect_backoff_base_seconds * (2 ** self.reconnect_attempts),
+        )
+        # Jitter: aynı anda düşen hedefler aynı anda yeniden bağlanmaya çalışmasın
+        return delay * random.uniform(0.5, 1.0)
+
+    def health_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker_state,
+            "consecutive_failures": self.consecutive_failures,
+            "reconnect_attempts": self.reconnect_attempts,
+            "last_error": self.last_error,
+            "last_probe_at": self.last_probe_at,
+            "retry_in_seconds": round(max(0.0, self.retry_at - time.monotonic()), 1)
+            if self.breaker_state != BREAKER_CLOSED else None,
+            "pool_open": self.pool is not None,
+            "pool_min_size": self.pool_min_size,
+            "pool_max_size": self.pool_max_size,
+            "pool_size": self.pool.get_size() if self.pool else 0,
+            "pool_idle": self.pool.get_idle_size() if self.pool else 0,
+            "peak_in_use": self.peak_in_use,
+            "idle_seconds": round(time.monotonic() - self.last_used_at, 1),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Health monitor
+    # ------------------------------------------------------------------ #
+    def _start_monitor(self):
+        if self._monitor_task is None or self._monitor_task.done():
+            self._monitor_task = asyncio.create_task(self._monitor_loop())
+
+    async def _stop_monitor(self):
+        task, self._monitor_task = self._monitor_task, None
+        if task and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _monitor_loop(self):
+        interval = get_settings().db_health_check_interval_seconds
+        while True:
+            try:
+                if self.breaker_state == BREAKER_CLOSED:
+                    await asyncio.sleep(interval)
+                    await self._probe(interval)
+                else:
+                    await asyncio.sleep(max(0.0, self.retry_at - time.monotonic()))
+                    await self._try_reconnect()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Health monitor error for id=%s: %s", self.connection_info.get("id"), e)
+
+    async def _probe(self, interval: float):
+        """Boştaki havuzu SELECT 1 ile yoklar; son aralıkta başarılı trafik varsa yoklamaz."""
+        pool = self.pool
+        if not pool or time.monotonic() - self.last_success_at < interval:
+            return
+        # Meşgul havuz sağlığını kendi çağrılarıyla raporlar
+        if pool.get_size() > 0 and pool.get_idle_size() == 0:
+            return
+
+        self.last_probe_at = time.time()
+        try:
+            async def select_one():
+                async with pool.acquire() as conn:
+                    await conn.execute("SELECT 1;")
+
+            await asyncio.wait_for(select_one(), timeout=get_settings().db_health_probe_timeout_seconds)
+            self.record_success()
+        except Exception as e:
+            logger.warning("⚠️ Health probe failed for id=%s: %s", self.connection_info.get("id"), e)
+            self.record_failure(e)
+
+    async def _try_reconnect(self):
+        """Half-open: yeni bir havuz kurmayı dener; başarısızsa backoff ikiye katlanır."""
+        self.breaker_state = BREAKER_HALF_OPEN
+        self.last_probe_at = time.time()
+        try:
+            new_pool = await asyncio.wait_for(
+                self._create_pool(), timeout=get_settings().db_connect_timeout_seconds
+            )
+        except Exception as e:
+            self.reconnect_attempts += 1
+            self.last_error = str(e) or type(e).__name__
+            self.breaker_state = BREAKER_OPEN
+            self.retry_at = time.monotonic() + self._backoff_delay()
+            logger.warning(
+                "⚠️ Reconnect attempt %s failed for id=%s: %s",
+                self.reconnect_attempts, self.connection_info.get("id"), self.last_error,
+            )
+            return
+
+        old_pool, self.pool = self.pool, new_pool
+        if old_pool:
+            old_pool.terminate()
+        self.connected = True
+        self._close_breaker()
+        logger.info("🔗 Reconnected id=%s, circuit closed", self.connection_info.get("id"))
@@ -1,9 +1,18 @@
 # postgresql_manager.py
 import asyncio
 import logging
+import os
+import time
 import asyncpg
-from typing import Any, Dict, List, Optional
-from .postgresql_connection import PostgresqlConnection
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from .postgresql_connection import PostgresqlConnection, CONNECTION_ERRORS, BREAKER_CLOSED, worker_share, check_worker_limit
+from .query_stream import query_stream_manager
+from .admission import admission_controller
+from .catalog_cache import catalog_cache
+from .request_context import remaining_seconds, request_deadline
+from config.settings import get_settings
+from db.metadata.metadata_ipc import IpcClient, IpcServer
 from db.metadata.metadata_repository_manager import repository_manager
 
 logger = logging.getLogger(__name__)
@@ -17,8 +26,14 @@ class PostgresqlManager:
         self.active_connection: int | None = None
         self._lock = asyncio.Lock()
         self._initialized = False
-
-    async def _activate_single_connection(self, row):
+        self._pool_reaper_task: Optional[asyncio.Task] = None
+        # Çok worker'lı mod: bu worker'ın stream'lerini diğer worker'lara açan socket ve
+        # başka worker'lara ait continuation'ların iletildiği istemciler (pid -> client)
+        self._stream_ipc_path: Optional[str] = None
+        self._stream_server: Optional[IpcServer] = None
+        self._stream_peers: Dict[int, IpcClient] = {}
+
+    async def _activate_single_connection(self, row, mark_active: bool = True):
         conn_id = int(row["id"] if "id" in row else row.get("connection_id", 0))
 
         full = await self.repository_manager.get_connection_with_password(conn_id)
@@ -28,10 +43,12 @@ class PostgresqlManager:
         dbc = PostgresqlConnection(dict(full))
         logger.info("Trying to activate connection id: %s", conn_id)
 
-        ok = await dbc.connect()
+        # Lazy modda havuz ilk kullanımda açılır; başlangıçta yüzlerce boş backend tutulmaz
+        ok = await dbc.connect(lazy=get_settings().db_lazy_connect)
         if ok:
             self.connections[conn_id] = dbc
-            await self.repository_manager.activate_connection(conn_id)
+            if mark_active:
+                await self.repository_manager.activate_connection(conn_id)
             logger.info("%s is activated", conn_id)
             return True
 
@@ -41,16 +58,24 @@ class PostgresqlManager:
     # ------------------------------------------------------------------ #
     # Startup
     # ------------------------------------------------------------------ #
-    async def initialize(self):
+    async def initialize(self, activate: bool = True):
+        """
+        activate=True: metadata'daki tüm bağlantılar pasife çekilir, connect_at_startup olanlar
+        bağlanıp aktif işaretlenir. Çok worker'lı modda bunu supervisor bir kez yapar;
+        worker'lar activate=False ile yalnızca aktif işaretli bağlantılar için havuz kurar.
+        """
         if self._initialized:
             return
 
         async with self._lock:
-            await self.repository_manager.deactivate_all_connections()
-            rows = await self.repository_manager.get_all_connections(connect_at_startup=True)
+            if activate:
+                await self.repository_manager.deactivate_all_connections()
+                rows = await self.repository_manager.get_all_connections(connect_at_startup=True)
+            else:
+                rows = [r for r in await self.repository_manager.get_all_connections() if r.get("is_active")]
 
             tasks = [
-                self._activate_single_connection(row)
+                self._activate_single_connection(row, mark_active=activate)
                 for row in rows
             ]
 
@@ -58,11 +83,22 @@ class PostgresqlManager:
 
             active_count = sum(1 for r in results if r is True)
             self._initialized = True
+            self._pool_reaper_task = asyncio.create_task(self._pool_reaper_loop())
 
             logger.info("✅ DB Manager initialized. Active pools: %s", active_count)
 
     async def close(self):
         """Uygulama kapanırken çağrılır."""
+        if self._pool_reaper_task:
+            self._pool_reaper_task.cancel()
+            self._pool_reaper_task = None
+        if self._stream_server is not None:
+            await self._stream_server.close()
+            self._stream_server = None
+        for peer in self._stream_peers.values():
+            await peer.close()
+        self._stream_peers.clear()
+        await query_stream_manager.close_all()
         for conn_id in list(self.connections.keys()):
             await self.disconnect(conn_id)
         self.connections.clear()
@@ -84,6 +120,7 @@ class PostgresqlManager:
 
     async def disconnect(self, connection_id: int):
         dbc = self.connections.get(connection_id)
+        catalog_cache.invalidate(connection_id)
         if dbc:
             await dbc.disconnect()
             self.connections.pop(connection_id, None)
@@ -94,11 +131,78 @@ class PostgresqlManager:
         await self.disconnect(connection_id)
         return await self.connect_by_id(connection_id)
 
+    async def validate_worker_limits(self):
+        """
+        Çok worker'lı modda limitler worker'lara bölünür; her worker'a her hedefte en az
+        bir bağlantı düşmelidir. Düşmüyorsa worker'lar başlatılmadan hata verilir.
+        """
+        settings = get_settings()
+        limits = [
+            ("DB_POOL_MAX_SIZE", settings.db_pool_max_size),
+            ("DB_ADMISSION_MAX_CONCURRENCY", settings.db_admission_max_concurrency),
+            ("QUERY_STREAM_MAX_OPEN", settings.query_stream_max_open),
+        ]
+        for row in await self.repository_manager.get_all_connections():
+            limits.append((f"pool_max_size of connection id={row['id']}", row["pool_max_size"]))
+        problems = []
+        for name, limit in limits:
+            try:
+                check_worker_limit(name, limit)
+            except ValueError as e:
+                problems.append(str(e))
+        if problems:
+            raise RuntimeError("Invalid limits for SERVER_WORKERS: " + "; ".join(problems))
+
+    async def set_pool_limits(self, connection_id: int, pool_min_size: Optional[int], pool_max_size: Optional[int]):
+        """Hedefe özel havuz limitlerini kaydeder ve yeniden başlatmadan uygular."""
+        if pool_max_size is not None and pool_max_size < 1:
+            raise ValueError("pool_max_size must be at least 1")
+        if pool_min_size is not None and pool_min_size < 0:
+            raise ValueError("pool_min_size must not be negative")
+        if pool_min_size is not None and pool_max_size is not None and pool_min_size > pool_max_size:
+            raise ValueError("pool_min_size must not exceed pool_max_size")
+        check_worker_limit("pool_max_size", pool_max_size)
+
+        row = await self.repository_manager.update_pool_limits(connection_id, pool_min_size, pool_max_size)
+        if not row:
+            return None
+        dbc = self.connections.get(connection_id)
+        if dbc:
+            await dbc.set_pool_limits(pool_min_size, pool_max_size)
+        return row
+
+    async def _pool_reaper_loop(self):
+        """Boşta kalan havuzları LRU sırasıyla kapatır."""
+        while True:
+            settings = get_settings()
+            await asyncio.sleep(max(1.0, min(settings.db_pool_idle_ttl_seconds / 4, 60.0)))
+            try:
+                await self.evict_idle_pools()
+            except Exception as e:
+                logger.exception("Pool reaper error: %s", e)
+
+    async def evict_idle_pools(self) -> int:
+        """
+        TTL'den uzun süredir kullanılmayan boş havuzları kapatır; açık havuz sayısı
+        db_max_open_pools'u aşıyorsa en uzun süredir kullanılmayan boş havuzlar da kapanır.
+        """
+        settings = get_settings()
+        now = time.monotonic()
+        open_pools = [dbc for dbc in list(self.connections.values()) if dbc.pool is not None]
+        excess = len(open_pools) - settings.db_max_open_pools
+        evicted = 0
+        for dbc in sorted(open_pools, key=lambda d: d.last_used_at):
+            expired = now - dbc.last_used_at >= settings.db_pool_idle_ttl_seconds
+            if not expired and excess - evicted <= 0:
+                break
+            if dbc.is_idle() and await dbc.evict():
+                evicted += 1
+        return evicted
+
     # ------------------------------------------------------------------ #
     # Havuz/bağlantı erişimi
     # ------------------------------------------------------------------ #
-    async def acquire(self, connection_id: int) -> asyncpg.Connection:
-        """Sağlık kontrolü + acquire. Kopmuşsa toparla."""
+    async def _get_dbc(self, connection_id: int) -> PostgresqlConnection:
         dbc = self.connections.get(connection_id)
         if not dbc:
             # Havuz kurulmamışsa kurmayı dene
@@ -106,56 +210,227 @@ class PostgresqlManager:
             if not ok:
                 raise RuntimeError(f"Cannot connect id={connection_id}")
             dbc = self.connections[connection_id]
+        return dbc
 
-        # Havuz sağlık kontrolü
-        try:
-            async with dbc.get_connection() as conn:
-                await conn.execute("SELECT 1;")
-                return conn
-        except (asyncpg.InterfaceError, asyncpg.ConnectionDoesNotExistError):
-            logger.warning("⚠️ Pool unhealthy. Reconnecting id=%s ...", connection_id)
-            ok = await self.reconnect(connection_id)
-            if not ok:
-                raise RuntimeError(f"Reconnect failed id={connection_id}")
-            # yeni havuzdan dön
-            dbc = self.connections[connection_id]
+    def _admit(self, connection_id: int, dbc: PostgresqlConnection):
+        """
+        Hedef başına admission: eşzamanlılık sınırı dolunca çağrılar pool.acquire()'da
+        sırasız yığılmak yerine öncelik kuyruğunda bekler (interaktif çağrılar arka plan
+        job'larının önüne geçer); kuyruk doluysa AdmissionRejectedError döner.
+        """
+        settings = get_settings()
+        limit = worker_share(settings.db_admission_max_concurrency) or dbc.pool_max_size
+        # Kuyrukta çağrının deadline'ından uzun beklenmez
+        queue_timeout = settings.db_admission_queue_timeout_seconds
+        remaining = remaining_seconds()
+        if remaining is not None:
+            queue_timeout = max(0.0, min(queue_timeout, remaining))
+        return admission_controller.admit(
+            connection_id,
+            limit,
+            settings.db_admission_max_queue,
+            queue_timeout,
+        )
+
+    async def gather_limited(self, connection_id: int, aws) -> List[Any]:
+        """
+        asyncio.gather gibi, ama aynı hedefe aynı anda en fazla admission sınırı kadar
+        çağrı açar; yüzlerce tablo için fan-out kuyruğu doldurup kendini reddettirmez.
+        """
+        dbc = await self._get_dbc(connection_id)
+        semaphore = asyncio.Semaphore(worker_share(get_settings().db_admission_max_concurrency) or dbc.pool_max_size)
+
+        async def run(aw):
+            async with semaphore:
+                return await aw
+
+        return await asyncio.gather(*(run(aw) for aw in aws))
+
+    @asynccontextmanager
+    async def acquire(self, connection_id: int):
+        """
+        Havuzdan bağlantı verir. Sağlık kontrolü her acquire'da değil, arka plandaki
+        health monitor tarafından yapılır; breaker açıksa CircuitOpenError hemen döner.
+        """
+        dbc = await self._get_dbc(connection_id)
+        # Breaker açıksa kuyrukta beklemeden hemen hata dönsün
+        dbc.ensure_available()
+        async with self._admit(connection_id, dbc):
             async with dbc.get_connection() as conn:
-                await conn.execute("SELECT 1;")
-                return conn
+                yield conn
 
-    async def execute_query(self, connection_id: int, sql: str, *params) -> List[Dict[str, Any]]:
-        """Tool’lar için ana giriş noktası: SELECT/DDL/DML hepsi."""
-        dbc = self.connections.get(connection_id)
-        if not dbc:
-            ok = await self.connect_by_id(connection_id)
-            if not ok:
-                raise RuntimeError(f"Cannot connect id={connection_id}")
-            dbc = self.connections[connection_id]
+    async def execute_query(self, connection_id: int, sql: str, *params, columnar: bool = False,
+                            max_rows: Optional[int] = None):
+        """
+        Tool’lar için ana giriş noktası: SELECT/DDL/DML hepsi. Varsayılan olarak satır
+        başına dict listesi, columnar=True ise {"columns", "types", "rows"} döner.
+        max_rows verilirse hedeften en fazla o kadar satır okunur.
+        """
+        dbc = await self._get_dbc(connection_id)
+        dbc.ensure_available()
+        async with self._admit(connection_id, dbc):
+            try:
+                async with dbc.get_connection() as conn:
+                    rows = await dbc.run_statement(conn, sql, *params, columnar=columnar, max_rows=max_rows)
+            except CONNECTION_ERRORS:
+                # Havuzdaki kopmuş bir bağlantı olabilir: breaker hâlâ kapalıysa aynı havuzdan
+                # (asyncpg kopan bağlantıyı yenisiyle değiştirir) bir kez daha dene
+                if dbc.breaker_state != BREAKER_CLOSED:
+                    raise
+                logger.warning("⚠️ Lost connection while running query. Retrying id=%s ...", connection_id)
+                async with dbc.get_connection() as conn:
+                    rows = await dbc.run_statement(conn, sql, *params, columnar=columnar, max_rows=max_rows)
+        if not dbc.returns_rows(sql):
+            # DDL olabilir: katalog önbelleği bir sonraki okumada parmak izini hemen kontrol etsin
+            catalog_cache.mark_stale(connection_id)
+        return rows
+
+    async def stream_query(
+            self,
+            connection_id: int,
+            sql: str,
+            *params,
+            max_rows: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            continuation_token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Sonucu server-side cursor ile sayfa sayfa döndürür; bellek kullanımı sonuç
+        boyutundan bağımsızdır. continuation_token verilirse açık cursor'dan devam eder.
+        """
+        owner_pid = query_stream_manager.token_owner(continuation_token) if continuation_token else None
+        if owner_pid is not None and self._stream_ipc_path:
+            # Cursor başka bir worker'da açık: çağrı oraya iletilir, admission orada uygulanır
+            return await self._forward_stream_call(
+                owner_pid, "stream_query", connection_id, sql,
+                max_rows=max_rows, max_bytes=max_bytes, continuation_token=continuation_token,
+            )
+        dbc = await self._get_dbc(connection_id)
+        async with self._admit(connection_id, dbc):
+            if continuation_token:
+                return await query_stream_manager.fetch(connection_id, continuation_token, max_rows, max_bytes)
+            dbc.ensure_available()
+            return await query_stream_manager.open(
+                connection_id, dbc, sql, *params, max_rows=max_rows, max_bytes=max_bytes
+            )
 
+    async def resolve_targets(
+            self,
+            connection_ids: Optional[List[int]] = None,
+            tag: Optional[str] = None,
+    ) -> List[int]:
+        """Açık id listesi, etiket veya (ikisi de yoksa) aktif tüm bağlantılar."""
+        if connection_ids:
+            return list(dict.fromkeys(int(cid) for cid in connection_ids))
+        if tag:
+            return await self.repository_manager.get_connection_ids_by_tag(tag)
+        return [cid for cid, dbc in list(self.connections.items()) if dbc.connected]
+
+    async def fan_out_query(
+            self,
+            targets: List[int],
+            sql: str,
+            *params,
+            max_concurrency: Optional[int] = None,
+            timeout_seconds: Optional[float] = None,
+            max_rows_per_target: Optional[int] = None,
+            on_target_done: Optional[Callable[[int, int, Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Aynı sorguyu birden fazla hedefte eşzamanlı çalıştırır. Aynı anda en fazla
+        max_concurrency hedef çalışır, her hedef timeout_seconds ile sınırlıdır (süre
+        dolunca sorgu hedefte iptal edilir). Satırlar connection_id ile etiketlenip
+        birleştirilir; başarısız hedefler tüm çağrıyı düşürmez, raporlanır.
+        on_target_done her hedef bittiğinde (bitiş sırasıyla) çağrılır.
+        """
+        settings = get_settings()
+        max_concurrency = max(1, max_concurrency or settings.fanout_max_concurrency)
+        timeout_seconds = timeout_seconds or settings.fanout_target_timeout_seconds
+        max_rows = max(1, max_rows_per_target or settings.fanout_max_rows_per_target)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        started = time.monotonic()
+
+        async def run_one(connection_id: int) -> Dict[str, Any]:
+            async with semaphore:
+                target_started = time.monotonic()
+                # Hedefin deadline'ı çağrının kalan süresini aşmaz; sorgu timeout'u buna göre iner
+                deadline = time.monotonic() + timeout_seconds
+                outer = request_deadline.get()
+                request_deadline.set(deadline if outer is None else min(deadline, outer))
+                try:
+                    async with asyncio.timeout(timeout_seconds):
+                        # Bir fazla satır okunur: yalnızca kesilip kesilmediğini anlamak için
+                        rows = await self.execute_query(connection_id, sql, *params, max_rows=max_rows + 1)
+                except Exception as e:
+                    error = "timeout" if isinstance(e, TimeoutError) else str(e) or type(e).__name__
+                    logger.warning("Fan-out query failed for id=%s: %s", connection_id, error)
+                    return {"connection_id": connection_id, "ok": False, "error": error,
+                            "elapsed_seconds": round(time.monotonic() - target_started, 3)}
+                return {
+                    "connection_id": connection_id,
+                    "ok": True,
+                    "rows": rows[:max_rows],
+                    "row_count": min(len(rows), max_rows),
+                    "truncated": len(rows) > max_rows,
+                    "elapsed_seconds": round(time.monotonic() - target_started, 3),
+                }
+
+        merged: List[Dict[str, Any]] = []
+        targets_out: List[Dict[str, Any]] = []
+        failed: List[Dict[str, Any]] = []
+        for done, future in enumerate(asyncio.as_completed([run_one(cid) for cid in targets]), start=1):
+            result = await future
+            if result["ok"]:
+                merged.extend({"connection_id": result["connection_id"], **row} for row in result.pop("rows"))
+                targets_out.append(result)
+            else:
+                failed.append(result)
+            if on_target_done:
+                await on_target_done(done, len(targets), result)
+
+        return {
+            "targets": len(targets),
+            "succeeded": len(targets_out),
+            "failed": failed,
+            "per_target": sorted(targets_out, key=lambda r: r["connection_id"]),
+            "rows": merged,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+        }
+
+    async def close_stream(self, continuation_token: str) -> bool:
+        owner_pid = query_stream_manager.token_owner(continuation_token)
+        if owner_pid is not None and self._stream_ipc_path:
+            return await self._forward_stream_call(owner_pid, "close_stream", continuation_token)
+        return await query_stream_manager.close(continuation_token)
+
+    @staticmethod
+    def _stream_peer_path(ipc_path: str, pid: int) -> str:
+        return f"{ipc_path}.{pid:x}"
+
+    async def serve_stream_peers(self, ipc_path: str):
+        """
+        Çok worker'lı mod: server-side cursor onu açan worker'da yaşar ve token o worker'ın
+        pid'ini taşır. Her worker kendi stream'lerini metadata socket'inin yanındaki bir
+        socket'ten açar; başka worker'a düşen continuation çağrıları oraya iletilir.
+        """
+        self._stream_ipc_path = ipc_path
+        # Sayfa satırları zaten JSON'a (str) çevrilecek; kodlanamayan PostgreSQL tipleri str gider
+        self._stream_server = IpcServer(self, {"stream_query", "close_stream"}, fallback=str)
+        await self._stream_server.start(self._stream_peer_path(ipc_path, os.getpid()))
+
+    async def _forward_stream_call(self, pid: int, method: str, *args, **kwargs):
+        peer = self._stream_peers.get(pid)
+        if peer is None:
+            peer = IpcClient(self._stream_peer_path(self._stream_ipc_path, pid), reconnect_timeout=1.0)
+            self._stream_peers[pid] = peer
         try:
-            async with dbc.get_connection() as conn:
-                verb = sql.lstrip().split()[0].upper()
-                if verb == "SELECT":
-                    rows = await conn.fetch(sql, *params)
-                    return [dict(r) for r in rows]
-                else:
-                    # INSERT/UPDATE/DELETE/DDL
-                    await conn.execute(sql, *params)
-                    return []
-        except (asyncpg.InterfaceError, asyncpg.ConnectionDoesNotExistError):
-            # bir kez toparlanmayı deneyelim
-            logger.warning("⚠️ Lost connection while running query. Reconnecting id=%s ...", connection_id)
-            ok = await self.reconnect(connection_id)
-            if not ok:
-                raise
-            async with self.connections[connection_id].get_connection() as conn:
-                verb = sql.lstrip().split()[0].upper()
-                if verb == "SELECT":
-                    rows = await conn.fetch(sql, *params)
-                    return [dict(r) for r in rows]
-                else:
-                    await conn.execute(sql, *params)
-                    return []
+            return await peer.call(method, *args, **kwargs)
+        except ConnectionError:
+            self._stream_peers.pop(pid, None)
+            await peer.close()
+            raise ValueError(
+                "Continuation token belongs to a server worker that is no longer running; reopen the stream"
+            ) from None
 
     async def has_pgstattuple(self, connection_id: int) -> bool:
         sql = """
@@ -227,7 +502,7 @@ class PostgresqlManager:
             }
 
         else:
-            dead_pct, last_vacuum, last_autovacuum = await check_bloat_fallback(
+            dead_pct, last_vacuum, last_autovacuum = await self.check_bloat_fallback(
                 connection_id, schema, table
             )
 
@@ -241,7 +516,14 @@ class PostgresqlManager:
             }
 
     # --- READ COLUMNS ---
+    def _catalog_fetch(self, connection_id: int):
+        async def fetch(sql: str, *params):
+            return await self.execute_query(connection_id, sql, *params)
+        return fetch
+
     async def find_columns_by_table_name(self, connection_id: int, schema_name: str, table_name: str):
+        if get_settings().catalog_cache_enabled:
+            return await catalog_cache.columns(connection_id, self._catalog_fetch(connection_id), schema_name, table_name)
         sql = """
             SELECT * FROM information_schema.columns
             WHERE table_schema= $1 and table_name = $2
@@ -249,7 +531,31 @@ class PostgresqlManager:
         """
         return await self.execute_query(connection_id, sql,schema_name, table_name)
 
+    async def find_indexes_by_table_name(self, connection_id: int, schema_name: str, table_name: str):
+        if get_settings().catalog_cache_enabled:
+            return await catalog_cache.indexes(connection_id, self._catalog_fetch(connection_id), schema_name, table_name)
+        # information_schema.tables ile aynı görünürlük: rolün erişemediği tablonun indexleri listelenmez
+        sql = """
+            SELECT ic.relname AS index_name,
+                   i.indisprimary AS is_primary,
+                   i.indisunique AS is_unique,
+                   i.indisvalid AS is_valid,
+                   pg_get_indexdef(i.indexrelid) AS definition
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = $1 AND c.relname = $2
+              AND (pg_has_role(c.relowner, 'USAGE')
+                   OR has_table_privilege(c.oid, 'SELECT, INSERT, UPDATE, DELETE, TRUNCATE, REFERENCES, TRIGGER')
+                   OR has_any_column_privilege(c.oid, 'SELECT, INSERT, UPDATE, REFERENCES'))
+            ORDER BY ic.relname
+        """
+        return await self.execute_query(connection_id, sql, schema_name, table_name)
+
     async def find_tables_by_schema_name(self, connection_id: int, schema_name: str):
+        if get_settings().catalog_cache_enabled:
+            return await catalog_cache.tables(connection_id, self._catalog_fetch(connection_id), schema_name)
         sql = """
             SELECT * FROM information_schema.tables
             WHERE table_schema = $1
@@ -258,11 +564,13 @@ class PostgresqlManager:
         return await self.execute_query(connection_id, sql, schema_name)
 
     async def find_all_tables(self, connection_id: int):
+        if get_settings().catalog_cache_enabled:
+            return await catalog_cache.tables(connection_id, self._catalog_fetch(connection_id))
         sql = "SELECT * FROM information_schema.tables ORDER BY table_schema, table_name"
         return await self.execute_query(connection_id, sql)
 
-    async def execute_custom_query(self, connection_id: int, sql: str):
-        return await self.execute_query(connection_id, sql)
+    async def execute_custom_query(self, connection_id: int, sql: str, columnar: bool = False):
+        return await self.execute_query(connection_id, sql, columnar=columnar)
 
     async def execute_custom_update(self, connection_id: int, sql: str):
         await self.execute_query(connection_id, sql)
@@ -286,6 +594,14 @@ class PostgresqlManager:
             return [(schema_name, table_name)]
 
         # ✅ 2) Schema veya tüm DB
+        if get_settings().catalog_cache_enabled:
+            rows = await catalog_cache.tables(connection_id, self._catalog_fetch(connection_id), schema_name)
+            return [
+                (r["table_schema"], r["table_name"]) for r in rows
+                if r["table_type"] == "BASE TABLE"
+                and (schema_name or r["table_schema"] not in ("pg_catalog", "information_schema"))
+            ]
+
         if schema_name:
             sql = """
                   SELECT table_schema, table_name
@@ -363,6 +679,9 @@ class PostgresqlManager:
                 "username": info["username"],
                 "connected": dbc.connected,
                 "active": (cid == self.active_connection),
+                "breaker": dbc.health_status(),
+                "admission": admission_controller.stats(cid),
+                "catalog_cache": catalog_cache.stats(cid),
             })
         return out
 
@@ -0,0 +1,266 @@
+# query_stream.py
+import asyncio
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import asyncpg
+
+from config.settings import get_settings
+from .postgresql_connection import PostgresqlConnection, apply_statement_timeout, check_deadline, worker_share
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _OpenCursor:
+    """Sayfalar arasında açık tutulan server-side cursor (bağlantı + read-only transaction)."""
+    token: str
+    connection_id: int
+    dbc: PostgresqlConnection
+    pool: asyncpg.Pool
+    conn: asyncpg.Connection
+    transaction: Any
+    cursor: Any
+    columns: List[str]
+    expires_at: float
+    rows_sent: int = 0
+    # Byte bütçesini aşan satırlar bir sonraki sayfada ilk sırada döner
+    pending: Deque[Dict[str, Any]] = field(default_factory=deque)
+    exhausted: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+def _row_size(row: Dict[str, Any]) -> int:
+    """JSON çıktısındaki yaklaşık boyut; tam serileştirme yapmadan ölçer."""
+    return sum(len(k) + len(str(v)) + 6 for k, v in row.items()) + 2
+
+
+class QueryStreamManager:
+    """
+    Büyük sonuçları asyncpg server-side cursor ile sayfa sayfa döndürür. Her sayfa
+    satır sayısı ve byte bütçesiyle sınırlıdır; sonuç bitmediyse cursor açık kalır ve
+    bir continuation token ile devam edilir. Kullanılmayan cursor'lar TTL sonunda kapanır.
+    """
+
+    def __init__(self):
+        self._cursors: Dict[str, _OpenCursor] = {}
+        # connection_id -> bağlantısını henüz almamış açılış sayısı (yarışan open'lar sınırı aşmasın)
+        self._opening: Dict[int, int] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+
+    def open_count(self, connection_id: int) -> int:
+        open_streams = sum(1 for c in self._cursors.values() if c.connection_id == connection_id)
+        return open_streams + self._opening.get(connection_id, 0)
+
+    @staticmethod
+    def token_owner(token: str) -> Optional[int]:
+        """Token başka bir worker sürecinde açılmış bir cursor'a aitse o sürecin pid'i."""
+        owner, sep, _ = token.partition(".")
+        try:
+            pid = int(owner, 16) if sep else None
+        except ValueError:
+            return None
+        return None if pid == os.getpid() else pid
+
+    @staticmethod
+    def target_limit(dbc: PostgresqlConnection) -> int:
+        """
+        Açık bir stream havuzdan bir bağlantıyı TTL dolana kadar admission dışında tutar.
+        Hedefte diğer tool çağrılarına en az bir bağlantı kalsın diye sınır pool_max_size - 1'dir;
+        bu worker'ın havuzunda tek bağlantı varsa stream açılmaz.
+        """
+        return dbc.pool_max_size - 1
+
+    async def open(
+            self,
+            connection_id: int,
+            dbc: PostgresqlConnection,
+            sql: str,
+            *params,
+            max_rows: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        if len(self._cursors) >= worker_share(get_settings().query_stream_max_open):
+            raise RuntimeError(
+                f"Too many open query streams ({len(self._cursors)}); finish or close one first"
+            )
+
+        limit = self.target_limit(dbc)
+        if limit < 1:
+            raise RuntimeError(
+                f"Query streams on id={connection_id} need at least 2 pooled connections per worker "
+                f"(this worker has {dbc.pool_max_size}); raise its pool_max_size or run the query without streaming"
+            )
+        if self.open_count(connection_id) >= limit:
+            raise RuntimeError(
+                f"Too many open query streams on id={connection_id} ({limit} of its "
+                f"{dbc.pool_max_size} pooled connections); finish or close one first"
+            )
+
+        check_deadline()
+        # Bağlantı alınıp cursor kaydedilene kadar açılış da sınırdan sayılır
+        self._opening[connection_id] = self._opening.get(connection_id, 0) + 1
+        try:
+            state = await self._open_cursor(connection_id, dbc, sql, *params)
+        finally:
+            self._opening[connection_id] -= 1
+            if not self._opening[connection_id]:
+                del self._opening[connection_id]
+        self._start_reaper()
+        return await self._next_page(state, max_rows, max_bytes)
+
+    async def _open_cursor(self, connection_id: int, dbc: PostgresqlConnection, sql: str, *params) -> _OpenCursor:
+        pool = await dbc.ensure_pool()
+        conn = await pool.acquire()
+        transaction = None
+        try:
+            # Cursor'lar transaction içinde yaşar; read-only tutarlı bir snapshot okur
+            transaction = conn.transaction(isolation="repeatable_read", readonly=True)
+            await transaction.start()
+            await apply_statement_timeout(conn, local=True)
+            stmt = await conn.prepare(sql)
+            cursor = await stmt.cursor(*params)
+        except asyncio.CancelledError:
+            await self._discard(dbc, pool, conn, transaction, terminate=True)
+            raise
+        except BaseException:
+            await self._discard(dbc, pool, conn, transaction, terminate=False)
+            raise
+
+        state = _OpenCursor(
+            # Cursor bu süreçte yaşar; çok worker'lı modda token hangi worker'a ait olduğunu taşır
+            token=f"{os.getpid():x}.{secrets.token_urlsafe(16)}",
+            connection_id=connection_id,
+            dbc=dbc,
+            pool=pool,
+            conn=conn,
+            transaction=transaction,
+            cursor=cursor,
+            columns=[a.name for a in stmt.get_attributes()],
+            expires_at=time.monotonic() + get_settings().query_stream_ttl_seconds,
+        )
+        self._cursors[state.token] = state
+        return state
+
+    async def fetch(
+            self,
+            connection_id: int,
+            token: str,
+            max_rows: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        state = self._cursors.get(token)
+        if not state or state.connection_id != connection_id:
+            if self.token_owner(token) is not None:
+                raise ValueError("Continuation token belongs to another server worker")
+            raise ValueError("Unknown or expired continuation token")
+        return await self._next_page(state, max_rows, max_bytes)
+
+    async def close(self, token: str) -> bool:
+        state = self._cursors.pop(token, None)
+        if not state:
+            return False
+        async with state.lock:
+            await self._discard(state.dbc, state.pool, state.conn, state.transaction, terminate=False)
+        return True
+
+    async def close_all(self):
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        for token in list(self._cursors):
+            await self.close(token)
+
+    async def _next_page(self, state: _OpenCursor, max_rows: Optional[int], max_bytes: Optional[int]) -> Dict[str, Any]:
+        settings = get_settings()
+        max_rows = max(1, min(max_rows or settings.query_stream_max_rows, settings.query_stream_max_rows))
+        max_bytes = max(1, min(max_bytes or settings.query_stream_max_bytes, settings.query_stream_max_bytes))
+
+        async with state.lock:
+            if state.token not in self._cursors:
+                raise ValueError("Unknown or expired continuation token")
+
+            rows: List[Dict[str, Any]] = []
+            size = 0
+            truncated_by = None
+            try:
+                # Her sayfa, onu isteyen tool çağrısının kalan süresiyle sınırlıdır
+                await apply_statement_timeout(state.conn, local=True)
+                while True:
+                    if not state.pending and not state.exhausted:
+                        chunk = await state.cursor.fetch(min(settings.query_stream_fetch_size, max_rows - len(rows)))
+                        if not chunk:
+                            state.exhausted = True
+                        state.pending.extend(dict(r) for r in chunk)
+                    if not state.pending:
+                        break
+                    row_size = _row_size(state.pending[0])
+                    # Tek bir satır bütçeden büyük olsa bile ilerleyebilmek için ilk satır her zaman döner
+                    if rows and size + row_size > max_bytes:
+                        truncated_by = "bytes"
+                        break
+                    rows.append(state.pending.popleft())
+                    size += row_size
+                    if len(rows) >= max_rows:
+                        truncated_by = "rows"
+                        break
+            except BaseException:
+                # Hata veya iptal (CancelledError): protokol durumu belirsiz, bağlantı kapatılır
+                self._cursors.pop(state.token, None)
+                await self._discard(state.dbc, state.pool, state.conn, state.transaction, terminate=True)
+                raise
+
+            state.rows_sent += len(rows)
+            done = state.exhausted and not state.pending
+            if done:
+                self._cursors.pop(state.token, None)
+                await self._discard(state.dbc, state.pool, state.conn, state.transaction, terminate=False)
+            else:
+                state.expires_at = time.monotonic() + settings.query_stream_ttl_seconds
+            state.dbc.record_success()
+
+            return {
+                "columns": state.columns,
+                "rows": rows,
+                "row_count": len(rows),
+                "rows_sent_total": state.rows_sent,
+                "approx_bytes": size,
+                "truncated_by": None if done else truncated_by,
+                "done": done,
+                "continuation_token": None if done else state.token,
+            }
+
+    @staticmethod
+    async def _discard(dbc: PostgresqlConnection, pool: asyncpg.Pool, conn: asyncpg.Connection, transaction, terminate: bool):
+        try:
+            if terminate:
+                # Çalışan FETCH backend'de iptal edilir, bağlantı beklemeden bırakılır
+                dbc.abandon(conn)
+            elif transaction is not None and not conn.is_closed():
+                await transaction.rollback()
+        except Exception as e:
+            logger.warning("Query stream cleanup failed: %s", e)
+            conn.terminate()
+        finally:
+            await pool.release(conn)
+
+    def _start_reaper(self):
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(self._reaper_loop())
+
+    async def _reaper_loop(self):
+        while self._cursors:
+            await asyncio.sleep(max(1.0, get_settings().query_stream_ttl_seconds / 4))
+            now = time.monotonic()
+            for token, state in list(self._cursors.items()):
+                if state.expires_at <= now and not state.lock.locked():
+                    logger.info("Closing idle query stream for id=%s after TTL", state.connection_id)
+                    await self.close(token)
+
+
+query_stream_manager = QueryStreamManager()  # Singleton
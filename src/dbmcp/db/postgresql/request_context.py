@@ -0,0 +1,49 @@
+# request_context.py
+"""
+Tool çağrısı boyunca taşınan istek bilgileri. Middleware değerleri set eder,
+PostgresqlManager okur; asyncio task'ları context'i kopyaladığı için gather ile
+açılan alt çağrılar da aynı değerleri görür.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+PRIORITY_CLASSES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "background": PRIORITY_BACKGROUND,
+}
+
+# Zamanlanmış job'lar bu header ile çağrı yapar
+PRIORITY_HEADER = "x-request-priority"
+# İstemci varsayılan tool süresinden daha kısa bir süre (saniye) isteyebilir
+TIMEOUT_HEADER = "x-request-timeout"
+
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+# time.monotonic() cinsinden; None ise çağrının süresi sınırsızdır
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(RuntimeError):
+    """Tool çağrısının süresi doldu; sorgu hedefte iptal edildi veya hiç başlatılmadı."""
+
+
+def priority_from_name(name: str | None) -> int:
+    """Bilinmeyen veya boş sınıf adı interaktif sayılır."""
+    return PRIORITY_CLASSES.get((name or "").strip().lower(), PRIORITY_INTERACTIVE)
+
+
+def timeout_from_header(value: str | None, default: float) -> float:
+    """Header yalnızca varsayılan süreyi kısaltabilir; geçersiz değerler yok sayılır."""
+    try:
+        requested = float(value) if value else default
+    except ValueError:
+        return default
+    return min(default, requested) if requested > 0 else default
+
+
+def remaining_seconds() -> Optional[float]:
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
@@ -1,4 +1,7 @@
 import asyncio
+import multiprocessing
+import signal
+import time
 
 from fastmcp.client import StreamableHttpTransport
 from fastmcp.tools.tool import ToolResult
@@ -8,16 +11,23 @@ from config.settings import get_settings
 from fastmcp import FastMCP, Client
 
 from db.metadata.metadata_connection import metadata_connection #Singleton
+from db.metadata.metadata_ipc import MetadataOwner
 from db.metadata.metadata_repository_manager import repository_manager #Singleton
 from db.metadata.metadata_scheduler_manager import scheduler_manager #Singleton
 from db.postgresql.postgresql_manager import postgresql_manager #Singleton
+from db.postgresql.postgresql_connection import set_worker_index
 from db.metadata.metadata_trend_manager import trend_manager #Singleton
+from db.postgresql.request_context import (
+    PRIORITY_HEADER, TIMEOUT_HEADER, DeadlineExceededError,
+    request_priority, request_deadline, priority_from_name, timeout_from_header,
+)
 
 #from tools.math_tools import register_math_tools
 from tools.repository_tools import register_metadata_tools
 from tools.postgresql_tools import register_postgresql_tools
 from tools.postgresql_observability_tools import register_postgresql_observability_tools
 from tools.postgresql_trend_tools import register_postgresql_trend_tools
+from tools.postgresql_metrics_tools import register_postgresql_metrics_tools
 from routes.metadata_connection_routes import register_connection_routes
 from routes.job_routes import register_job_routes
 from routes.introspection_routes import register_introspection_routes
@@ -33,11 +43,14 @@ import uvicorn
 
 import logging
 from fastmcp.server.middleware import Middleware, MiddlewareContext, CallNext
+from fastmcp.server.dependencies import get_http_headers
 
 BASE_URL = "http://127.0.0.1:8000"
 API_PREFIX = "/metadata"
 MCP_URL = "http://localhost:8000/mcp"
 MCP_TOKEN = "serdar"
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8000
 
 logger = logging.getLogger(__name__)
 
@@ -52,8 +65,32 @@ class CustomMiddleware(Middleware):
         context: MiddlewareContext[mt.CallToolRequestParams],
         call_next: CallNext[mt.CallToolRequestParams, ToolResult],
     ) -> ToolResult:
-        print(context.fastmcp_context.session_id)
-        return await call_next(context)
+        fastmcp_context = context.fastmcp_context
+        # MCP request context'i olmadan gelen çağrılarda oturum kimliği yoktur
+        logger.debug(
+            "Tool call %s (session=%s)", context.message.name,
+            fastmcp_context.session_id if fastmcp_context and fastmcp_context.request_context else "in-process",
+        )
+        headers = get_http_headers()
+        # Scheduler job'ları "background" önceliğiyle gelir; header yoksa çağrı interaktiftir
+        priority = priority_from_name(headers.get(PRIORITY_HEADER))
+        # Her çağrının bir deadline'ı var; sorgulara asyncpg timeout'u olarak iner ve
+        # süre dolunca (veya istemci iptal edince) çalışan sorgu hedefte iptal edilir
+        timeout = timeout_from_header(headers.get(TIMEOUT_HEADER), get_settings().tool_call_timeout_seconds)
+        priority_token = request_priority.set(priority)
+        deadline_token = request_deadline.set(time.monotonic() + timeout)
+        try:
+            async with asyncio.timeout(timeout) as scope:
+                return await call_next(context)
+        except TimeoutError:
+            if not scope.expired():
+                raise
+            raise DeadlineExceededError(
+                f"Tool '{context.message.name}' exceeded its {timeout:g}s deadline; the query was cancelled"
+            ) from None
+        finally:
+            request_deadline.reset(deadline_token)
+            request_priority.reset(priority_token)
 
 
 class MCPServer:
@@ -71,23 +108,33 @@ class MCPServer:
     async def initialize_managers(self, mcpserver: FastMCP, mcpclient: Client):
         await metadata_connection.initialize()
         await repository_manager.initialize()
+        # Worker süreçleri: bağlantı aktivasyonunu supervisor bir kez yaptı, burada yalnızca havuzlar kurulur
+        worker = metadata_connection.is_owner_client
         await asyncio.gather(
-            scheduler_manager.initialize(mcpserver, mcpclient),
-            postgresql_manager.initialize(),
+            scheduler_manager.initialize(mcpserver, mcpclient, self.get_dispatch_headers()),
+            postgresql_manager.initialize(activate=not worker),
             trend_manager.initialize()
         )
+        if worker:
+            await postgresql_manager.serve_stream_peers(metadata_connection.owner_path)
 
-    def close_managers(self):
-        trend_manager.close()
-        postgresql_manager.close()
-        repository_manager.close()
-        metadata_connection.close()
+    async def close_managers(self):
+        await trend_manager.close()
+        await postgresql_manager.close()
+        await repository_manager.close()
+        await metadata_connection.close()
 
     # --- MCP Client Helpers ---
+    def get_dispatch_headers(self):
+        # Scheduler job'larının kimliği: HTTP client'ta da in-process dispatch'te de aynı
+        # header'lar kullanılır, Eunomia politikaları ikisinde de aynı principal'ı görür.
+        # Admission kuyruğunda interaktif çağrıların arkasında beklerler.
+        return {"Authorization": f"Bearer {MCP_TOKEN}", PRIORITY_HEADER: "background", "user-agent": "dbmcp-scheduler"}
+
     def get_mcp_transport(self):
         return StreamableHttpTransport(
             url=MCP_URL,
-            headers={"Authorization": f"Bearer {MCP_TOKEN}"}
+            headers=self.get_dispatch_headers()
         )
 
     async def initialize_server(self):
@@ -96,17 +143,20 @@ class MCPServer:
                                  instructions="""
                                 -   This server provides data analysis on Postgresql databases
                                 """,
-                                 stateless_http=False,  # This is preferred mode for state management. Changing to true also raises ClosedResourceError warnings.
-                                                        # Needs to be checked in future versions of FastMCP Server
+                                 stateless_http=settings.server_workers > 1,  # Stateful is preferred for state management. Changing to true also raises ClosedResourceError warnings.
+                                                        # Needs to be checked in future versions of FastMCP Server.
+                                                        # With several workers sharing one socket, a session's requests can land on any
+                                                        # worker, so sessions are not kept in memory there.
                                  json_response=True)
         transport = self.get_mcp_transport()
-        mcpclient = Client(transport=transport) # Not possible to make in-memory connection because of header authorization
+        mcpclient = Client(transport=transport) # Used only when scheduler_dispatch = "http"; jobs are dispatched in-process by default
 
         # Tool ve route kayıtları
         register_metadata_tools(mcpserver)
         register_postgresql_tools(mcpserver)
         register_postgresql_observability_tools(mcpserver)
         register_postgresql_trend_tools(mcpserver)
+        register_postgresql_metrics_tools(mcpserver)
         # register_session_routes(self.mcpserver, self.client_manager)
         register_job_routes(mcpserver, scheduler_manager)
         register_connection_routes(mcpserver)
@@ -136,7 +186,7 @@ class MCPServer:
             allow_methods=["*"],
             allow_headers=["*"],
         )
-        config = uvicorn.Config(mcp_app, host="0.0.0.0", port=8000, log_level=logging.DEBUG)
+        config = uvicorn.Config(mcp_app, host=SERVER_HOST, port=SERVER_PORT, log_level=logging.DEBUG)
         self.server = uvicorn.Server(config)
 
         await self.initialize_managers(mcpserver, mcpclient)
@@ -144,19 +194,101 @@ class MCPServer:
     async def start(self):
         """Start the MCP server."""
         logger.info("Starting MCP Database Server...")
+        if get_settings().server_workers > 1:
+            await self.supervise()
+            return
+        await self.serve()
+
+    async def serve(self, sockets=None):
         await self.initialize_server()
         await scheduler_manager.start()
-        await self.server.serve()
+        try:
+            await self.server.serve(sockets=sockets)
+        finally:
+            await self.close_managers()
+
+    async def supervise(self):
+        """
+        Çok worker'lı mod: bu süreç DuckDB metadata dosyasının tek sahibidir ve worker'ların
+        metadata çağrılarını Unix socket üzerinden karşılar. HTTP socket'i burada açılır ve
+        worker'lar arasında paylaşılır; çekirdek başına bir uvicorn worker'ı istekleri işler.
+        Scheduler, kilidi alan tek worker'da çalışır. Ölen worker yeniden başlatılır.
+        Bağlantı aktivasyonu (deactivate_all + connect_at_startup) worker'lar açılmadan
+        burada bir kez yapılır.
+        """
+        settings = get_settings()
+        workers = settings.server_workers
+
+        await metadata_connection.initialize()
+        try:
+            await postgresql_manager.validate_worker_limits()
+        except RuntimeError:
+            await metadata_connection.close()
+            raise
+        owner = MetadataOwner(metadata_connection)
+        ipc_path = await owner.start(settings.metadata_ipc_path)
+        # Havuzlar yalnızca hedefler doğrulanırken açılır; sorguları worker'lar kendi havuzlarıyla çalıştırır
+        await postgresql_manager.initialize()
+        await postgresql_manager.close()
+        sock = uvicorn.Config(None, host=SERVER_HOST, port=SERVER_PORT).bind_socket()
+
+        context = multiprocessing.get_context("spawn")
+        processes = {}
+
+        def spawn(index: int):
+            process = context.Process(target=run_worker, args=(index, [sock], ipc_path), name=f"dbmcp-worker-{index}")
+            process.start()
+            processes[index] = process
+            logger.info(f"Started worker {index} (pid {process.pid})")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        logger.info(f"Starting {workers} workers on {SERVER_HOST}:{SERVER_PORT}")
+        try:
+            for index in range(workers):
+                spawn(index)
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=1.0)
+                except TimeoutError:
+                    pass
+                for index, process in list(processes.items()):
+                    if not process.is_alive() and not stop.is_set():
+                        logger.warning(f"Worker {index} (pid {process.pid}) exited with {process.exitcode}; restarting")
+                        spawn(index)
+        finally:
+            logger.info("Stopping workers...")
+            for process in processes.values():
+                if process.is_alive():
+                    process.terminate()
+            for process in processes.values():
+                await asyncio.to_thread(process.join, settings.server_worker_shutdown_seconds)
+                if process.is_alive():
+                    process.kill()
+            sock.close()
+            await owner.close()
+            await metadata_connection.close()
 
     async def stop(self):
         """Stop the MCP server."""
         logger.info("Stopping MCP Database Server...")
-        self.close_managers()
-        scheduler_manager.stop()
+        await scheduler_manager.shutdown()
+        await self.close_managers()
         await self.server.shutdown()
 
 mcp_handler = MCPServer() #Singleton
 
+
+def run_worker(index: int, sockets, ipc_path: str):
+    """Worker süreci giriş noktası (spawn): metadata çağrıları owner sürecine gider."""
+    logger.info(f"Worker {index} starting (pid {multiprocessing.current_process().pid})")
+    metadata_connection.use_owner(ipc_path)
+    set_worker_index(index)
+    asyncio.run(mcp_handler.serve(sockets=sockets))
+
 # Principal Extraction
 # The middleware automatically extracts principals from these headers:
 #
@@ -4,6 +4,7 @@ from starlette.responses import JSONResponse
 from fastmcp import FastMCP
 
 from db.metadata.metadata_scheduler_manager import SchedulerManager
+from utils.generic import rows_response
 
 def serialize_job(job):
     """Helper to serialize datetime objects in job dicts."""
@@ -20,7 +21,26 @@ def register_job_routes(mcpserver: FastMCP, scheduler_manager):
         jobs = await scheduler_manager.get_all_jobs()
         # Serialize jobs to handle datetime objects
         serialized_jobs = [serialize_job(job) for job in jobs]
-        return JSONResponse(content=serialized_jobs)
+        return rows_response(request, serialized_jobs)
+
+    # Bu süreç scheduler lideri mi, kilidi kim tutuyor
+    @mcpserver.custom_route("/job/scheduler", methods=["GET"])
+    async def scheduler_status(request: Request):
+        return JSONResponse(content=scheduler_manager.role())
+
+    # --- Çalışma geçmişi: job başına p50/p95 süreler, hata/atlanan sayıları ---
+    @mcpserver.custom_route("/job/stats", methods=["GET"])
+    async def job_run_stats(request: Request):
+        hours = max(1, min(int(request.query_params.get("hours", 24)), 24 * 90))
+        rows = await scheduler_manager.get_job_run_stats(hours)
+        return rows_response(request, [serialize_job(dict(r)) for r in rows])
+
+    @mcpserver.custom_route("/job/{job_id:int}/runs", methods=["GET"])
+    async def list_job_runs(request: Request):
+        job_id = int(request.path_params["job_id"])
+        limit = max(1, min(int(request.query_params.get("limit", 50)), 1000))
+        rows = await scheduler_manager.get_job_runs(job_id, limit)
+        return rows_response(request, [serialize_job(dict(r)) for r in rows])
 
     @mcpserver.custom_route("/job/{job_id:int}", methods=["GET"])
     async def get_job(request: Request):
@@ -59,4 +79,16 @@ def register_job_routes(mcpserver: FastMCP, scheduler_manager):
     async def delete_job(request: Request):
         job_id = int(request.path_params["job_id"])
         await scheduler_manager.delete_job(job_id)
+        return JSONResponse(content={"job_id": job_id, "deleted": True})
+
+    # Tabloya route dışından yapılan değişiklikleri beklemeden uygular
+    @mcpserver.custom_route("/job/reconcile", methods=["POST"])
+    async def reconcile_jobs(request: Request):
+        if not scheduler_manager.is_leader:
+            # Scheduler bu süreçte çalışmıyor: karşılaştırmayı lider yapar
+            if not scheduler_manager.notify_leader():
+                return JSONResponse(content={"error": "Scheduler is not running"}, status_code=503)
+            return JSONResponse(content={"notified_leader": True, **scheduler_manager.role()}, status_code=202)
+        summary = await scheduler_manager.reconcile()
+        return JSONResponse(content=summary)
 
@@ -2,6 +2,9 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from db.encryption import encrypt_password
 from db.metadata.metadata_repository_manager import repository_manager
+from db.postgresql.postgresql_manager import postgresql_manager
+from db.postgresql.postgresql_connection import check_worker_limit
+from utils.generic import rows_response
 
 
 def register_connection_routes(mcpserver):
@@ -10,7 +13,7 @@ def register_connection_routes(mcpserver):
     @mcpserver.custom_route("/metadata/database-types", methods=["GET"])
     async def list_database_types(request: Request):
         rows = await repository_manager.get_all_types()
-        return JSONResponse(content=[dict(r) for r in rows])
+        return rows_response(request, [dict(r) for r in rows])
 
     @mcpserver.custom_route("/metadata/database-types/{id:int}", methods=["GET"])
     async def list_database_types(request: Request):
@@ -43,7 +46,7 @@ def register_connection_routes(mcpserver):
     @mcpserver.custom_route("/metadata/database-connections", methods=["GET"])
     async def list_connections(request: Request):
         rows = await repository_manager.get_all_connections()
-        return JSONResponse(content=[dict(r) for r in rows])
+        return rows_response(request, [dict(r) for r in rows])
 
     @mcpserver.custom_route("/metadata/database-connections/{connection_id:int}", methods=["GET"])
     async def get_connection(request: Request):
@@ -51,10 +54,43 @@ def register_connection_routes(mcpserver):
         row = await repository_manager.get_connection(connection_id)
         return JSONResponse(content=dict(row) if row else {"error": "Not found"}, status_code=200 if row else 404)
 
+    # --- Açık havuzlar ve circuit breaker durumu ---
+    @mcpserver.custom_route("/metadata/pools", methods=["GET"])
+    async def list_pools(request: Request):
+        return rows_response(request, postgresql_manager.list_pools())
+
+    # --- Hedefe özel havuz limitleri (yeniden başlatmadan uygulanır) ---
+    @mcpserver.custom_route("/metadata/pools/{connection_id:int}/limits", methods=["PUT"])
+    async def update_pool_limits(request: Request):
+        connection_id = int(request.path_params["connection_id"])
+        data = await request.json()
+        try:
+            row = await postgresql_manager.set_pool_limits(
+                connection_id, data.get("pool_min_size"), data.get("pool_max_size")
+            )
+        except ValueError as e:
+            return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+        return JSONResponse(content=dict(row) if row else {"error": "Not found"}, status_code=200 if row else 404)
+
+    # --- Bağlantı etiketleri (fan-out sorgularında hedef grubu seçmek için) ---
+    @mcpserver.custom_route("/metadata/database-connections/{connection_id:int}/tags", methods=["PUT"])
+    async def update_connection_tags(request: Request):
+        connection_id = int(request.path_params["connection_id"])
+        data = await request.json()
+        tags = data.get("tags") or []
+        if not isinstance(tags, list) or not all(isinstance(t, str) and t.strip() for t in tags):
+            return JSONResponse(content={"status": "error", "message": "tags must be a list of non-empty strings"}, status_code=400)
+        row = await repository_manager.update_connection_tags(connection_id, sorted({t.strip() for t in tags}))
+        return JSONResponse(content=dict(row) if row else {"error": "Not found"}, status_code=200 if row else 404)
+
 
     @mcpserver.custom_route("/metadata/database-connections", methods=["POST"])
     async def add_connection(request: Request):
         data = await request.json()
+        try:
+            check_worker_limit("pool_max_size", data.get("pool_max_size"))
+        except ValueError as e:
+            return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
         password = data["password"]
         encrypted_password = encrypt_password(password)
         data["encrypted_password"] = encrypted_password
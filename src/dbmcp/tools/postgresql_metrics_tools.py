@@ -0,0 +1,110 @@
+# tools/postgresql_metrics_tools.py
+
+from typing import Optional
+
+from fastmcp import FastMCP, Context
+from fastmcp.tools.tool import ToolResult
+
+from db.metadata.metadata_metrics_manager import metrics_manager
+from db.collectors.metrics_collector import metrics_collector
+
+from utils.generic import text_result_async
+
+
+def register_postgresql_metrics_tools(mcp: FastMCP) -> None:
+    @mcp.tool(
+        name="pg_metrics_collect",
+        description="pg_stat_database, pg_stat_bgwriter/pg_stat_checkpointer, pg_stat_user_tables ve (kuruluysa) pg_stat_statements sayaçlarından bir örnek alır. "
+                    "connection_id verilmezse aktif tüm bağlantılar örneklenir. Oran hesabı için periyodik bir job olarak çalıştırılmalıdır."
+    )
+    async def pg_metrics_collect(
+            ctx: Context,
+            connection_id: Optional[int] = None,
+            include_tables: bool = True,
+            include_statements: bool = True,
+            prune: bool = True) -> ToolResult:
+        result = await metrics_collector.collect(
+            connection_id, include_tables=include_tables, include_statements=include_statements
+        )
+        if prune:
+            await metrics_manager.prune_samples()
+        return await text_result_async(result, title="Metrics Sample")
+
+    @mcp.tool(
+        name="pg_database_rates",
+        description="Son N dakikadaki veritabanı oranlarını döndürür: TPS, blks_read/s, aralık cache-hit oranı, tuple/s. "
+                    "Sayaç sıfırlamaları dikkate alınır. bucket_minutes verilirse zaman serisi döner."
+    )
+    async def pg_database_rates(
+            ctx: Context,
+            connection_id: int,
+            minutes: int = 60,
+            bucket_minutes: Optional[int] = None) -> ToolResult:
+        minutes = max(1, min(minutes, 60 * 24 * 30))
+        rows = await metrics_manager.get_database_rates(connection_id, minutes, bucket_minutes)
+        return await text_result_async(rows, title=f"Database Rates (last {minutes} min)")
+
+    @mcp.tool(
+        name="pg_checkpoint_rates",
+        description="Son N dakikadaki checkpoint sayıları, yazılan buffer/s ve checkpoint yazma/sync sürelerini döndürür."
+    )
+    async def pg_checkpoint_rates(
+            ctx: Context,
+            connection_id: int,
+            minutes: int = 60,
+            bucket_minutes: Optional[int] = None) -> ToolResult:
+        minutes = max(1, min(minutes, 60 * 24 * 30))
+        rows = await metrics_manager.get_checkpoint_rates(connection_id, minutes, bucket_minutes)
+        return await text_result_async(rows, title=f"Checkpoint Rates (last {minutes} min)")
+
+    @mcp.tool(
+        name="pg_table_activity_rates",
+        description="Son N dakikada en yoğun tabloları scan ve insert/update/delete oranlarıyla (saniye başına) döndürür."
+    )
+    async def pg_table_activity_rates(
+            ctx: Context,
+            connection_id: int,
+            minutes: int = 60,
+            limit: int = 20) -> ToolResult:
+        minutes = max(1, min(minutes, 60 * 24 * 30))
+        limit = max(1, min(limit, 200))
+        rows = await metrics_manager.get_table_activity_rates(connection_id, minutes, limit)
+        return await text_result_async(rows, title=f"Table Activity Rates (last {minutes} min)")
+
+    @mcp.tool(
+        name="pg_top_queries_delta",
+        description="pg_stat_statements snapshot farklarından son N dakikada en pahalı sorguları listeler "
+                    "(stats reset'ten beri değil, pencere içindeki artışa göre). "
+                    "order_by: total_time | calls | mean_time | rows | shared_blks_read | temp_blks_written | wal_bytes"
+    )
+    async def pg_top_queries_delta(
+            ctx: Context,
+            connection_id: int,
+            minutes: int = 60,
+            order_by: str = "total_time",
+            limit: int = 10) -> ToolResult:
+        minutes = max(1, min(minutes, 60 * 24 * 30))
+        limit = max(1, min(limit, 100))
+        rows = await metrics_manager.get_top_statements(connection_id, minutes, order_by, limit)
+        return await text_result_async(rows, title=f"Top {limit} Queries by {order_by} (last {minutes} min)")
+
+    @mcp.tool(
+        name="pg_query_regressions",
+        description="Son N dakikadaki ortalama çalışma süresi (mean_exec_time), önceki baseline penceresine göre "
+                    "threshold_pct'den fazla artan queryid'leri işaretler."
+    )
+    async def pg_query_regressions(
+            ctx: Context,
+            connection_id: int,
+            minutes: int = 60,
+            baseline_minutes: int = 1440,
+            threshold_pct: float = 50.0,
+            min_calls: int = 10,
+            limit: int = 20) -> ToolResult:
+        minutes = max(1, min(minutes, 60 * 24 * 30))
+        baseline_minutes = max(1, min(baseline_minutes, 60 * 24 * 30))
+        limit = max(1, min(limit, 100))
+        rows = await metrics_manager.get_statement_regressions(
+            connection_id, minutes, baseline_minutes, threshold_pct, max(1, min_calls), limit
+        )
+        return await text_result_async(rows, title=f"Query Regressions (last {minutes} min vs previous {baseline_minutes} min)")
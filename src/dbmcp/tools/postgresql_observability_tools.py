@@ -5,7 +5,7 @@ from fastmcp.tools.tool import ToolResult
 
 from db.postgresql.postgresql_manager import postgresql_manager
 
-from utils.generic import text_result as text_result
+from utils.generic import text_result_async
 
 
 def register_postgresql_observability_tools(mcp: FastMCP) -> None:
@@ -49,7 +49,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
         WHERE datname = current_database();
         """
         rows = await postgresql_manager.execute_query(connection_id, sql)
-        return text_result(rows, title="PostgreSQL Health Overview")
+        return await text_result_async(rows, title="PostgreSQL Health Overview")
 
     # 2️⃣ CONNECTION RAPORU
     @mcp.tool(
@@ -95,7 +95,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
             "summary": summary[0] if summary else {},
             "top_long_running": details,
         }
-        return text_result(payload, title="PostgreSQL Connections Report")
+        return await text_result_async(payload, title="PostgreSQL Connections Report")
 
     # 3️⃣ TOP QUERIES (pg_stat_statements)
     @mcp.tool(
@@ -132,7 +132,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
             sql,
             limit
         )
-        return text_result(rows, title=f"Top {limit} Queries (pg_stat_statements)")
+        return await text_result_async(rows, title=f"Top {limit} Queries (pg_stat_statements)")
 
     # 4️⃣ BLOAT RAPORU (pgstattuple varsa + fallback)
     @mcp.tool(
@@ -181,7 +181,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
                 "tables": candidates,
                 "note": "pgstattuple yüklü değil; sadece pg_stat_user_tables bazlı tahmini bloat bilgisi gösteriliyor."
             }
-            return text_result(payload, title="Table Bloat Report (Fallback Mode)")
+            return await text_result_async(payload, title="Table Bloat Report (Fallback Mode)")
 
         # pgstattuple varsa, her tablo için detaylı bloat ölç
         detailed = []
@@ -212,7 +212,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
             "mode": "pgstattuple",
             "tables": detailed,
         }
-        return text_result(payload, title="Table Bloat Report (pgstattuple)")
+        return await text_result_async(payload, title="Table Bloat Report (pgstattuple)")
 
     # 5️⃣ AUTOVACUUM ACTIVITY
     @mcp.tool(
@@ -249,7 +249,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
         progress = await postgresql_manager.execute_query(connection_id, progress_sql)
         stats = await postgresql_manager.execute_query(connection_id, stats_sql)
 
-        return text_result(
+        return await text_result_async(
             {
                 "active_vacuum_processes": progress,
                 "table_health": stats
@@ -286,7 +286,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
         )
 
         # --- CHECKPOINTER
-        if server_version >= 150000:
+        if server_version >= 170000:
             payload["checkpointer"] = await postgresql_manager.execute_query(
                 connection_id,
                 """
@@ -312,7 +312,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
                 """
             )
 
-        return text_result(payload, title="WAL & Checkpoint Activity")
+        return await text_result_async(payload, title="WAL & Checkpoint Activity")
 
     # 7️⃣ KAPASİTE / BOYUT RAPORU
     @mcp.tool(
@@ -347,7 +347,7 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
             "databases": db_sizes,
             "top_tables": tbl_sizes,
         }
-        return text_result(payload, title="PostgreSQL Capacity Report")
+        return await text_result_async(payload, title="PostgreSQL Capacity Report")
 
     # 8️⃣ REPLICATION STATUS
     @mcp.tool(
@@ -381,4 +381,4 @@ def register_postgresql_observability_tools(mcp: FastMCP) -> None:
             "replicas": rows,
             "note": "Bu rapor yalnızca primary/leader üzerinde anlamlıdır. Standby'da pg_stat_replication boş dönecektir."
         }
-        return text_result(payload, title="Replication Status")
+        return await text_result_async(payload, title="Replication Status")
@@ -1,8 +1,8 @@
-import asyncio
+from typing import List, Optional
 
 from db.postgresql.postgresql_manager import postgresql_manager
 
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
 
 
 def register_postgresql_tools(mcpserver: FastMCP):
@@ -31,6 +31,14 @@ def register_postgresql_tools(mcpserver: FastMCP):
     async def list_all_columns(connection_id: int, schema_name:str, table_name: str):
         return await postgresql_manager.find_columns_by_table_name(connection_id, schema_name, table_name)
 
+    @mcpserver.tool(
+        name="list-all-indexes-in-table",
+        description="List all indexes (with definitions) of a specified table",
+        tags={"postgresql"}
+    )
+    async def list_all_indexes(connection_id: int, schema_name: str, table_name: str):
+        return await postgresql_manager.find_indexes_by_table_name(connection_id, schema_name, table_name)
+
     @mcpserver.tool(
         name="check-table-bloat",
         description="""
@@ -46,15 +54,16 @@ def register_postgresql_tools(mcpserver: FastMCP):
         use_pgstattuple = await postgresql_manager.has_pgstattuple(connection_id)
 
         tables = await postgresql_manager.find_schemas_and_tables(connection_id, schema_name, table_name)
-        results = await asyncio.gather(
-            *(
+        results = await postgresql_manager.gather_limited(
+            connection_id,
+            [
                 postgresql_manager.check_single_table_bloat(
                     connection_id,
                     s, t,
                     use_pgstattuple
                 )
                 for s, t in tables
-            )
+            ]
         )
 
         return results
@@ -85,8 +94,64 @@ def register_postgresql_tools(mcpserver: FastMCP):
 
     @mcpserver.tool(
         name="query",
-        description="Run a raw SQL query on the connected database",
+        description="Run a raw SQL query on the connected database. "
+                    "With stream=true the result is read through a server-side cursor in pages bounded by "
+                    "max_rows and max_bytes; pass the returned continuation_token (query may be empty) to get "
+                    "the next page, or close=true to release it early. "
+                    "result_format='columnar' returns {columns, types, rows} with each row as an array "
+                    "instead of repeating column names on every row.",
         tags={"postgresql"}
     )
-    async def run_query(connection_id: int, query: str):
-        return await postgresql_manager.execute_custom_query(connection_id, query)
+    async def run_query(
+            connection_id: int,
+            query: str = "",
+            stream: bool = False,
+            max_rows: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            continuation_token: Optional[str] = None,
+            close: bool = False,
+            result_format: str = "rows"):
+        if continuation_token and close:
+            return {"closed": await postgresql_manager.close_stream(continuation_token)}
+        if stream or continuation_token:
+            return await postgresql_manager.stream_query(
+                connection_id, query,
+                max_rows=max_rows, max_bytes=max_bytes, continuation_token=continuation_token,
+            )
+        return await postgresql_manager.execute_custom_query(
+            connection_id, query, columnar=(result_format == "columnar")
+        )
+
+
+    @mcpserver.tool(
+        name="query-fanout",
+        description="Run the same SQL on many databases concurrently. Targets are connection_ids, "
+                    "or every connection with the given tag, or (if neither is given) all active connections. "
+                    "Rows are merged and tagged with connection_id; targets that fail or exceed "
+                    "timeout_seconds are reported under 'failed' without failing the call. "
+                    "Progress is reported as each target finishes.",
+        tags={"postgresql"}
+    )
+    async def run_query_fanout(
+            ctx: Context,
+            query: str,
+            connection_ids: Optional[List[int]] = None,
+            tag: Optional[str] = None,
+            max_concurrency: Optional[int] = None,
+            timeout_seconds: Optional[float] = None,
+            max_rows_per_target: Optional[int] = None):
+        targets = await postgresql_manager.resolve_targets(connection_ids, tag)
+        if not targets:
+            return {"targets": 0, "succeeded": 0, "failed": [], "per_target": [], "rows": []}
+
+        async def report(done: int, total: int, result: dict):
+            status = f"{result.get('row_count', 0)} rows" if result["ok"] else f"failed: {result['error']}"
+            await ctx.report_progress(done, total, f"id={result['connection_id']} {status}")
+
+        return await postgresql_manager.fan_out_query(
+            targets, query,
+            max_concurrency=max_concurrency,
+            timeout_seconds=timeout_seconds,
+            max_rows_per_target=max_rows_per_target,
+            on_target_done=report,
+        )
@@ -1,6 +1,5 @@
 # tools/postgresql_observability_tools.py
 
-import json
 from typing import Optional
 
 from fastmcp import FastMCP, Context
@@ -9,8 +8,9 @@ from mcp import types as mt
 
 from db.postgresql.postgresql_manager import postgresql_manager
 from db.metadata.metadata_trend_manager import trend_manager
+from db.collectors.capacity_collector import capacity_collector
 
-from utils.generic import text_result as text_result
+from utils.generic import text_result_async
 
 
 def register_postgresql_trend_tools(mcp: FastMCP) -> None:
@@ -31,11 +31,11 @@ def register_postgresql_trend_tools(mcp: FastMCP) -> None:
 
         if scope == "db":
             sql = """
-                  WITH base AS (SELECT snapshot_ts::date AS d, max(size_bytes) AS size_bytes \
-                                FROM trends.pg_capacity_snapshots \
-                                WHERE scope = 'db' \
-                                  AND dbname = current_database() \
-                                  AND snapshot_ts >= now() - ($1 || ' days'):: interval
+                  WITH base AS (SELECT day AS d, max(max_size) AS size_bytes \
+                                FROM trends.pg_capacity_daily \
+                                WHERE connection_id = $1 \
+                                  AND scope = 'db' \
+                                  AND day >= current_date - CAST($2 AS INTEGER)
                   GROUP BY 1
                   ORDER BY 1
                       ),
@@ -51,24 +51,23 @@ def register_postgresql_trend_tools(mcp: FastMCP) -> None:
                          points, \
                          round((end_size - start_size) / 1024.0 / 1024.0, 2)                           AS growth_mb, \
                          round(((end_size - start_size):: numeric / nullif (start_size,0))*100,2)      AS growth_pct, \
-                         round(((end_size - start_size) / 1024.0 / 1024.0) / nullif(points - 1, 1), \
+                         round(((end_size - start_size) / 1024.0 / 1024.0) / nullif(points - 1, 0), \
                                2)                                                                      AS growth_mb_per_day
                   FROM agg; \
                   """
 
-            rows = await trend_manager.execute_query(sql, str(days))
-            return text_result(rows, title="Capacity Growth Trend (Database)")
+            rows = await trend_manager.execute_query(sql, connection_id, days)
+            return await text_result_async(rows, title="Capacity Growth Trend (Database)")
 
         # ---- TABLE SCOPE ----
         sql = """
               WITH base AS (SELECT schemaname, \
                                    relname, \
-                                   snapshot_ts::date AS d, max(size_bytes) AS size_bytes \
-                            FROM trends.pg_capacity_snapshots \
-                            WHERE scope = 'table' \
-                              AND dbname = current_database() \
-                              AND snapshot_ts >= now() - ($1 || ' days'):: interval
-              GROUP BY 1, 2, 3
+                                   day AS d, max_size AS size_bytes \
+                            FROM trends.pg_capacity_daily \
+                            WHERE connection_id = $1 \
+                              AND scope = 'table' \
+                              AND day >= current_date - CAST($2 AS INTEGER)
                   ),
                   agg AS (
               SELECT
@@ -82,14 +81,14 @@ def register_postgresql_trend_tools(mcp: FastMCP) -> None:
                      end_date, \
                      round((end_size - start_size) / 1024.0 / 1024.0, 2)                           AS growth_mb, \
                      round(((end_size - start_size):: numeric / nullif (start_size,0))*100,2)      AS growth_pct, \
-                     round(((end_size - start_size) / 1024.0 / 1024.0) / nullif(points - 1, 1), 2) AS growth_mb_per_day
+                     round(((end_size - start_size) / 1024.0 / 1024.0) / nullif(points - 1, 0), 2) AS growth_mb_per_day
               FROM agg
               ORDER BY growth_mb DESC
-                  LIMIT $2; \
+                  LIMIT $3; \
               """
 
-        rows = await trend_manager.execute_query(sql, str(days), limit)
-        return text_result(rows, title=f"Capacity Growth Trend (Top {limit} Tables)")
+        rows = await trend_manager.execute_query(sql, connection_id, days, limit)
+        return await text_result_async(rows, title=f"Capacity Growth Trend (Top {limit} Tables)")
 
     @mcp.tool(
         name="pg_capacity_growth_trend_database_capacity_insert",
@@ -107,6 +106,7 @@ def register_postgresql_trend_tools(mcp: FastMCP) -> None:
 
         if rows:
             await trend_manager.add_database_capacity(
+                connection_id=connection_id,
                 dbname=rows[0]["dbname"],
                 size_bytes=rows[0]["size_bytes"]
             )
@@ -128,10 +128,63 @@ def register_postgresql_trend_tools(mcp: FastMCP) -> None:
 
         rows = await postgresql_manager.execute_query(connection_id, snap_tbl_sql)
 
-        for r in rows:
-            await trend_manager.add_table_capacity(
-                dbname=r["dbname"],
-                schemaname=r["schemaname"],
-                relname=r["relname"],
-                size_bytes=r["size_bytes"]
-            )
\ No newline at end of file
+        # Tüm snapshot tek seferde, tek transaction içinde yazılır
+        await trend_manager.add_table_capacities(connection_id, rows)
+
+    @mcp.tool(
+        name="pg_capacity_fleet_snapshot",
+        description="Aktif tüm bağlantıların kapasite snapshot'larını eşzamanlı alır ve tek seferde kapasite tablosuna yazar."
+    )
+    async def pg_capacity_fleet_snapshot(
+            ctx: Context,
+            max_concurrency: Optional[int] = None,
+            timeout_seconds: Optional[float] = None,
+            include_tables: bool = True) -> ToolResult:
+        result = await capacity_collector.collect_all(max_concurrency, timeout_seconds, include_tables)
+        return await text_result_async(result, title="Fleet Capacity Snapshot")
+
+    @mcp.tool(
+        name="pg_capacity_snapshot_history",
+        description="Ham kapasite snapshot serisini döndürür; saklama süresini aşan veriler Parquet arşivinden okunur."
+    )
+    async def pg_capacity_snapshot_history(
+            ctx: Context,
+            connection_id: int,
+            scope: str = "db",  # 'db' | 'table'
+            days: int = 30,
+            schema_name: Optional[str] = None,
+            table_name: Optional[str] = None,
+    ) -> ToolResult:
+        days = max(1, min(days, 3650))
+        rows = await trend_manager.get_snapshot_history(connection_id, scope, days, schema_name, table_name)
+        return await text_result_async(rows, title=f"Capacity Snapshot History ({scope}, {days} days)")
+
+    @mcp.tool(
+        name="pg_capacity_trend_archive",
+        description="Saklama süresinden eski kapasite snapshot'larını Parquet arşivine taşır ve canlı tablodan siler."
+    )
+    async def pg_capacity_trend_archive(
+            ctx: Context,
+            retention_days: Optional[int] = None) -> ToolResult:
+        result = await trend_manager.archive_snapshots(retention_days)
+        return await text_result_async(result, title="Capacity Snapshot Archival")
+
+    @mcp.tool(
+        name="pg_capacity_forecast",
+        description="Bir bağlantıdaki tüm tablolar (veya veritabanı) için regresyon ile büyüme hızı, R² ve N gün sonraki tahmini boyutu hesaplar."
+    )
+    async def pg_capacity_forecast(
+            ctx: Context,
+            connection_id: int,
+            scope: str = "table",  # 'db' | 'table'
+            days: int = 90,
+            horizon_days: int = 30,
+            method: str = "linear",  # 'linear' | 'robust'
+            limit: int = 20,
+    ) -> ToolResult:
+        days = max(2, min(days, 365))
+        horizon_days = max(1, min(horizon_days, 3650))
+        limit = max(1, min(limit, 1000))
+
+        rows = await trend_manager.forecast_capacity(connection_id, scope, days, horizon_days, method, limit)
+        return await text_result_async(rows, title=f"Capacity Forecast ({method}, +{horizon_days} days)")
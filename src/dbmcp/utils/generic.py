@@ -1,12 +1,162 @@
+import asyncio
+import datetime
+import io
 import json
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence
 
+import pyarrow as pa
+import pydantic_core
 from fastmcp.tools.tool import ToolResult
 from mcp import types as mt
+from starlette.requests import Request
+from starlette.responses import Response
+
+from config.settings import get_settings
+
+try:
+    import orjson
+except ImportError:  # orjson yoksa standart json ile aynı çıktı üretilir (daha yavaş)
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def _default(obj: Any) -> Any:
+    # Decimal, timedelta, asyncpg Range, ipaddress vb.; datetime/date/UUID/numpy orjson'da yerlidir.
+    # Standart json yolu da aynı çıktıyı versin diye onlar burada orjson gibi yazılır.
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):  # numpy dizileri ve skalerleri
+        return obj.tolist()
+    return str(obj)
+
+
+def dumps_bytes(payload: Any, compact: bool = False) -> bytes:
+    """JSON'a çevirir; compact=False ise 2 boşluk girintili."""
+    if orjson:
+        options = _ORJSON_OPTIONS if compact else _ORJSON_OPTIONS | orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(payload, default=_default, option=options)
+        except orjson.JSONEncodeError:
+            # ör. 64 bit'e sığmayan tamsayılar (numeric toplamları); standart json bunları yazabilir
+            pass
+    return _json_dumps(payload, compact).encode()
+
+
+def dumps(payload: Any, compact: bool = False) -> str:
+    if orjson:
+        return dumps_bytes(payload, compact).decode()
+    return _json_dumps(payload, compact)
+
+
+def _json_dumps(payload: Any, compact: bool) -> str:
+    if compact:
+        return json.dumps(payload, default=_default, separators=(",", ":"))
+    return json.dumps(payload, indent=2, default=_default)
+
+
+def loads(data: str | bytes) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _approx_rows(payload: Any) -> int:
+    """Serileştirme maliyeti için ucuz tahmin: üst seviyedeki (veya bir alt seviyedeki) liste uzunlukları."""
+    if isinstance(payload, list):
+        return len(payload)
+    if isinstance(payload, dict):
+        return sum(len(v) for v in payload.values() if isinstance(v, list))
+    return 0
+
+# Sonuç biçimleri: rows = satır başına dict, columnar = kolon adları bir kez + satırlar dizi olarak,
+# arrow = Arrow IPC stream (yalnızca HTTP route'larında)
+RESULT_FORMATS = ("rows", "columnar", "arrow")
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def to_columnar(rows: Sequence[Dict[str, Any]], columns: Optional[List[str]] = None,
+                types: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    [{"a": 1, "b": 2}, ...] -> {"columns": ["a", "b"], "types": [...], "rows": [[1, 2], ...]}.
+    Kolon adları her satırda tekrarlanmadığı için geniş sonuçlarda JSON boyutu ve bellek düşer.
+    """
+    if columns is None:
+        columns = list(rows[0].keys()) if rows else []
+    return {
+        "columns": columns,
+        "types": types,
+        "rows": [[r.get(c) for c in columns] for r in rows],
+        "row_count": len(rows),
+    }
+
+
+def is_columnar(payload: Any) -> bool:
+    return isinstance(payload, dict) and "columns" in payload and "rows" in payload
+
+
+def to_arrow_ipc(payload: Sequence[Dict[str, Any]] | Dict[str, Any]) -> bytes:
+    """Satır listesini veya columnar sonucu Arrow IPC stream byte'larına çevirir."""
+    if is_columnar(payload):
+        columns = payload["columns"]
+        arrays = list(zip(*payload["rows"])) if payload["rows"] else [[] for _ in columns]
+        table = pa.table({c: _arrow_array(values) for c, values in zip(columns, arrays)})
+    else:
+        columns = list(payload[0].keys()) if payload else []
+        table = pa.table({c: _arrow_array([r.get(c) for r in payload]) for c in columns})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _arrow_array(values: Sequence[Any]) -> pa.Array:
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # Karışık veya Arrow'un tanımadığı tipler (ör. asyncpg Range, ipaddress) metin olarak gider
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def rows_response(request: Request, rows: Sequence[Dict[str, Any]] | Dict[str, Any], status_code: int = 200) -> Response:
+    """Route'lar için ?format=rows|columnar|arrow desteği olan yanıt."""
+    fmt = request.query_params.get("format", "rows")
+    if fmt == "arrow":
+        return Response(content=to_arrow_ipc(rows), media_type=ARROW_STREAM_MEDIA_TYPE, status_code=status_code)
+    if fmt == "columnar" and not is_columnar(rows):
+        rows = to_columnar([dict(r) for r in rows])
+    elif fmt == "rows" and is_columnar(rows):
+        rows = [dict(zip(rows["columns"], r)) for r in rows["rows"]]
+    return Response(content=dumps_bytes(rows, compact=True), media_type="application/json", status_code=status_code)
+
+
+def text_result(
+        payload: dict | list,
+        title: Optional[str] = None,
+        compact: Optional[bool] = None,
+        structured: Optional[bool] = None,
+) -> ToolResult:
+    """
+    JSON çıktıyı TextContent olarak döndürmek için yardımcı fonksiyon.
+    Columnar payload'lar ({columns, types, rows}) her zaman girintisiz yazılır.
+    compact=True girintisiz yazar. structured=True markdown sarmalayıcısını atlar ve
+    sonucu structured_content olarak da verir. None ise ayarlardaki varsayılan kullanılır.
+    """
+    settings = get_settings()
+    compact = settings.tool_result_compact if compact is None else compact
+    structured = settings.tool_result_structured if structured is None else structured
+
+    # Columnar sonuçta satır dizileri girintisiz yazılır; aksi halde her değer ayrı satıra düşer
+    text = dumps(payload, compact=compact or is_columnar(payload))
+
+    if structured:
+        # structured_content JSON-uyumlu olmalı: payload tek geçişte dönüştürülür (metin yeniden
+        # parse edilmez); Decimal/Range gibi değerler metindeki gibi str olur. Farklar: UTC zamanlar
+        # "Z" ile, interval'ler ISO 8601 süresi ("PT1H") olarak yazılır
+        data = pydantic_core.to_jsonable_python(payload, fallback=_default)
+        result = ToolResult(content=[mt.TextContent(type="text", text=text)])
+        # ToolResult(structured_content=...) aynı dönüşümü bir kez daha yapardı
+        result.structured_content = data if isinstance(data, dict) else {"result": data}
+        return result
 
-def text_result(payload: dict | list, title: Optional[str] = None) -> ToolResult:
-    """JSON çıktıyı TextContent olarak döndürmek için yardımcı fonksiyon."""
-    text = json.dumps(payload, indent=2, default=str)
     if title:
         text = f"# {title}\n\n```json\n{text}\n```"
     else:
@@ -16,4 +166,13 @@ def text_result(payload: dict | list, title: Optional[str] = None) -> ToolResult
         content=[
             mt.TextContent(type="text", text=text)
         ]
-    )
\ No newline at end of file
+    )
+
+async def text_result_async(payload: dict | list, title: Optional[str] = None, **kwargs) -> ToolResult:
+    """
+    text_result ile aynı; büyük payload'lar worker thread'de serileştirilir ki büyük
+    raporlar event loop'u ve diğer istekleri bekletmesin.
+    """
+    if _approx_rows(payload) >= get_settings().tool_result_offload_rows:
+        return await asyncio.to_thread(text_result, payload, title, **kwargs)
+    return text_result(payload, title, **kwargs)